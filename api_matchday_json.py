@@ -1,20 +1,66 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import csv
 import datetime
-import glob
+import functools
+import gzip
 import json
 import os
-import pandas as pd
-import requests
-from typing import Dict, List, Optional
+import re
+import threading
+import corpus
+import http_cache
+import json_codec
+import metrics
+import projections
+from lazy_imports import lazy_import
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+# Fetching never needs pandas, so it is only loaded once a table is built.
+pd = lazy_import('pandas')
 
-def request_json(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
-        'AppleWebKit/537.36 (KHTML, like Gecko) '
-        'Chrome/90.0.4430.212 Safari/537.36'
-    }
-    r = requests.get(url, headers=headers)
-    return r.json()
+
+# Seconds to wait for each endpoint before giving up on the request.
+ENDPOINT_TIMEOUTS = {
+    'fixture_info': 10,
+    'match_stats': 10,
+    'match_info': 10,
+    'lineups': 10,
+    'table': 10,
+    'sameday_fixtures': 20,
+    'commentary': 20
+}
+
+MAX_FETCH_WORKERS = 6
+
+MAX_BACKFILL_WORKERS = 4
+
+MAX_COMMENTARY_WORKERS = 4
+
+COMMENTARY_PAGE_SIZE = 20
+
+# Point these at a stand-in server (see standin.py) to fetch without the BBC CDN.
+API_BASE = os.environ.get('BBC_API_BASE', 'https://web-cdn.api.bbci.co.uk/wc-poll-data/container')
+COMMENTARY_BASE = os.environ.get('BBC_COMMENTARY_BASE', 'https://www.bbc.com/wc-data/container')
+
+# When set, full responses are also kept, gzipped, under '<dir>/<endpoint>/<date>.json.gz'
+# before bbc-json/ is cut down to the fields the extractors read.
+RAW_ARCHIVE_DIR = os.environ.get('BBC_RAW_ARCHIVE')
+
+
+# The last pages seen for each liveTextStreamId, for incremental commentary
+# fetches. A match's entry is dropped once it has been fetched at full time.
+_commentary_lock = threading.Lock()
+_commentary_streams: Dict[str, List[Dict]] = {}
+
+
+def request_json(url, timeout=None):
+    # The status stays 'cache' unless the request reaches the network.
+    with metrics.span('request', container=metrics.url_class(url), status='cache'):
+        return http_cache.get_json(url, timeout)
 
 
 def date_today():
@@ -22,14 +68,43 @@ def date_today():
 
 
 def api_base():
-    return 'https://web-cdn.api.bbci.co.uk/wc-poll-data/container'
+    return API_BASE
+
 
+def commentary_base():
+    return COMMENTARY_BASE
 
-def get_fixtures(start_date, end_date=None):
+
+def get_fixtures(start_date, end_date=None, timeout=None):
     if not end_date:
         end_date = start_date
     fixtures = f'{api_base()}/sport-data-scores-fixtures?selectedEndDate={end_date}&selectedStartDate={start_date}&todayDate={date_today()}&urn=urn%3Abbc%3Asportsdata%3Afootball%3Ateam%3Atranmere-rovers&useSdApi=false'
-    return request_json(fixtures)['eventGroups']
+    return request_json(fixtures, timeout)['eventGroups']
+
+
+def get_fixture_events(start_date, end_date=None, timeout=None) -> List[Dict]:
+    """ 
+        Expand every event in a fixtures response into its own single-event fixture_info,
+        in the same shape get_fixtures returns for a single date.
+    """
+    fixture_events = []
+
+    for event_group in get_fixtures(start_date, end_date, timeout):
+        for secondary_group in event_group['secondaryGroups']:
+            for event in secondary_group['events']:
+                fixture_events.append({
+                    'displayLabel': event_group['displayLabel'],
+                    'secondaryGroups': [{
+                        'displayLabel': secondary_group['displayLabel'],
+                        'events': [event]
+                    }]
+                })
+
+    return fixture_events
+
+
+def get_fixture_date(fixture_info):
+    return fixture_info['secondaryGroups'][0]['events'][0]['date']['isoDate']
 
 
 def get_resource_id(fixture_info):
@@ -40,94 +115,356 @@ def get_match_id(fixture_info):
     return fixture_info['secondaryGroups'][0]['events'][0]['id']
 
 
-def get_match_stats(match_id):
+def get_match_stats(match_id, timeout=None):
     match_stats = f'{api_base()}/match-stats?globalContainerPolling=true&urn=urn%3Abbc%3Asportsdata%3Afootball%3Aevent%3A{match_id}'
-    return request_json(match_stats)
+    return request_json(match_stats, timeout)
 
 
-def get_match_info(resource_id, game_date, match_id):
+def get_match_info(resource_id, game_date, match_id, timeout=None):
     match_info = f'{api_base()}/live-header?assetId={resource_id}&endDateTime={game_date}&globalContainerPolling=true&isInternational=true&liveExperienceCrowdCount=true&showMSI=false&showMedia=true&sportDataEventUrn=urn%3Abbc%3Asportsdata%3Afootball%3Aevent%3A{match_id}&sportDiscipline=football&startDateTime={game_date}&uasEnv=live'
-    return request_json(match_info)
+    return request_json(match_info, timeout)
 
 
-def get_sameday_fixtures(match_id):
+def get_sameday_fixtures(match_id, timeout=None):
     sameday_fixtures = f'{api_base()}/football-on-the-day-events?globalContainerPolling=true&matchUrn=urn%3Abbc%3Asportsdata%3Afootball%3Aevent%3A{match_id}'
-    return request_json(sameday_fixtures)
+    return request_json(sameday_fixtures, timeout)
 
 
-def get_table(match_id, date = date_today()):
+def get_table(match_id, date=None, timeout=None):
+    # Defaulted here rather than in the signature, which would fix the date at import.
+    date = date or date_today()
     table = f'{api_base()}/football-table?globalContainerPolling=true&matchDate={date}&matchUrn=urn%3Abbc%3Asportsdata%3Afootball%3Aevent%3A{match_id}'
-    return request_json(table)
+    return request_json(table, timeout)
 
 
-def get_lineups(match_id):
+def get_lineups(match_id, timeout=None):
     line_ups = f'{api_base()}/match-lineups?globalContainerPolling=true&urn=urn%3Abbc%3Asportsdata%3Afootball%3Aevent%3A{match_id}'
-    return request_json(line_ups)
+    return request_json(line_ups, timeout)
 
 
 def get_commentary_url(match_id, page_no):
-    return f'https://www.bbc.com/wc-data/container/stream?globalContainerPolling=true&liveTextStreamId={match_id}&pageNumber={page_no}&pageSize=20&pageUrl=%2Fsport%2Ffootball%2Flive%2Fc0mn93jz28nt&type=football'
+    return f'{commentary_base()}/stream?globalContainerPolling=true&liveTextStreamId={match_id}&pageNumber={page_no}&pageSize={COMMENTARY_PAGE_SIZE}&pageUrl=%2Fsport%2Ffootball%2Flive%2Fc0mn93jz28nt&type=football'
 
 
-def get_commentary(match_id, page_no=1):
-    commentary = get_commentary_url(match_id, page_no)
+def get_commentary_page(match_id, page_no, timeout=None):
+    return request_json(get_commentary_url(match_id, page_no), timeout)
 
-    all_commentary = []
-    page_1 = request_json(commentary)
-    if not 'error' in page_1.keys():
-        all_commentary.append(page_1)
-        
-        n_pages = page_1['page']['total']
-        for i in range(2, n_pages+1):
-            commentary = get_commentary_url(match_id, i)
-            all_commentary.append(request_json(commentary))
 
-        return all_commentary
+def commentary_item_key(item) -> Tuple:
+    """ 
+        Identify a commentary entry by what the saved, projected files keep of it,
+        so entries fetched now can be matched against ones saved earlier.
+    """
+    dates = item.get('dates') or {}
+    text = projections.project(item.get('content'), projections.PARAGRAPHS)
+    return (dates.get('firstPublished'), dates.get('time'), json.dumps(text, sort_keys=True))
+
+
+def paginate_commentary(items, page_size=COMMENTARY_PAGE_SIZE) -> List[Dict]:
+    """ 
+        Split commentary entries, newest first, back into pages in the API's shape.
+    """
+    chunks = [items[i:i + page_size] for i in range(0, len(items), page_size)] or [[]]
+    return [
+        {'page': {'index': i, 'total': len(chunks)}, 'results': chunk}
+        for i, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def get_commentary_pages(match_id, page_1, timeout=None) -> List[Dict]:
+    """ 
+        Fetch pages 2..N concurrently once page 1 has given the page count,
+        returning every page in order.
+    """
+    n_pages = page_1['page']['total']
+    if n_pages < 2:
+        return [page_1]
+
+    with ThreadPoolExecutor(max_workers=MAX_COMMENTARY_WORKERS) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, get_commentary_page, match_id, page_no, timeout)
+            for page_no in range(2, n_pages + 1)
+        ]
+        return [page_1] + [future.result() for future in futures]
+
+
+def get_new_commentary(match_id, page_1, known, timeout=None) -> List[Dict]:
+    """ 
+        Fetch pages only until one holds the newest entry already known, then merge
+        the new entries in front of the known ones. Keeping up with a match this way
+        costs one or two requests rather than every page.
+    """
+    known_items = [item for page in known for item in page['results']]
+    if not known_items:
+        return get_commentary_pages(match_id, page_1, timeout)
+
+    newest_known = commentary_item_key(known_items[0])
+    n_pages = page_1['page']['total']
+
+    pages = [page_1]
+    while not any(commentary_item_key(item) == newest_known for item in pages[-1]['results']):
+        if len(pages) >= n_pages:
+            # Nothing known is left in the stream, so every page has been fetched.
+            return pages
+        pages.append(get_commentary_page(match_id, len(pages) + 1, timeout))
+
+    fetched = [item for page in pages for item in page['results']]
+    fetched_keys = {commentary_item_key(item) for item in fetched}
+    items = fetched + [item for item in known_items if commentary_item_key(item) not in fetched_keys]
+    return paginate_commentary(items)
+
+
+def remember_commentary(match_id, pages) -> None:
+    with _commentary_lock:
+        _commentary_streams[match_id] = pages
+
+
+def forget_commentary(match_id) -> None:
+    with _commentary_lock:
+        _commentary_streams.pop(match_id, None)
+
+
+def remember_saved_commentary(game_date, match_id) -> None:
+    """ 
+        Seed a stream's known pages from the commentary already saved for its date.
+    """
+    try:
+        pages = read_json_file(f'./bbc-json/commentary/{game_date}.json')
+    except Exception:
+        return
+    if pages:
+        remember_commentary(match_id, pages)
+
+
+def get_commentary(match_id, page_no=1, timeout=None, incremental=True):
+    """ 
+        Return every page of a match's commentary, newest entries first. With
+        incremental set and the stream's pages already known (from an earlier call
+        or remember_commentary), only pages with newer entries are fetched.
+    """
+    page_1 = get_commentary_page(match_id, page_no, timeout)
+    if 'error' in page_1.keys():
+        return None
+
+    with _commentary_lock:
+        known = _commentary_streams.get(match_id)
+
+    if incremental and known:
+        all_commentary = get_new_commentary(match_id, page_1, known, timeout)
+    else:
+        all_commentary = get_commentary_pages(match_id, page_1, timeout)
+
+    remember_commentary(match_id, all_commentary)
+    return all_commentary
     
 
-def get_match_json(game_date):
-    fixture_info = get_fixtures(game_date)[0]
+def fetch_concurrently(jobs: Dict[str, Tuple[Callable, Tuple]], max_workers: int=MAX_FETCH_WORKERS) -> Dict:
+    """ 
+        Run independent endpoint requests in a thread pool, keyed by endpoint name.
+        Each request is given its own timeout from ENDPOINT_TIMEOUTS.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            key: pool.submit(contextvars.copy_context().run, func, *args, timeout=ENDPOINT_TIMEOUTS.get(key))
+            for key, (func, args) in jobs.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def is_finished(fixture_info):
+    return fixture_info['secondaryGroups'][0]['events'][0]['status'] == 'PostEvent'
+
 
+def endpoint_jobs(game_date, fixture_info) -> Dict[str, Tuple[Callable, Tuple]]:
+    """ 
+        The request for each match endpoint, in the form fetch_concurrently takes.
+    """
     bbc_resource_id = get_resource_id(fixture_info)
 
     bbc_match_id = get_match_id(fixture_info)
 
-    match_stats = get_match_stats(bbc_match_id)
+    return {
+        'match_stats': (get_match_stats, (bbc_match_id,)),
+        'match_info': (get_match_info, (bbc_resource_id, game_date, bbc_match_id)),
+        'lineups': (get_lineups, (bbc_match_id,)),
+        'table': (get_table, (bbc_match_id, game_date)),
+        'sameday_fixtures': (get_sameday_fixtures, (bbc_match_id,)),
+        'commentary': (get_commentary, (bbc_match_id,))
+    }
 
-    match_info = get_match_info(bbc_resource_id, game_date, bbc_match_id)
 
-    lineups = get_lineups(bbc_match_id)
+def get_match_json(game_date, fixture_info=None):
+    if fixture_info is None:
+        fixture_info = get_fixtures(game_date, timeout=ENDPOINT_TIMEOUTS['fixture_info'])[0]
 
-    table = get_table(bbc_match_id)
+    # Re-syncing a saved match only fetches commentary newer than what is on disk.
+    remember_saved_commentary(game_date, get_match_id(fixture_info))
 
-    sameday_fixtures = get_sameday_fixtures(bbc_match_id)
+    # Until the final whistle nothing cached for this match can be trusted.
+    if is_finished(fixture_info):
+        freshness = contextlib.nullcontext()
+    else:
+        freshness = http_cache.max_age(0)
+
+    with freshness:
+        responses = fetch_concurrently(endpoint_jobs(game_date, fixture_info))
 
-    commentary = get_commentary(bbc_match_id)
+    # A finished match's commentary won't change again, so there's no stream to follow.
+    if is_finished(fixture_info):
+        forget_commentary(get_match_id(fixture_info))
 
     return {
         'fixture_info': fixture_info,
-        'match_stats': match_stats,
-        'match_info': match_info,
-        'lineups': lineups,
-        'table': table,
-        'sameday_fixtures': sameday_fixtures,
-        'commentary': commentary
+        'match_stats': responses['match_stats'],
+        'match_info': responses['match_info'],
+        'lineups': responses['lineups'],
+        'table': responses['table'],
+        'sameday_fixtures': responses['sameday_fixtures'],
+        'commentary': responses['commentary']
     }
 
-def save_match_json(game_date):
-    bbc_json = get_match_json(game_date)
+def write_raw_json(game_date, key, value, raw_archive):
+    dir = f"{raw_archive.rstrip('/')}/{key}"
+    os.makedirs(dir, exist_ok=True)
+
+    with gzip.open(f"{dir}/{game_date}.json.gz", 'wt') as outfile:
+        json.dump(value, outfile)
 
+
+def write_match_json(game_date, bbc_json, raw_archive=None):
+    """ 
+        Save each endpoint's response to bbc-json/, keeping only the fields in its
+        projection. With raw_archive set (default: $BBC_RAW_ARCHIVE), full responses
+        are archived there too.
+    """
+    raw_archive = raw_archive or RAW_ARCHIVE_DIR
     print(f"~~~~~~ Saving data for {game_date} ~~~~~~")
 
     for key, value in bbc_json.items():
-        dir = f"./bbc-json/{key}"
-        os.makedirs(dir, exist_ok=True)
-        
-        filename = f"{dir}/{game_date}.json"
-        
-        with open(filename, 'w') as outfile:
-            json.dump(value, outfile)
-            print(f"Saved {filename}" )
+        write_endpoint_json(game_date, key, value, raw_archive)
+
+
+def write_endpoint_json(game_date, key, value, raw_archive=None):
+    """ 
+        Save one endpoint's response, projected, replacing any earlier file
+        atomically so readers never see a partial write. A file that already
+        holds the same JSON isn't rewritten.
+    """
+    raw_archive = raw_archive or RAW_ARCHIVE_DIR
+    if raw_archive:
+        write_raw_json(game_date, key, value, raw_archive)
+
+    dir = f"./bbc-json/{key}"
+    os.makedirs(dir, exist_ok=True)
+
+    filename = f"{dir}/{game_date}.json"
+    tmp_path = f"{filename}.tmp"
+    data = json.dumps(projections.project_endpoint(key, value)).encode()
+
+    # Leaving an unchanged file alone keeps its mtime, so it isn't re-extracted.
+    try:
+        if corpus.read_bytes(filename) == data:
+            print(f"Unchanged {filename}")
+            return
+    except FileNotFoundError:
+        pass
+
+    with metrics.span('write', table=f'bbc-json/{key}') as write_span:
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(data)
+        write_span.add(bytes=len(data))
+        os.replace(tmp_path, filename)
+    print(f"Saved {filename}" )
+
+
+def save_match_json(game_date, fixture_info=None, raw_archive=None):
+    bbc_json = get_match_json(game_date, fixture_info)
+    write_match_json(game_date, bbc_json, raw_archive)
+
+
+def save_dates_json(dates: List[str], raw_archive=None) -> List[str]:
+    """ 
+        Save the match on each date, finding them all with a single fixtures request
+        for the span of the dates. Returns the dates saved.
+    """
+    fixtures = {}
+    for fixture_info in get_fixture_events(min(dates), max(dates), timeout=ENDPOINT_TIMEOUTS['fixture_info']):
+        fixtures.setdefault(get_fixture_date(fixture_info), fixture_info)
+
+    saved = []
+    for game_date in dates:
+        if game_date not in fixtures:
+            print(f"No match on {game_date}")
+            continue
+        save_match_json(game_date, fixtures[game_date], raw_archive)
+        saved.append(game_date)
+    return saved
+
+
+def project_saved_json(endpoints=None, raw_archive=None) -> Dict[str, int]:
+    """ 
+        Cut files already in bbc-json/ down to their endpoint's projection, archiving
+        the originals first when raw_archive is set. Files that are already projected
+        are left untouched. Returns the bytes saved per endpoint.
+    """
+    raw_archive = raw_archive or RAW_ARCHIVE_DIR
+    saved = {}
+
+    for endpoint in endpoints or list(projections.PROJECTIONS):
+        saved[endpoint] = 0
+        for file in sorted(get_file_list(endpoint)):
+            data = read_json_file(file)
+            projected = projections.project_endpoint(endpoint, data)
+            if projected == data:
+                continue
+
+            game_date = extract_date_from_filename(file)
+            if raw_archive:
+                write_raw_json(game_date, endpoint, data, raw_archive)
+
+            size = corpus.file_state(file)[0]
+            tmp_path = f'{file}.tmp'
+            with open(tmp_path, 'w') as outfile:
+                json.dump(projected, outfile)
+            os.replace(tmp_path, file)
+            saved[endpoint] += size - os.path.getsize(file)
+
+        print(f"Projected bbc-json/{endpoint}: {saved[endpoint] / 1024 / 1024:.1f} MB smaller")
+
+    return saved
+
+
+def backfill_match_json(start_date, end_date, max_workers=MAX_BACKFILL_WORKERS, raw_archive=None) -> List[str]:
+    """ 
+        Save every finished match between two dates from a single fixtures request.
+        Matches are fetched by a pool of max_workers; the transport layer applies the
+        global request cap and per-host rate limits. Returns the dates saved.
+    """
+    fixture_events = get_fixture_events(start_date, end_date, timeout=ENDPOINT_TIMEOUTS['fixture_info'])
+
+    finished = []
+    for fixture_info in fixture_events:
+        if is_finished(fixture_info):
+            finished.append(fixture_info)
+        else:
+            print(f"Skipping {get_fixture_date(fixture_info)}: match not finished")
+
+    saved = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, save_match_json, get_fixture_date(fixture_info), fixture_info, raw_archive): get_fixture_date(fixture_info)
+            for fixture_info in finished
+        }
+        for future in as_completed(futures):
+            game_date = futures[future]
+            try:
+                future.result()
+                saved.append(game_date)
+            except Exception as e:
+                print(f"Error saving {game_date}: {e}")
+
+    print(f"Saved {len(saved)} of {len(finished)} finished matches between {start_date} and {end_date}")
+    return sorted(saved)
 
 
 def name_json_file(date: str) -> str:
@@ -139,14 +476,13 @@ def name_json_file(date: str) -> str:
 
 def read_json_file(file: str) -> Dict:
     """ 
-        Load and return the JSON data from a file. 
+        Load and return the JSON data from a file, loose or packed.
     """
     try:
-        with open(file) as f:
-            return json.load(f)
+        return json_codec.loads(corpus.read_bytes(file))
     except FileNotFoundError:
         raise Exception(f"File {file} not found.")
-    except json.JSONDecodeError:
+    except ValueError:
         raise Exception(f"Error decoding JSON from file {file}.")
 
 
@@ -197,9 +533,10 @@ def get_league_df(div: Dict) -> pd.DataFrame:
 
 def get_file_list(directory: str) -> List[str]:
     """ 
-        Return a list of JSON files in the specified directory. 
+        Return a list of JSON files in the specified directory, including any
+        records in the directory's pack.
     """
-    return glob.glob(f'./bbc-json/{directory}/*.json')
+    return corpus.list_records(directory)
 
 
 def extract_date_from_filename(filename: str) -> str:
@@ -256,43 +593,102 @@ def process_league_table(game_date: str, team_name: str='Tranmere Rovers') -> pd
         return pd.DataFrame()
 
 
-def process_match_stats(data: Dict, game_date: str) -> pd.DataFrame:
+LEAGUE_TABLE_FIELDS = {
+    'rank': 'rank',
+    'name': 'team_name',
+    'matchesPlayed': 'p',
+    'wins': 'w',
+    'draws': 'd',
+    'losses': 'l',
+    'goalsScoredFor': 'gf',
+    'goalsScoredAgainst': 'ga',
+    'goalDifference': 'gd',
+    'points': 'points'
+}
+
+
+@projections.reads('table', {
+    'tournaments': {
+        'name': True,
+        'stages': {'rounds': {'name': True, 'participants': {field: True for field in LEAGUE_TABLE_FIELDS}}}
+    }
+})
+def league_table_rows(data: Dict, game_date: str, team_name: str='Tranmere Rovers') -> List[Dict]:
+    """ 
+        Return the rows of the division containing the team, tagged with the game date.
     """
-        Process match stats for an individual game.
+    divs = get_divs(data)
+    div = find_team_div(divs, team_name)
+
+    if not div:
+        return []
+
+    league_name = get_league_name(data)
+    cup_div = get_cup_division(div)
+
+    rows = []
+    for participant in div['participants']:
+        row = {'league_name': league_name, 'cup_div': cup_div}
+        for field, column in LEAGUE_TABLE_FIELDS.items():
+            row[column] = participant.get(field)
+        row['game_date'] = game_date
+        rows.append(row)
+    return rows
+
+
+def flatten_stats(stats: Dict, prefix: str='') -> Dict:
+    """ 
+        Flatten nested stats into dotted keys, as pd.json_normalize does.
+    """
+    flat = {}
+    for key, value in stats.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten_stats(value, f'{name}.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+@projections.reads('match_stats', {'homeTeam': projections.STATS_TEAM, 'awayTeam': projections.STATS_TEAM})
+def match_stats_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return one row of match stats per team for an individual game.
     """
     both_teams = []
 
     try:
         for team in ['homeTeam', 'awayTeam']:
-            team_name = data[team]['name']['fullName']
-            team_venue = data[team]['alignment']
-
-            team_stats = pd.json_normalize(data[team]['stats'])
-            team_stats.columns = team_stats.columns.str.replace('.total', '')
-
-            default_cols = team_stats.columns.tolist()
-
-            team_stats['game_date'] = game_date
-            team_stats['team_name'] = team_name
-            team_stats['team_venue'] = team_venue
+            team_stats = {
+                'game_date': game_date,
+                'team_name': data[team]['name']['fullName'],
+                'team_venue': data[team]['alignment']
+            }
 
-            df_cols = ['game_date', 'team_name', 'team_venue'] + default_cols
-            team_stats = team_stats[df_cols]
+            # Matches the regex replace the CSV columns were originally built with.
+            for key, value in flatten_stats(data[team]['stats']).items():
+                team_stats[re.sub('.total', '', key)] = value
 
             both_teams.append(team_stats)
 
-        both_teams_df = pd.concat(both_teams)
-
-        return both_teams_df
+        return both_teams
 
     except Exception as e:
         print(f"Error processing {game_date}: {e}")
-        return pd.DataFrame()
+        return []
 
 
-def process_lineups_df(data: Dict) -> pd.DataFrame:
+def process_match_stats(data: Dict, game_date: str) -> pd.DataFrame:
     """
-        Process the lineups JSON data into a DataFrame.
+        Process match stats for an individual game.
+    """
+    return pd.DataFrame(match_stats_rows(data, game_date))
+
+
+@projections.reads('lineups', {'homeTeam': projections.LINEUP_TEAM, 'awayTeam': projections.LINEUP_TEAM})
+def lineups_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return one row per player in both squads.
     """
     both_teams = []
 
@@ -313,7 +709,7 @@ def process_lineups_df(data: Dict) -> pd.DataFrame:
                     forename = player['name']['first']
                     short_name = player['name']['short']
                     full_name = f"{forename} {surname}"
-                    player_id = extract_player_id(player['playerUrn'])
+                    player_id = extract_player_id(player['urn'])
                     shirt_no = player['shirtNumber']
                     position = player['position']
 
@@ -402,19 +798,29 @@ def process_lineups_df(data: Dict) -> pd.DataFrame:
                     }
 
                     both_teams.append(player_data)
-            
-            return pd.DataFrame(both_teams).sort_values(by=['game_date', 'team_venue', 'shirt_no'], ascending = [True, False, True]).reset_index(drop=True)
                     
         except Exception as e:
             print(f"Error processing {team} on {game_date}: {e}")
-            return pd.DataFrame()
+            return []
 
+    return sorted(both_teams, key=lambda row: (row['team_venue'] != 'home', row['shirt_no']))
 
-def process_officials(data: Dict, game_date: str) -> pd.DataFrame:
-    all_officials = []
+
+def process_lineups_df(data: Dict, game_date: str) -> pd.DataFrame:
+    """
+        Process the lineups JSON data into a DataFrame.
+    """
+    return pd.DataFrame(lineups_rows(data, game_date))
+
+
+@projections.reads('lineups', {'officials': projections.OFFICIAL})
+def officials_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return one row per match official, from a lineups file or API response.
+    """
+    match_officials = []
 
     if 'officials' in data.keys() and len(data['officials']) > 0:
-        match_officials = []
 
         for official in data['officials']:
             
@@ -441,14 +847,24 @@ def process_officials(data: Dict, game_date: str) -> pd.DataFrame:
             }
 
             match_officials.append(official_data)
-        return pd.DataFrame(all_officials)
-    else:
-        return pd.DataFrame()
+
+    return match_officials
+
+
+def process_officials(data: Dict, game_date: str) -> pd.DataFrame:
+    return pd.DataFrame(officials_rows(data, game_date))
     
 
-def process_assists(data: Dict, game_date: str) -> pd.DataFrame:
+@projections.reads('match_info', {
+    'sportDataEvent': {
+        'home': {'fullName': True},
+        'away': {'fullName': True},
+        'groupedActions': {'groupName': projections.NAME, 'homeTeamActions': True, 'awayTeamActions': True}
+    }
+})
+def assists_rows(data: Dict, game_date: str) -> List[Dict]:
     """
-        Process assists data for an individual game.
+        Return assists for an individual game.
         Takes in JSON data from a match_info file or API response.
     """
     all_assists = []
@@ -466,7 +882,7 @@ def process_assists(data: Dict, game_date: str) -> pd.DataFrame:
                     'awayTeamActions': data['sportDataEvent']['away']['fullName']
                 }
 
-                for team in team_actions.key():
+                for team in team_actions.keys():
                     if team in action.keys():
                         team_assists = action[team]
 
@@ -489,14 +905,82 @@ def process_assists(data: Dict, game_date: str) -> pd.DataFrame:
                                     'assist_min_inj': assist_min_inj
                                 }
                                 all_assists.append(assist_data)
-        return pd.DataFrame(all_assists)
     else:
         print(f"No assists found for {game_date}")
-        return pd.DataFrame()
-    
-def process_scores(data: Dict, game_date: str) -> pd.DataFrame:
+
+    return all_assists
+
+
+def process_assists(data: Dict, game_date: str) -> pd.DataFrame:
     """
-        Process HT and FT scores for an individual game.
+        Process assists data for an individual game.
+        Takes in JSON data from a match_info file or API response.
+    """
+    return pd.DataFrame(assists_rows(data, game_date))
+
+
+# Values the BBC left blank, filled in by hand: one row per (table, game_date,
+# column). Extraction doesn't track this file, so re-extract the table after
+# editing it.
+CORRECTIONS_FILE = os.environ.get('BBC_CORRECTIONS_FILE', './data/corrections.csv')
+
+
+@functools.lru_cache(maxsize=None)
+def load_corrections(path: str=CORRECTIONS_FILE) -> Dict[Tuple[str, str, str], str]:
+    try:
+        with open(path, newline='') as infile:
+            return {(row['table'], row['game_date'], row['column']): row['value'] for row in csv.DictReader(infile)}
+    except FileNotFoundError:
+        return {}
+
+
+def correction(table: str, game_date: str, column: str) -> Optional[str]:
+    return load_corrections().get((table, game_date, column))
+
+
+@projections.reads('match_info', {
+    'sportDataEvent': {
+        'tournament': {'name': True, 'disambiguatedName': True},
+        'stage': {'name': True},
+        'round': {'name': True},
+        'time': {'displayTimeUK': True},
+        'venue': {'name': True},
+        'attendance': {'value': True}
+    }
+})
+def match_info_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return competition, kick-off, venue and attendance for an individual game.
+        Takes in JSON data from a match_info file or API response.
+    """
+    event = data['sportDataEvent']
+
+    attendance = event.get('attendance', {}).get('value')
+    if attendance is None and 'attendance' in event:
+        attendance = correction('match_info', game_date, 'attendance')
+
+    return [{
+        'game_date': game_date,
+        'competition': event['tournament']['name'],
+        'competition_long': event['tournament']['disambiguatedName'],
+        'comp_stage': event.get('stage', {}).get('name'),
+        'comp_round': event.get('round', {}).get('name'),
+        'ko_time': event['time']['displayTimeUK'],
+        'venue': event.get('venue', {}).get('name'),
+        'attendance': attendance
+    }]
+
+
+def process_match_info(data: Dict, game_date: str) -> pd.DataFrame:
+    return pd.DataFrame(match_info_rows(data, game_date))
+
+
+@projections.reads('match_info', {
+    'sportDataEvent': {'home': projections.EVENT_SCORES, 'away': projections.EVENT_SCORES}
+})
+def scores_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return HT, FT, extra-time and penalty scores for an individual game.
         Takes in JSON data from a match_info file or API response.
     """
 
@@ -512,6 +996,11 @@ def process_scores(data: Dict, game_date: str) -> pd.DataFrame:
 
         ft_score = team_info['runningScores']['fulltime']
 
+        if 'extratime' in team_info['runningScores'].keys():
+            et_score = team_info['runningScores']['extratime']
+        else:
+            et_score = None
+
         if 'penaltyShootoutScore' in team_info['runningScores'].keys():
             pens_score = team_info['runningScores']['penaltyShootoutScore']
         else:
@@ -523,16 +1012,65 @@ def process_scores(data: Dict, game_date: str) -> pd.DataFrame:
             'team_venue': team_venue,
             'ht_score': ht_score,
             'ft_score': ft_score,
+            'et_score': et_score,
             'pens_score': pens_score
         }
 
         all_score_data.append(scores_data)
     
-    return pd.DataFrame(all_score_data)
+    return all_score_data
 
-def process_goals(data: Dict, game_date: str) -> pd.DataFrame:
+
+def process_scores(data: Dict, game_date: str) -> pd.DataFrame:
     """
-        Process goal data for an individual game.
+        Process HT and FT scores for an individual game.
+        Takes in JSON data from a match_info file or API response.
+    """
+    return pd.DataFrame(scores_rows(data, game_date))
+
+
+def goal_rows(game_date: str, team_name: str, action: Dict) -> List[Dict]:
+    """
+        Return one row per goal in a player's goal action.
+    """
+    goal_data = []
+
+    player_name = action['playerName']
+
+    bbc_player_id = action['playerUrn']
+    player_id = extract_player_id(bbc_player_id)
+
+    for goal in action['actions']:
+
+        goal_min = goal['timeLabel']['value'].replace("'", '')
+
+        goal_type = goal['type']
+        
+        goal_min_inj = None
+        if '+' in goal_min:
+            inj_goal = goal_min.split('+')
+            goal_min = inj_goal[0]
+            goal_min_inj = inj_goal[1]
+
+        goal_data.append({
+            'game_date': game_date,
+            'team_name': team_name,
+            'player_name': player_name,
+            'bbc_player_id': player_id,
+            'goal_min': goal_min,
+            'goal_min_inj': goal_min_inj,
+            'goal_type': goal_type
+        })
+
+    return goal_data
+
+
+@projections.reads('match_info', {
+    'sportDataEvent': {'home': projections.EVENT_GOALS, 'away': projections.EVENT_GOALS}
+})
+def goals_rows(data: Dict, game_date: str) -> List[Dict]:
+    """
+        Return goals for an individual game.
         Takes in JSON data from a match_info file or API response.
     """
     all_goals = []
@@ -541,175 +1079,181 @@ def process_goals(data: Dict, game_date: str) -> pd.DataFrame:
         team_info = data['sportDataEvent'][team]
 
         if 'actions' in team_info.keys():
-            actions = team_info['actions']
-
             team_name = team_info['fullName']
 
-            for action in actions:
-
+            for action in team_info['actions']:
                 if action['actionType'] == 'goal':
-                    
-                    player_name = action['playerName']
+                    all_goals.extend(goal_rows(game_date, team_name, action))
 
-                    bbc_player_id = action['playerUrn']
-                    player_id = extract_player_id(bbc_player_id)
+    return all_goals
 
-                    goals = action['actions']
 
-                    for goal in goals:
+def process_goals(data: Dict, game_date: str) -> pd.DataFrame:
+    """
+        Process goal data for an individual game.
+        Takes in JSON data from a match_info file or API response.
+    """
+    return pd.DataFrame(goals_rows(data, game_date))
 
-                        goal_min = goal['timeLabel']['value'].replace("'", '')
 
-                        goal_type = goal['type']
-                        
-                        goal_min_inj = None
-                        if '+' in goal_min:
-                            inj_goal = goal_min.split('+')
-                            goal_min = inj_goal[0]
-                            goal_min_inj = inj_goal[1]
+@projections.reads('sameday_fixtures', {
+    'events': {'status': True, 'home': projections.EVENT_SCORES, 'away': projections.EVENT_SCORES}
+})
+def sameday_fixture_rows(game: Dict, game_date: str) -> List[Dict]:
+    """
+        Return one row of scores per team for a single game in a same-day fixtures response.
+    """
+    if game['status'] in ('Cancelled', 'Postponed'):
+        return []
 
-                        goal_data = {
-                            'game_date': game_date,
-                            'team_name': team_name,
-                            'player_name': player_name,
-                            'bbc_player_id': player_id,
-                            'goal_min': goal_min,
-                            'goal_min_inj': goal_min_inj,
-                            'goal_type': goal_type
-                        }
-                        all_goals.append(goal_data)
+    home_team = game['home']['fullName']
 
-def process_sameday_fixtures(data: Dict, game_date: str) -> pd.DataFrame:
-    all_sameday_fixtures = []
+    away_team = game['away']['fullName']
 
-    games = data['events']
+    all_score_data = []
+    for team in ['home', 'away']:
 
-    for game in games:
+        team_info = game[team]
 
-            if game['status'] != 'Cancelled':
+        team_name = team_info['fullName']
 
-                    home_team = game['home']['fullName']
+        ht_score = team_info['runningScores']['halftime']
 
-                    away_team = game['away']['fullName']
-            
-                    for team in ['home', 'away']:
-                            
-                            team_info = game[team]
+        ft_score = team_info['runningScores']['fulltime']
 
-                            team_name = team_info['fullName']
+        if 'penaltyShootoutScore' in team_info['runningScores'].keys():
+            pen_score = team_info['runningScores']['penaltyShootoutScore']
+        else:
+            pen_score = None
 
-                            ht_score = team_info['runningScores']['halftime']
+        scores_data = {
+            'game_date': game_date,
+            'home_team': home_team,
+            'away_team': away_team,
+            'team_name': team_name,
+            'ht_score': ht_score,
+            'ft_score': ft_score,
+            'pen_score': pen_score
+        }
 
-                            ft_score = team_info['runningScores']['fulltime']
+        all_score_data.append(scores_data)
 
-                            if 'penaltyShootoutScore' in team_info['runningScores'].keys():
-                                    pen_score = team_info['runningScores']['penaltyShootoutScore']
-                            else:
-                                    pen_score = None
+    return all_score_data
 
-                            scores_data = {
-                                    'game_date': game_date,
-                                    'home_team': home_team,
-                                    'away_team': away_team,
-                                    'team_name': team_name,
-                                    'ht_score': ht_score,
-                                    'ft_score': ft_score,
-                                    'pen_score': pen_score
-                            }
 
-                            all_sameday_fixtures.append(scores_data)
+def sort_sameday_fixtures(rows: List[Dict]) -> List[Dict]:
+    return sorted(rows, key=lambda row: row['home_team'])
 
-    return pd.DataFrame(all_sameday_fixtures)
 
+def sameday_fixtures_rows(data: Dict, game_date: str) -> List[Dict]:
+    return sort_sameday_fixtures(rows_from_items(data['events'], game_date, sameday_fixture_rows))
 
-def process_sameday_fixture_scores(data: Dict, game_date: str) -> pd.DataFrame:
-    games = data['events']
-    
-    all_sameday_scorers = []
-    
-    for game in games:
 
-        if game['status'] != 'Cancelled':
+def process_sameday_fixtures(data: Dict, game_date: str) -> pd.DataFrame:
+    return pd.DataFrame(sameday_fixtures_rows(data, game_date))
 
-                for team in ['home', 'away']:
 
-                    team_info = game[team]
+@projections.reads('sameday_fixtures', {
+    'events': {'status': True, 'home': projections.EVENT_GOALS, 'away': projections.EVENT_GOALS}
+})
+def sameday_fixture_scorer_rows(game: Dict, game_date: str) -> List[Dict]:
+    """
+        Return one row per goal for a single game in a same-day fixtures response.
+    """
+    if game['status'] in ('Cancelled', 'Postponed'):
+        return []
 
-                    team_name = team_info['fullName']
-    
-                    if 'actions' in team_info.keys():
-                        actions = team_info['actions']
+    all_scorers = []
+    for team in ['home', 'away']:
+
+        team_info = game[team]
+
+        team_name = team_info['fullName']
+
+        if 'actions' in team_info.keys():
+            for action in team_info['actions']:
 
-                        for action in actions:
+                if action['actionType'] == 'goal':
+                    all_scorers.extend(goal_rows(game_date, team_name, action))
 
-                                if action['actionType'] == 'goal':
-                                
-                                        player_name = action['playerName']
+    return all_scorers
 
-                                        bbc_player_id = action['playerUrn']
-                                        player_id = extract_player_id(bbc_player_id)
 
-                                        goals = action['actions']
+def sort_sameday_scorers(rows: List[Dict]) -> List[Dict]:
+    # goal_min is still text here, so '9' sorts after '45', as it always has.
+    return sorted(rows, key=lambda row: (row['team_name'], row['goal_min']))
 
-                                        for goal in goals:
 
-                                                goal_min = goal['timeLabel']['value'].replace("'", '')
+def sameday_fixture_scores_rows(data: Dict, game_date: str) -> List[Dict]:
+    return sort_sameday_scorers(rows_from_items(data['events'], game_date, sameday_fixture_scorer_rows))
 
-                                                goal_min_inj = None
-                                                if '+' in goal_min:
-                                                        inj_goal = goal_min.split('+')
-                                                        goal_min = inj_goal[0]
-                                                        goal_min_inj = inj_goal[1]
 
-                                                goal_type = goal['type']
+def process_sameday_fixture_scores(data: Dict, game_date: str) -> pd.DataFrame:
+    return pd.DataFrame(sameday_fixture_scores_rows(data, game_date))
 
-                                                goal_data = {
-                                                        'game_date': game_date,
-                                                        'team_name': team_name,
-                                                        'player_name': player_name,
-                                                        'bbc_player_id': player_id,
-                                                        'goal_min': goal_min,
-                                                        'goal_min_inj': goal_min_inj,
-                                                        'goal_type': goal_type
-                                                }
-                                                all_sameday_scorers.append(goal_data)
-    return pd.DataFrame(all_sameday_scorers)
 
+@projections.reads('commentary', {
+    'results': {'dates': True, 'content': projections.PARAGRAPHS, 'headline': projections.TEXT}
+})
+def commentary_item_rows(comm: Dict, game_date: str) -> List[Dict]:
+    """
+        Return the row for a single commentary entry.
+    """
+    comm_min = comm['dates']['time'].replace("'", '')
 
-def process_commentary(data: Dict, game_date: str) -> pd.DataFrame:
-    all_commentary = []
+    if '+' in comm_min:
+        inj_comm = comm_min.split('+')
+        comm_min = inj_comm[0]
+        comm_min_inj = inj_comm[1]
+    else:
+        comm_min_inj = None
+    
+    comm_text = comm['content']['model']['blocks'][0]['model']['blocks'][0]['model']['text']
 
-    pages = data
+    headline = comm['headline']
 
-    for page in pages:
-        comms = page['results']
+    if headline:
+        headline = headline['model']['blocks'][0]['model']['text']
 
-        for comm in comms:
+    return [{
+        'game_date': game_date,
+        'comm_min': comm_min,
+        'comm_min_inj': comm_min_inj,
+        'comm_text': comm_text,
+        'headline': headline
+    }]
 
-            comm_min = comm['dates']['time'].replace("'", '')
 
-            if '+' in comm_min:
-                inj_comm = comm_min.split('+')
-                comm_min = inj_comm[0]
-                comm_min_inj = inj_comm[1]
-            else:
-                comm_min_inj = None
-            
-            comm_text = comm['content']['model']['blocks'][0]['model']['blocks'][0]['model']['text']
+def sort_commentary(rows: List[Dict]) -> List[Dict]:
+    return sorted(rows, key=lambda row: row['comm_min'])
 
-            headline = comm['headline']
 
-            if headline:
-                headline = headline['model']['blocks'][0]['model']['text']
+def commentary_rows(data: List[Dict], game_date: str) -> List[Dict]:
+    comms = (comm for page in data for comm in page['results'])
+    return sort_commentary(rows_from_items(comms, game_date, commentary_item_rows))
+
+
+def process_commentary(data: List[Dict], game_date: str) -> pd.DataFrame:
+    return pd.DataFrame(commentary_rows(data, game_date))
+
+
+def rows_from_items(items: Iterable[Dict], game_date: str, item_rows: Callable[[Dict, str], List[Dict]]) -> List[Dict]:
+    """
+        Apply a per-item row extractor to every item of a payload's list, which may
+        be a decoded list or a stream from json_codec.iter_items.
+    """
+    rows = []
+    for item in items:
+        rows.extend(item_rows(item, game_date))
+    return rows
 
-            comm_data = {
-                'game_date': game_date,
-                'comm_min': comm_min,
-                'comm_min_inj': comm_min_inj,
-                'comm_text': comm_text,
-                'headline': headline
-            }
 
-            all_commentary.append(comm_data)
+# Per-item extractors for the large payloads, as table -> (ijson-style prefix of
+# the items in the endpoint's JSON, item rows, finishing step). Extracting these
+# decodes one item at a time, so memory doesn't grow with the payload.
+STREAMED_ROWS: Dict[str, Tuple[str, Callable[[Dict, str], List[Dict]], Optional[Callable[[List[Dict]], List[Dict]]]]] = {
+    'sameday_fixtures': ('events.item', sameday_fixture_rows, sort_sameday_fixtures),
+    'sameday_scorers': ('events.item', sameday_fixture_scorer_rows, sort_sameday_scorers),
+    'commentary': ('item.results.item', commentary_item_rows, sort_commentary)
+}
 
-    return pd.DataFrame(all_commentary).sort_values(by=['game_date', 'comm_min']).reset_index(drop=True)
\ No newline at end of file
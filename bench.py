@@ -0,0 +1,297 @@
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import api_matchday_json as api
+import corpus
+import extract
+import updater
+
+
+# Results of earlier runs, keyed by scale, for regressions to be judged against.
+# Timings only mean anything on the machine that took them, so it isn't committed.
+BASELINE_FILE = os.environ.get('BBC_BENCH_BASELINE', './bench_baseline.json')
+
+# A stage regresses when its time or peak memory grows by more than this
+# fraction of the baseline...
+THRESHOLD = 0.2
+
+# ...and by more than these absolute amounts, so noise on fast stages isn't flagged.
+MIN_SECONDS = 0.05
+MIN_RSS_MB = 10
+
+REPEAT = 3
+
+# Pipeline methods timed over every match in data/scores, by stage name.
+BUILDERS = {
+    'update.results': 'build_results',
+    'update.player_apps': 'get_player_apps',
+    'update.goals': 'get_goals',
+    'update.subs': 'get_subs',
+    'update.sub_mins': 'get_sub_mins',
+    'update.yellow_cards': 'get_yellow_cards'
+}
+
+
+def extractor_stage(table: str) -> Callable[[], int]:
+    """
+        One table's row extractor over every file of its endpoint, in this process.
+    """
+    def run() -> int:
+        endpoint, _ = extract.EXTRACTORS[table]
+        return sum(len(extract.extract_file((file, [table]))[table]) for file in sorted(api.get_file_list(endpoint)))
+    return run
+
+
+def extraction_stage() -> int:
+    """
+        A full extraction of every table, as `main.py extract --full` runs it.
+    """
+    return sum(extract.run_extraction(full=True).values())
+
+
+def builder_stage(method: str) -> Callable[[], int]:
+    """
+        A Pipeline method over every match, starting from a cold Pipeline so that
+        reading its input tables is counted.
+    """
+    def run() -> int:
+        pipeline = updater.Pipeline()
+        dates = sorted(pipeline.table('scores').game_date.unique())
+        return len(getattr(pipeline, method)(dates))
+    return run
+
+
+STAGES: Dict[str, Callable[[], int]] = {
+    **{f'extract.{table}': extractor_stage(table) for table in extract.EXTRACTORS},
+    'extract': extraction_stage,
+    **{stage: builder_stage(method) for stage, method in BUILDERS.items()}
+}
+
+
+def peak_rss_mb() -> float:
+    """
+        Peak resident memory of this process or any child it has waited for.
+    """
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def shift_date(game_date: str, days: int) -> str:
+    return (datetime.date.fromisoformat(game_date) - datetime.timedelta(days=days)).isoformat()
+
+
+def copy_offset(dates: List[str]) -> int:
+    """
+        Days between synthetic copies of the corpus: whole 52-week blocks longer
+        than the corpus spans, so copies never share a date and keep their weekdays.
+    """
+    span = (datetime.date.fromisoformat(max(dates)) - datetime.date.fromisoformat(min(dates))).days
+    return 364 * (span // 364 + 1)
+
+
+def build_workspace(workspace: str, scale: int=1) -> None:
+    """
+        Copy the bbc-json corpus and the non-extracted inputs into a workspace,
+        repeating the corpus `scale` times with each copy moved back a further
+        block of seasons. Endpoints that are packed here are packed there too.
+    """
+    endpoints = sorted({endpoint for endpoint, _ in extract.EXTRACTORS.values()})
+    files = {endpoint: api.get_file_list(endpoint) for endpoint in endpoints}
+    offset = copy_offset([api.extract_date_from_filename(file) for endpoint_files in files.values() for file in endpoint_files])
+
+    for endpoint in endpoints:
+        records = {}
+        for file in files[endpoint]:
+            data, mtime = corpus.read_bytes(file), corpus.file_state(file)[1]
+            game_date = api.extract_date_from_filename(file)
+            for copy in range(scale):
+                records[shift_date(game_date, copy * offset)] = (data, mtime)
+
+        pack = corpus.open_pack(endpoint)
+        if pack is not None:
+            corpus.write_pack(f'{workspace}/bbc-json/{endpoint}.{corpus.PACK_EXTENSION}', records, pack.codec)
+            continue
+
+        os.makedirs(f'{workspace}/bbc-json/{endpoint}', exist_ok=True)
+        for game_date, (data, _) in records.items():
+            with open(f'{workspace}/bbc-json/{endpoint}/{game_date}.json', 'wb') as outfile:
+                outfile.write(data)
+
+    extracted = {f'{table}.{extension}' for table in extract.EXTRACTORS for extension in ['csv', 'parquet']}
+    shutil.copytree(
+        updater.DATA_DIR, f'{workspace}/data',
+        ignore=lambda directory, names: [name for name in names if name in extracted or name in {extract.MANIFEST_FILE, 'standings.npz', '.keys'}]
+    )
+    shutil.copytree(updater.R_DIR, f'{workspace}/data-r', ignore=shutil.ignore_patterns('.keys'))
+
+
+def prepare_workspace(workspace: str) -> int:
+    """
+        Build the workspace's data/ tables once, untimed, for the builder stages.
+    """
+    os.chdir(workspace)
+    return sum(extract.run_extraction(full=True).values())
+
+
+def run_stage(workspace: str, stage: str, repeat: int) -> Dict:
+    """
+        Time a stage in the workspace. Runs in a fresh process, so the peak memory
+        is the stage's own.
+    """
+    os.chdir(workspace)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = STAGES[stage]()
+        times.append(time.perf_counter() - started)
+
+    seconds = statistics.median(times)
+    return {
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def discard_output() -> None:
+    """
+        Send a stage process's stdout to /dev/null, at the file descriptor so the
+        extraction's own worker processes inherit it, keeping the report clean.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
+    sys.stdout = open(os.devnull, 'w')
+
+
+def in_new_process(func: Callable, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'), initializer=discard_output) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run_benchmarks(stages: Optional[List[str]]=None, scale: int=1, repeat: int=REPEAT) -> Dict[str, Dict]:
+    """
+        Run each stage over a copy of the corpus repeated `scale` times and return
+        its rows, median seconds, rows per second and peak RSS.
+    """
+    if scale < 1:
+        raise ValueError(f"Scale must be at least 1, not {scale}")
+    stages = stages or list(STAGES)
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}. Choose from: {', '.join(STAGES)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bbc-bench-') as workspace:
+        print(f"Building a {scale}x workspace in {workspace}")
+        build_workspace(workspace, scale)
+        if any(stage.startswith('update.') for stage in stages):
+            in_new_process(prepare_workspace, workspace)
+
+        for stage in stages:
+            results[stage] = in_new_process(run_stage, workspace, stage, repeat)
+            print(format_result(stage, results[stage]))
+    return results
+
+
+def format_result(stage: str, result: Dict, change: str='') -> str:
+    rows_per_sec = f"{result['rows_per_sec']:>12,.0f}" if result['rows_per_sec'] is not None else f"{'-':>12}"
+    return f"{stage:<26}{result['rows']:>10,}{result['seconds']:>10.3f}s{rows_per_sec}/s{result['peak_rss_mb']:>9.1f} MB  {change}".rstrip()
+
+
+def environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'recorded': datetime.datetime.now().isoformat(timespec='seconds')
+    }
+
+
+def load_baseline(path: str=BASELINE_FILE) -> Dict:
+    try:
+        with open(path) as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: Dict[str, Dict], scale: int, path: str=BASELINE_FILE) -> None:
+    """
+        Record a run as the baseline for its scale, keeping other scales' baselines.
+    """
+    baseline = load_baseline(path)
+    baseline[str(scale)] = {'environment': environment(), 'stages': results}
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(baseline, outfile, indent=2)
+    os.replace(tmp_path, path)
+    print(f"Saved the {scale}x baseline to {path}")
+
+
+def is_regression(new: float, old: float, threshold: float, min_delta: float) -> bool:
+    return new > old * (1 + threshold) and new - old > min_delta
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float=THRESHOLD) -> List[str]:
+    """
+        Print each stage against its baseline and return the stages that regressed.
+    """
+    regressions = []
+    for stage, result in results.items():
+        old = baseline.get(stage)
+        if old is None:
+            print(format_result(stage, result, '(no baseline)'))
+            continue
+
+        changes = []
+        regressed = False
+        for metric, min_delta in [('seconds', MIN_SECONDS), ('peak_rss_mb', MIN_RSS_MB)]:
+            if old[metric]:
+                changes.append(f"{metric} {(result[metric] / old[metric] - 1):+.0%}")
+            regressed |= is_regression(result[metric], old[metric], threshold, min_delta)
+        if result['rows'] != old['rows']:
+            changes.append(f"rows {old['rows']:,} -> {result['rows']:,}")
+
+        if regressed:
+            regressions.append(stage)
+        print(format_result(stage, result, ', '.join(changes) + ('  REGRESSION' if regressed else '')))
+    return regressions
+
+
+def benchmark(stages: Optional[List[str]]=None, scale: int=1, repeat: int=REPEAT, save: bool=False, threshold: float=THRESHOLD, path: str=BASELINE_FILE) -> List[str]:
+    """
+        Run the benchmarks, compare them with the baseline for the same scale and
+        optionally save them as the new baseline. Returns the stages that regressed.
+    """
+    results = run_benchmarks(stages, scale, repeat)
+    baseline = load_baseline(path).get(str(scale))
+
+    regressions = []
+    if baseline is not None:
+        print(f"\nAgainst the {scale}x baseline recorded {baseline['environment']['recorded']} (threshold {threshold:.0%}):")
+        if baseline['environment']['platform'] != platform.platform():
+            print(f"Note: the baseline was recorded on {baseline['environment']['platform']}")
+        regressions = compare(results, baseline['stages'], threshold)
+        print(f"{len(regressions)} regressions" + (f": {', '.join(regressions)}" if regressions else ''))
+    else:
+        print(f"\nNo {scale}x baseline in {path}")
+
+    if save:
+        save_baseline(results, scale, path)
+    return regressions
+
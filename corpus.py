@@ -0,0 +1,272 @@
+import glob
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+
+ROOT = './bbc-json'
+
+# A pack is one file per endpoint, '<ROOT>/<endpoint>.pack': a header, every
+# record back to back, then a JSON index of date -> (offset, length, size, mtime)
+# and a footer giving the index's offset. Records are read through mmap, so
+# decoding one match never touches the rest of the file.
+PACK_EXTENSION = 'pack'
+MAGIC = b'BBCPACK1'
+FOOTER = struct.Struct('<Q8s')
+
+DEFAULT_CODEC = None
+
+# pack_endpoint's codec for keeping whatever codec an existing pack uses. None
+# writes records uncompressed.
+KEEP_CODEC = 'keep'
+
+_packs_lock = threading.Lock()
+_packs: Dict[str, Tuple[Tuple[int, int, int], 'Pack']] = {}
+
+
+def zstd_codec() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import zstandard
+
+    return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+
+
+def zlib_codec() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import zlib
+
+    return zlib.compress, zlib.decompress
+
+
+# Per-record compression, as (compress, decompress). zstd needs the optional
+# zstandard package; zlib is always available.
+CODECS: Dict[str, Callable[[], Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]] = {
+    'zstd': zstd_codec,
+    'zlib': zlib_codec
+}
+
+
+def pack_path(endpoint: str) -> str:
+    return f'{ROOT}/{endpoint}.{PACK_EXTENSION}'
+
+
+def record_name(endpoint: str, game_date: str) -> str:
+    """
+        The name a record goes by in either layout: the path it has as a loose file.
+    """
+    return f'{ROOT}/{endpoint}/{game_date}.json'
+
+
+def split_name(file: str) -> Tuple[str, str]:
+    """
+        (endpoint, game_date) for a record name.
+    """
+    endpoint, filename = file.split('/')[-2:]
+    return endpoint, filename.split('.')[0]
+
+
+class Pack:
+    """
+        A read-only, memory-mapped pack file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise Exception(f"{path} is not a bbc-json pack.")
+
+        index_offset, magic = FOOTER.unpack(self.buffer[-FOOTER.size:])
+        if magic != MAGIC:
+            raise Exception(f"{path} is truncated.")
+
+        index = json.loads(self.buffer[index_offset:-FOOTER.size])
+        self.codec = index['codec']
+        self.records: Dict[str, List] = index['records']
+        self.decompress = CODECS[self.codec]()[1] if self.codec else None
+
+    def dates(self) -> List[str]:
+        return list(self.records)
+
+    def read(self, game_date: str) -> bytes:
+        offset, length, _, _ = self.records[game_date]
+        data = self.buffer[offset:offset + length]
+        return self.decompress(data) if self.decompress else data
+
+    def state(self, game_date: str) -> Tuple[int, float]:
+        """
+            (size, mtime) of the file the record was packed from.
+        """
+        _, _, size, mtime = self.records[game_date]
+        return size, mtime
+
+    def close(self) -> None:
+        self.buffer.close()
+
+
+def open_pack(endpoint: str) -> Optional[Pack]:
+    """
+        The endpoint's pack, or None if it has none. Packs are opened once per
+        process and reopened when the file is replaced.
+    """
+    path = pack_path(endpoint)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _packs_lock:
+        cached = _packs.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        pack = Pack(path)
+        _packs[path] = (key, pack)
+    if cached is not None:
+        # The file was replaced; release the old mapping rather than keeping it
+        # (and the replaced file's disk space) for the life of the process.
+        cached[1].close()
+    return pack
+
+
+def forget_pack(endpoint: str) -> None:
+    """
+        Close an endpoint's pack and drop it from the cache, if it was open.
+    """
+    with _packs_lock:
+        cached = _packs.pop(pack_path(endpoint), None)
+    if cached is not None:
+        cached[1].close()
+
+
+def list_records(endpoint: str) -> List[str]:
+    """
+        Names of every record for an endpoint, loose files first. A loose file
+        takes the place of a packed record for the same date.
+    """
+    loose = glob.glob(f'{ROOT}/{endpoint}/*.json')
+    pack = open_pack(endpoint)
+    if pack is None:
+        return loose
+
+    on_disk = set(loose)
+    packed = [record_name(endpoint, game_date) for game_date in pack.dates()]
+    return loose + [file for file in packed if file not in on_disk]
+
+
+def find_record(file: str) -> Tuple[Pack, str]:
+    endpoint, game_date = split_name(file)
+    pack = open_pack(endpoint)
+    if pack is None or game_date not in pack.records:
+        raise FileNotFoundError(file)
+    return pack, game_date
+
+
+def read_bytes(file: str) -> bytes:
+    """
+        A record's JSON, from the loose file if there is one, otherwise from the pack.
+    """
+    try:
+        with open(file, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pack, game_date = find_record(file)
+        return pack.read(game_date)
+
+
+def open_record(file: str) -> BinaryIO:
+    """
+        A binary stream over a record, for parsers that read incrementally.
+    """
+    try:
+        return open(file, 'rb')
+    except FileNotFoundError:
+        pack, game_date = find_record(file)
+        return io.BytesIO(pack.read(game_date))
+
+
+def file_state(file: str) -> Tuple[int, float]:
+    """
+        (size, mtime) of a record. Packed records keep the values of the file they
+        came from, so packing doesn't make them look changed.
+    """
+    try:
+        stat = os.stat(file)
+        return stat.st_size, stat.st_mtime
+    except FileNotFoundError:
+        pack, game_date = find_record(file)
+        return pack.state(game_date)
+
+
+def write_pack(path: str, records: Dict[str, Tuple[bytes, float]], codec: Optional[str]=DEFAULT_CODEC) -> None:
+    """
+        Write records, keyed by date, to a new pack at path. Each record is a
+        (JSON bytes, mtime) pair.
+    """
+    compress = CODECS[codec]()[0] if codec else None
+    index = {'codec': codec, 'records': {}}
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(MAGIC)
+        for game_date in sorted(records):
+            data, mtime = records[game_date]
+            stored = compress(data) if compress else data
+            index['records'][game_date] = [outfile.tell(), len(stored), len(data), mtime]
+            outfile.write(stored)
+
+        index_offset = outfile.tell()
+        outfile.write(json.dumps(index).encode())
+        outfile.write(FOOTER.pack(index_offset, MAGIC))
+    os.replace(tmp_path, path)
+
+
+def pack_endpoint(endpoint: str, codec: Optional[str]=KEEP_CODEC, keep_files: bool=False) -> int:
+    """
+        Fold an endpoint's loose files into its pack, rewriting the pack with any
+        records it already holds. With codec left as KEEP_CODEC, an existing pack
+        keeps its own and a new one gets DEFAULT_CODEC; None writes uncompressed.
+        Loose files are removed once packed unless keep_files is set. Returns the
+        number of records in the pack.
+    """
+    records = {}
+    pack = open_pack(endpoint)
+    if codec == KEEP_CODEC:
+        codec = pack.codec if pack is not None else DEFAULT_CODEC
+    if pack is not None:
+        for game_date in pack.dates():
+            records[game_date] = (pack.read(game_date), pack.state(game_date)[1])
+
+    loose = sorted(glob.glob(f'{ROOT}/{endpoint}/*.json'))
+    for file in loose:
+        with open(file, 'rb') as f:
+            records[split_name(file)[1]] = (f.read(), os.stat(file).st_mtime)
+
+    if not records:
+        return 0
+
+    write_pack(pack_path(endpoint), records, codec)
+    forget_pack(endpoint)
+
+    if not keep_files:
+        for file in loose:
+            os.remove(file)
+
+    print(f"Packed {len(records)} records into {pack_path(endpoint)}")
+    return len(records)
+
+
+def list_endpoints() -> List[str]:
+    """
+        Every endpoint with a directory or a pack under ROOT.
+    """
+    endpoints = set()
+    for entry in os.listdir(ROOT):
+        if os.path.isdir(f'{ROOT}/{entry}'):
+            endpoints.add(entry)
+        elif entry.endswith(f'.{PACK_EXTENSION}'):
+            endpoints.add(entry[:-len(PACK_EXTENSION) - 1])
+    return sorted(endpoints)
@@ -0,0 +1,410 @@
+import contextlib
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import api_matchday_json as api
+import corpus
+import json_codec
+import metrics
+import schemas
+import storage
+
+
+# Output table -> (bbc-json endpoint directory, row extractor).
+EXTRACTORS: Dict[str, Tuple[str, Callable]] = {
+    'lineups': ('lineups', api.lineups_rows),
+    'officials': ('lineups', api.officials_rows),
+    'match_stats': ('match_stats', api.match_stats_rows),
+    'match_info': ('match_info', api.match_info_rows),
+    'scores': ('match_info', api.scores_rows),
+    'goals': ('match_info', api.goals_rows),
+    'assists': ('match_info', api.assists_rows),
+    'league_tables': ('table', api.league_table_rows),
+    'sameday_fixtures': ('sameday_fixtures', api.sameday_fixtures_rows),
+    'sameday_scorers': ('sameday_fixtures', api.sameday_fixture_scores_rows),
+    'commentary': ('commentary', api.commentary_rows)
+}
+
+OUTPUT_DIR = './data'
+
+MANIFEST_FILE = 'extract_manifest.json'
+
+# Files handed to each worker at a time; keeps pickling overhead low.
+CHUNKSIZE = 8
+
+# Up to this many files, as in a live poll, are parsed in this process rather
+# than paying to start a process pool.
+INLINE_MAX_FILES = 8
+
+
+def tables_by_endpoint(tables: List[str]) -> Dict[str, List[str]]:
+    """
+        Group output tables by the endpoint directory they are extracted from.
+    """
+    grouped = defaultdict(list)
+    for table in tables:
+        endpoint, _ = EXTRACTORS[table]
+        grouped[endpoint].append(table)
+    return dict(grouped)
+
+
+def extract_streamed(file: str, game_date: str, tables: List[str]) -> Dict[str, List[Dict]]:
+    """
+        Rows for tables with per-item extractors, decoding the file one item at a
+        time. Tables reading the same items share a single pass over the file.
+    """
+    by_prefix = defaultdict(list)
+    for table in tables:
+        prefix, _, _ = api.STREAMED_ROWS[table]
+        by_prefix[prefix].append(table)
+
+    rows = {table: [] for table in tables}
+    failed = set()
+    for prefix, prefix_tables in by_prefix.items():
+        try:
+            with metrics.span('extract', table='+'.join(prefix_tables)) as extract_span, corpus.open_record(file) as source:
+                items = 0
+                for item in json_codec.iter_items(source, prefix):
+                    items += 1
+                    for table in prefix_tables:
+                        if table in failed:
+                            continue
+                        _, item_rows, _ = api.STREAMED_ROWS[table]
+                        try:
+                            rows[table].extend(item_rows(item, game_date))
+                        except Exception as e:
+                            print(f"Error extracting {table} from {file}: {e}")
+                            failed.add(table)
+                extract_span.add(items=items, rows=sum(len(rows[table]) for table in prefix_tables))
+        except Exception as e:
+            print(f"Error extracting {', '.join(prefix_tables)} from {file}: {e}")
+            failed.update(prefix_tables)
+
+    for table in tables:
+        _, _, finish = api.STREAMED_ROWS[table]
+        if table in failed:
+            rows[table] = []
+        elif finish is not None:
+            rows[table] = finish(rows[table])
+    return rows
+
+
+def extract_file(args: Tuple[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+        Parse one JSON file and return the rows it produces for each table.
+        Runs in a worker process, so it returns plain row lists rather than DataFrames.
+    """
+    file, tables = args
+    game_date = api.extract_date_from_filename(file)
+
+    streamed = [table for table in tables if table in api.STREAMED_ROWS]
+    rows = extract_streamed(file, game_date, streamed) if streamed else {}
+
+    tables = [table for table in tables if table not in api.STREAMED_ROWS]
+    if not tables:
+        return rows
+
+    data = api.read_json_file(file)
+    for table in tables:
+        _, extractor = EXTRACTORS[table]
+        try:
+            with metrics.span('extract', table=table) as extract_span:
+                rows[table] = extractor(data, game_date)
+                extract_span.add(rows=len(rows[table]))
+        except Exception as e:
+            print(f"Error extracting {table} from {file}: {e}")
+            rows[table] = []
+    return rows
+
+
+def extract_file_with_metrics(args: Tuple[str, List[str]]) -> Tuple[Dict[str, List[Dict]], List]:
+    """
+        extract_file, also handing back the spans it recorded, for a run that is
+        collecting metrics from its worker processes.
+    """
+    return extract_file(args), metrics.drain()
+
+
+def extract_rows(tables: List[str], files: Optional[Dict[str, List[str]]]=None, max_workers: Optional[int]=None) -> Dict[str, List[Dict]]:
+    """
+        Fan every endpoint's files out over a process pool and collect rows per table,
+        in file date order. `files` maps endpoint directory to the files to parse and
+        defaults to everything under bbc-json/.
+    """
+    jobs = []
+    for endpoint, endpoint_tables in tables_by_endpoint(tables).items():
+        endpoint_files = files.get(endpoint, []) if files is not None else api.get_file_list(endpoint)
+        jobs.extend((file, endpoint_tables) for file in sorted(endpoint_files))
+
+    all_rows = {table: [] for table in tables}
+
+    if not jobs:
+        return all_rows
+
+    measured = metrics.enabled()
+    worker = extract_file_with_metrics if measured else extract_file
+
+    with contextlib.ExitStack() as stack:
+        if len(jobs) <= INLINE_MAX_FILES:
+            results = map(worker, jobs)
+        else:
+            initializer = metrics.init_worker if measured else None
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers, initializer=initializer))
+            results = pool.map(worker, jobs, chunksize=CHUNKSIZE)
+
+        for file_rows in results:
+            if measured:
+                file_rows, spans = file_rows
+                metrics.merge(spans)
+            for table, rows in file_rows.items():
+                all_rows[table].extend(rows)
+
+    return all_rows
+
+
+def table_frame(table: str, rows: List[Dict], output_dir: str=OUTPUT_DIR) -> pd.DataFrame:
+    """
+        Build the frame written for a table from its rows, typed from the schema
+        registry so each column is written the same way whichever rows are in the
+        frame, e.g. an attendance of 3474 rather than 3474.0 once a match without
+        one is included. Dates are left as the YYYY-MM-DD text they were extracted as.
+    """
+    return schemas.apply_schema(pd.DataFrame(rows), schemas.get_schema(output_dir, table), dates=False)
+
+
+def extract_tables(tables: Optional[List[str]]=None, max_workers: Optional[int]=None) -> Dict[str, pd.DataFrame]:
+    """
+        Extract whole tables from the bbc-json corpus, building each DataFrame once
+        and typing it from the schema registry.
+    """
+    tables = tables or list(EXTRACTORS)
+    return {
+        table: schemas.apply_schema(pd.DataFrame(rows), schemas.get_schema(OUTPUT_DIR, table))
+        for table, rows in extract_rows(tables, max_workers=max_workers).items()
+    }
+
+
+def manifest_path(output_dir: str=OUTPUT_DIR) -> str:
+    return f'{output_dir}/{MANIFEST_FILE}'
+
+
+def load_manifest(output_dir: str=OUTPUT_DIR) -> Dict:
+    """ 
+        Load the record of which JSON files have been extracted, and what they produced.
+    """
+    try:
+        with open(manifest_path(output_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': {}, 'tables': {}}
+
+
+def save_manifest(manifest: Dict, output_dir: str=OUTPUT_DIR) -> None:
+    tmp_path = f'{manifest_path(output_dir)}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(manifest, outfile, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path(output_dir))
+
+
+def file_hash(file: str) -> str:
+    return hashlib.sha256(corpus.read_bytes(file)).hexdigest()
+
+
+def file_state(file: str) -> Dict:
+    size, mtime = corpus.file_state(file)
+    return {'size': size, 'mtime': mtime}
+
+
+def find_changed_files(endpoint: str, tables: List[str], manifest: Dict, full: bool=False) -> Tuple[List[str], List[str]]:
+    """ 
+        Compare an endpoint directory with the manifest.
+        Returns (new or changed files, files that have been deleted). Size and mtime
+        are checked first; a file is only hashed when they differ.
+    """
+    files = api.get_file_list(endpoint)
+    known = manifest['files']
+
+    changed = []
+    for file in sorted(files):
+        entry = known.get(file)
+        if full or entry is None or any(table not in entry['rows'] for table in tables):
+            changed.append(file)
+            continue
+
+        state = file_state(file)
+        if state['size'] == entry['size'] and state['mtime'] == entry['mtime']:
+            continue
+
+        if file_hash(file) == entry['sha256']:
+            entry.update(state)
+        else:
+            changed.append(file)
+
+    prefix = f'./bbc-json/{endpoint}/'
+    on_disk = set(files)
+    deleted = [file for file in known if file.startswith(prefix) and file not in on_disk]
+
+    return changed, deleted
+
+
+def known_dates(table: str, manifest: Dict, files: set, exclude: bool) -> set:
+    """ 
+        Return the dates that already have rows in a table, either from the given
+        files or (with exclude set) from every other file.
+    """
+    return {
+        entry['game_date'] for file, entry in manifest['files'].items()
+        if (file in files) != exclude and entry['rows'].get(table)
+    }
+
+
+def read_lines(filename: str) -> List[str]:
+    try:
+        with open(filename) as infile:
+            return infile.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def report_unreconciled(filename: str, old_lines: List[str], new_lines: List[str]) -> None:
+    """
+        Warn about rows a rebuild dropped or changed, such as rows added to the CSV
+        by hand that no JSON file produces, listing the dates they were on.
+    """
+    if not old_lines or not new_lines or old_lines[0] != new_lines[0]:
+        return
+    lost = Counter(old_lines[1:]) - Counter(new_lines[1:])
+    if not lost:
+        return
+    dates = sorted({line.split(',', 1)[0] for line in lost} if new_lines[0].startswith('game_date,') else [])
+    shown = ', '.join(dates[:10]) + (', ...' if len(dates) > 10 else '')
+    print(f"Warning: rebuilding {filename} dropped or changed {sum(lost.values())} rows that no JSON file produces as they were" + (f" (dates: {shown})" if dates else ''))
+
+
+def upsert_table(table: str, new_df: pd.DataFrame, dates: set, manifest: Dict, exclude: set, output_dir: str=OUTPUT_DIR, full: bool=False) -> None:
+    """ 
+        Replace the given game_date partitions of an output table with new rows.
+        When the new dates all come after everything already in the table, the rows
+        are appended to the CSV rather than rewriting it. Rows appended last are
+        recorded as the table's tail, so re-extracting those dates (as a live poll
+        does every few seconds) truncates the CSV there and appends again.
+    """
+    filename = f'{output_dir}/{table}.csv'
+
+    # Without the manifest's record of a table, its rows can't be told apart by
+    # the files they came from, so it is rebuilt from every file just extracted.
+    if full or table not in manifest['tables']:
+        old_lines = read_lines(filename)
+        storage.write_table(new_df, output_dir, table)
+        manifest['tables'][table] = {'columns': new_df.columns.tolist()}
+        print(f"Saved {filename} ({len(new_df)} rows)")
+        report_unreconciled(filename, old_lines, read_lines(filename))
+        return
+
+    columns = manifest['tables'].get(table, {}).get('columns')
+    existing_dates = known_dates(table, manifest, exclude, exclude=True)
+    replaced_dates = known_dates(table, manifest, exclude, exclude=False)
+
+    tail = manifest['tables'].get(table, {}).get('tail')
+
+    can_append = (
+        os.path.exists(filename)
+        and columns is not None
+        and set(new_df.columns) <= set(columns)
+        and (not existing_dates or min(dates) > max(existing_dates))
+    )
+
+    replaces_tail = (
+        can_append
+        and bool(replaced_dates)
+        and tail is not None
+        and not storage.parquet_enabled()
+        and os.path.getsize(filename) == tail['size']
+        and replaced_dates <= set(tail['dates']) <= dates
+    )
+
+    if can_append and (replaces_tail or not replaced_dates):
+        offset = tail['offset'] if replaces_tail else os.path.getsize(filename)
+        if replaces_tail:
+            os.truncate(filename, offset)
+        if not new_df.empty:
+            storage.append_table(new_df, output_dir, table, columns)
+        manifest['tables'][table]['tail'] = {'dates': sorted(dates), 'offset': offset, 'size': os.path.getsize(filename)}
+        if replaces_tail:
+            print(f"Replaced {', '.join(sorted(dates))} at the end of {filename} ({len(new_df)} rows)")
+        else:
+            print(f"Appended {len(new_df)} rows to {filename}")
+        return
+
+    if os.path.exists(filename):
+        # Read as text so untouched partitions are written back exactly as they were.
+        df = pd.read_csv(filename, dtype=str, keep_default_na=False)
+        df = df[~df['game_date'].isin(dates)]
+        df = pd.concat([df, new_df]).sort_values('game_date', kind='stable')
+    else:
+        df = new_df
+
+    storage.write_table(df, output_dir, table)
+    manifest['tables'][table] = {'columns': df.columns.tolist()}
+    print(f"Saved {filename} ({len(df)} rows)")
+
+
+def run_extraction(tables: Optional[List[str]]=None, max_workers: Optional[int]=None, output_dir: str=OUTPUT_DIR, full: bool=False) -> Dict[str, int]:
+    """ 
+        Extract only JSON files that are new or changed since the last run and upsert
+        their game_date partitions; with full set, every file is re-extracted and each
+        table rewritten. Returns the number of rows extracted per table.
+    """
+    tables = tables or list(EXTRACTORS)
+    endpoints = tables_by_endpoint(tables)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    changed_files = {}
+    deleted_files = {}
+    for endpoint, endpoint_tables in endpoints.items():
+        changed_files[endpoint], deleted_files[endpoint] = find_changed_files(endpoint, endpoint_tables, manifest, full)
+
+    touched_files = {endpoint: changed_files[endpoint] + deleted_files[endpoint] for endpoint in endpoints}
+    if not any(touched_files.values()):
+        print("No new or changed JSON files")
+        return {table: 0 for table in tables}
+
+    with metrics.stage('extract.parse'):
+        new_rows = extract_rows(tables, changed_files, max_workers)
+    exclude = {file for files in touched_files.values() for file in files}
+
+    extracted = {}
+    with metrics.stage('extract.write'):
+        for table in tables:
+            endpoint, _ = EXTRACTORS[table]
+            extracted[table] = len(new_rows[table])
+            if not touched_files[endpoint]:
+                continue
+
+            dates = {api.extract_date_from_filename(file) for file in touched_files[endpoint]}
+            upsert_table(table, table_frame(table, new_rows[table], output_dir), dates, manifest, exclude, output_dir, full)
+
+    for endpoint, endpoint_tables in endpoints.items():
+        for file in deleted_files[endpoint]:
+            del manifest['files'][file]
+
+        row_counts = {table: Counter(row['game_date'] for row in new_rows[table]) for table in endpoint_tables}
+        for file in changed_files[endpoint]:
+            game_date = api.extract_date_from_filename(file)
+            previous = manifest['files'].get(file, {}).get('rows', {})
+            manifest['files'][file] = {
+                **file_state(file),
+                'sha256': file_hash(file),
+                'game_date': game_date,
+                'rows': {**previous, **{table: row_counts[table][game_date] for table in endpoint_tables}}
+            }
+
+    save_manifest(manifest, output_dir)
+    return extracted
@@ -0,0 +1,169 @@
+import datetime
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import api_matchday_json as api
+import corpus
+import http_cache
+
+
+CALENDAR_FILE = os.environ.get('BBC_CALENDAR_FILE', './data/fixture_calendar.json')
+
+# A calendar younger than this is used as it is. Kick-off changes and
+# rearrangements are picked up at the next refresh, and the scheduler refreshes
+# whenever a match falls due.
+REFRESH_INTERVAL = 7 * 24 * 60 * 60
+
+# Statuses of a match that won't go ahead as scheduled.
+NOT_PLAYED = {'Postponed', 'Cancelled', 'Abandoned'}
+
+
+def season_of(date: datetime.date) -> str:
+    """
+        Season label for a date, e.g. 2025-08-10 -> '2025/26'. Seasons start in July.
+    """
+    start_year = date.year - (date.month < 7)
+    return f'{start_year}/{str(start_year + 1)[-2:]}'
+
+
+def season_range(season: str) -> Tuple[str, str]:
+    start_year = int(season[:4])
+    return f'{start_year}-07-01', f'{start_year + 1}-06-30'
+
+
+def calendar_entry(fixture_info: Dict) -> Dict:
+    """
+        What the scheduler needs to know about a match, plus its fixture_info for
+        fetching it without another fixtures request.
+    """
+    event = fixture_info['secondaryGroups'][0]['events'][0]
+    return {
+        'match_id': event['id'],
+        'date': event['date']['isoDate'],
+        # None while the kick-off time is still to be confirmed
+        'kickoff': event['startDateTime'] if event.get('time', {}).get('timeCertainty', True) else None,
+        'status': event['status'],
+        'competition': fixture_info['secondaryGroups'][0]['displayLabel'],
+        'home': event['home']['fullName'],
+        'away': event['away']['fullName'],
+        'fixture_info': fixture_info
+    }
+
+
+def build_entries(fixture_events: List[Dict]) -> Dict[str, Dict]:
+    """
+        One entry per match ID. A postponed match stays listed on its original
+        date after it is rearranged, under the same ID, so the rearranged fixture
+        takes its place.
+    """
+    entries = {}
+    for fixture_info in fixture_events:
+        entry = calendar_entry(fixture_info)
+        current = entries.get(entry['match_id'])
+        if current is None or current['status'] in NOT_PLAYED:
+            entries[entry['match_id']] = entry
+    return dict(sorted(entries.items(), key=lambda item: (item[1]['date'], item[1]['kickoff'] or '')))
+
+
+def describe(entry: Dict) -> str:
+    return f"{entry['date']} {entry['home']} v {entry['away']} ({entry['competition']})"
+
+
+def is_saved(entry: Dict) -> bool:
+    """
+        Whether bbc-json already holds the match as finished.
+    """
+    try:
+        saved = api.read_json_file(corpus.record_name('fixture_info', entry['date']))
+    except Exception:
+        return False
+    return any(
+        event['id'] == entry['match_id'] and event['status'] == 'PostEvent'
+        for group in saved['secondaryGroups'] for event in group['events']
+    )
+
+
+def report_changes(old: Dict[str, Dict], new: Dict[str, Dict]) -> List[str]:
+    """
+        Print and return the postponements, rearrangements and kick-off changes
+        between two versions of the calendar.
+    """
+    changes = []
+    for match_id, entry in new.items():
+        before = old.get(match_id)
+        if entry['status'] in NOT_PLAYED:
+            if before is None or before['status'] not in NOT_PLAYED:
+                changes.append(f"{entry['status']}: {describe(entry)}")
+        elif before is not None and before['date'] != entry['date']:
+            changes.append(f"Rearranged from {before['date']}: {describe(entry)}")
+        elif before is not None and before['kickoff'] != entry['kickoff']:
+            changes.append(f"Kick-off now {entry['kickoff'] or 'to be confirmed'}: {describe(entry)}")
+
+    for match_id in old.keys() - new.keys():
+        changes.append(f"No longer listed: {describe(old[match_id])}")
+
+    for change in changes:
+        print(change)
+    return changes
+
+
+def fetch_calendar(season: str, previous: Optional[Dict]=None) -> Dict:
+    """
+        Fetch a season's fixtures in one request. Matches already processed stay
+        processed. A new calendar counts matches already saved as finished as
+        processed, so the scheduler doesn't re-run the past.
+    """
+    start, end = season_range(season)
+    with http_cache.max_age(0):
+        fixture_events = api.get_fixture_events(start, end, timeout=api.ENDPOINT_TIMEOUTS['fixture_info'])
+    matches = build_entries(fixture_events)
+
+    if previous is not None and previous['season'] == season:
+        report_changes(previous['matches'], matches)
+        processed = previous['processed']
+    else:
+        processed = [match_id for match_id, entry in matches.items() if entry['status'] == 'PostEvent' and is_saved(entry)]
+
+    return {
+        'season': season,
+        'refreshed_at': time.time(),
+        'matches': matches,
+        'processed': processed
+    }
+
+
+def load_calendar(path: str=CALENDAR_FILE) -> Optional[Dict]:
+    try:
+        with open(path) as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+
+
+def save_calendar(calendar: Dict, path: str=CALENDAR_FILE) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(calendar, outfile, indent=2)
+    os.replace(tmp_path, path)
+
+
+def refresh_calendar(calendar: Optional[Dict], season: str, path: str=CALENDAR_FILE) -> Dict:
+    calendar = fetch_calendar(season, calendar)
+    save_calendar(calendar, path)
+    print(f"Refreshed the {season} fixture calendar: {len(calendar['matches'])} matches")
+    return calendar
+
+
+def get_calendar(season: Optional[str]=None, max_age: float=REFRESH_INTERVAL, path: str=CALENDAR_FILE) -> Dict:
+    """
+        The season's calendar (default: the current season), fetched only when
+        there is none yet or it is older than max_age seconds.
+    """
+    season = season or season_of(datetime.datetime.now(datetime.timezone.utc).date())
+    calendar = load_calendar(path)
+    if calendar is None or calendar['season'] != season or time.time() - calendar['refreshed_at'] > max_age:
+        calendar = refresh_calendar(calendar, season, path)
+    return calendar
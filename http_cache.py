@@ -0,0 +1,261 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import json_codec
+import metrics
+import transport
+
+
+CACHE_DIR = os.environ.get('BBC_CACHE_DIR', './.http-cache')
+
+MAX_CACHE_BYTES = int(os.environ.get('BBC_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Evicting down to this fraction of the limit avoids evicting on every store.
+EVICT_TO_FRACTION = 0.9
+
+PERMANENT = None
+
+# Seconds an entry stays fresh, matched against the URL path. Entries past
+# their TTL are revalidated with a conditional GET rather than refetched.
+ENDPOINT_TTLS: List[Tuple[str, Optional[int]]] = [
+    ('sport-data-scores-fixtures', 60 * 60),
+    ('football-table', 60 * 60),
+    ('football-on-the-day-events', 15 * 60),
+    ('live-header', 15 * 60),
+    ('match-stats', 15 * 60),
+    ('match-lineups', PERMANENT),
+    ('container/stream', PERMANENT)
+]
+
+DEFAULT_TTL = 15 * 60
+
+# Query parameters that change between runs without changing the payload.
+VOLATILE_PARAMS = {'todayDate'}
+
+_enabled = os.environ.get('BBC_CACHE', '1') != '0'
+_offline = os.environ.get('BBC_OFFLINE', '0') == '1'
+
+# Overrides every TTL while set, e.g. to 0 while a match is still in play.
+_max_age: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('max_age', default=None)
+
+_size_lock = threading.Lock()
+_size: Optional[int] = None
+
+# Requests in flight, by normalized URL and freshness, so concurrent callers
+# asking for the same resource share one request.
+_flights_lock = threading.Lock()
+_flights: Dict[Tuple, Future] = {}
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def set_offline(offline: bool) -> None:
+    """
+        Serve only from the cache, regardless of age, and never touch the network.
+    """
+    global _offline
+    _offline = offline
+
+
+def is_offline() -> bool:
+    return _offline
+
+
+@contextlib.contextmanager
+def max_age(seconds: int):
+    """
+        Treat cached entries older than `seconds` as stale for the duration of the block.
+    """
+    token = _max_age.set(seconds)
+    try:
+        yield
+    finally:
+        _max_age.reset(token)
+
+
+def normalize_url(url: str) -> str:
+    """
+        Lower-case the scheme and host, sort the query and drop volatile parameters.
+    """
+    parts = urlsplit(url)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in VOLATILE_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+
+def cache_path(url: str) -> str:
+    key = cache_key(url)
+    return os.path.join(CACHE_DIR, key[:2], f'{key}.json')
+
+
+def endpoint_ttl(url: str) -> Optional[int]:
+    """
+        Return the TTL in seconds for a URL, or None for entries that never expire.
+    """
+    path = urlsplit(url).path
+    for marker, ttl in ENDPOINT_TTLS:
+        if marker in path:
+            return ttl
+    return DEFAULT_TTL
+
+
+def is_fresh(entry: Dict, url: str) -> bool:
+    ttl = _max_age.get()
+    if ttl is None:
+        # Anything stored before the final whistle is always revalidated, whatever
+        # the endpoint's TTL, so in-play payloads are never saved as final.
+        if entry.get('provisional', False):
+            return False
+        ttl = endpoint_ttl(url)
+        if ttl is PERMANENT:
+            return True
+    return time.time() - entry['stored_at'] < ttl
+
+
+def load_entry(url: str) -> Optional[Dict]:
+    """
+        Read a cache entry and mark it as recently used.
+    """
+    path = cache_path(url)
+    try:
+        with open(path, 'rb') as f:
+            entry = json_codec.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    os.utime(path)
+    return entry
+
+
+def store_entry(url: str, body, etag: Optional[str]=None, last_modified: Optional[str]=None) -> None:
+    """
+        Write a cache entry atomically, then evict old entries if over the size limit.
+    """
+    global _size
+    path = cache_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    entry = {
+        'url': normalize_url(url),
+        'stored_at': time.time(),
+        'etag': etag,
+        'last_modified': last_modified,
+        'provisional': _max_age.get() is not None,
+        'body': body
+    }
+    previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(entry, outfile)
+    os.replace(tmp_path, path)
+
+    with _size_lock:
+        if _size is None:
+            _size = cache_size()
+        else:
+            _size += os.path.getsize(path) - previous_size
+        if _size > MAX_CACHE_BYTES:
+            _size = evict(int(MAX_CACHE_BYTES * EVICT_TO_FRACTION))
+
+
+def list_entries() -> List[Tuple[float, int, str]]:
+    """
+        Return (last used, size, path) for every entry in the cache.
+    """
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith('.json'):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def cache_size() -> int:
+    return sum(size for _, size, _ in list_entries())
+
+
+def evict(target_bytes: int) -> int:
+    """
+        Delete least recently used entries until the cache fits in target_bytes.
+    """
+    entries = sorted(list_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= target_bytes:
+            break
+        os.remove(path)
+        total -= size
+    return total
+
+
+def get_json(url: str, timeout=None):
+    """
+        Return the JSON body for a URL, from the cache while fresh, otherwise from
+        the network with a conditional GET against the cached validators. A call
+        made while the same request is already in flight waits for that request
+        and gets the same body, rather than making its own.
+    """
+    key = (normalize_url(url), _max_age.get(), _offline, _enabled)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Future()
+
+    if not leader:
+        metrics.current().label(status='coalesced')
+        return flight.result()
+
+    try:
+        body = fetch_json(url, timeout)
+    except BaseException as e:
+        flight.set_exception(e)
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+    flight.set_result(body)
+    return body
+
+
+def fetch_json(url: str, timeout=None):
+    if not _enabled:
+        return transport.get_json(url, timeout)
+
+    entry = load_entry(url)
+
+    if entry is not None and (_offline or is_fresh(entry, url)):
+        return entry['body']
+
+    if _offline:
+        raise Exception(f"{url} is not in the HTTP cache (offline mode).")
+
+    r = transport.conditional_get(url, entry, timeout)
+
+    if r.status_code == 304 and entry is not None:
+        store_entry(url, entry['body'], entry.get('etag'), entry.get('last_modified'))
+        return entry['body']
+
+    body = json_codec.loads(r.content)
+    if r.status_code == 200:
+        store_entry(url, body, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+    return body
@@ -0,0 +1,159 @@
+import json
+import os
+import re
+from typing import Any, BinaryIO, Callable, Iterator, List, Union
+
+import metrics
+
+
+# 'orjson', 'msgspec' or 'json' forces a decoder; by default the fastest one
+# installed is used.
+DECODER = os.environ.get('BBC_JSON_DECODER')
+
+# Without ijson, iter_items reads the whole document before scanning it, so its
+# memory grows with the payload. Documents bigger than this say so, once.
+LARGE_DOCUMENT_BYTES = int(os.environ.get('BBC_JSON_LARGE_BYTES', 8 * 1024 * 1024))
+
+_warned_large = False
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_stdlib_decoder = json.JSONDecoder()
+
+
+def orjson_loads() -> Callable[[Union[bytes, str]], Any]:
+    import orjson
+
+    return orjson.loads
+
+
+def msgspec_loads() -> Callable[[Union[bytes, str]], Any]:
+    import msgspec
+
+    decode = msgspec.json.Decoder().decode
+
+    def loads(data: Union[bytes, str]) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    return loads
+
+
+def stdlib_loads() -> Callable[[Union[bytes, str]], Any]:
+    return json.loads
+
+
+DECODERS = {
+    'orjson': orjson_loads,
+    'msgspec': msgspec_loads,
+    'json': stdlib_loads
+}
+
+
+def select_decoder(name: str=DECODER) -> Callable[[Union[bytes, str]], Any]:
+    """
+        The named decoder, or the first of orjson, msgspec and the stdlib that imports.
+    """
+    if name:
+        return DECODERS[name]()
+
+    for make_decoder in DECODERS.values():
+        try:
+            return make_decoder()
+        except ImportError:
+            continue
+
+
+_loads = select_decoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+        Decode a JSON document. Raises ValueError on invalid JSON, whichever decoder is in use.
+    """
+    if not metrics.enabled():
+        return _loads(data)
+    with metrics.span('decode') as decode_span:
+        decode_span.add(bytes=len(data))
+        return _loads(data)
+
+
+def ijson_available() -> bool:
+    try:
+        import ijson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_items(source: BinaryIO, prefix: str) -> Iterator[Any]:
+    """
+        Yield the values at an ijson-style prefix one at a time, e.g. 'events.item'
+        for each element of the top-level 'events' array, without building the
+        rest of the document. Uses ijson when installed, otherwise a stdlib scan
+        that decodes only the selected items, but holds the whole document's text
+        in memory; install the json extra for flat memory on large payloads.
+    """
+    global _warned_large
+    if ijson_available():
+        import ijson
+
+        yield from ijson.items(source, prefix, use_float=True)
+        return
+
+    text = source.read()
+    if isinstance(text, bytes):
+        text = text.decode()
+    if len(text) > LARGE_DOCUMENT_BYTES and not _warned_large:
+        _warned_large = True
+        print(f"Streaming a {len(text) / 1024 / 1024:.1f} MB document without ijson, which reads it whole; install ijson to keep memory flat")
+    end = [0]
+    yield from scan_items(text, 0, prefix.split('.') if prefix else [], end)
+
+
+def skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+def scan_items(text: str, pos: int, path: List[str], end: List[int]) -> Iterator[Any]:
+    """
+        Walk the JSON value starting at pos down `path` ('item' for each array
+        element, otherwise an object key), yielding what it reaches. Values off
+        the path are skipped over. end[0] is left just past the value.
+    """
+    pos = skip_whitespace(text, pos)
+
+    if not path:
+        value, end[0] = _stdlib_decoder.raw_decode(text, pos)
+        yield value
+        return
+
+    part, rest = path[0], path[1:]
+    opening, closing = ('[', ']') if part == 'item' else ('{', '}')
+
+    if text.startswith(opening, pos):
+        pos = skip_whitespace(text, pos + 1)
+    else:
+        # A null, or anything else that can't contain the path.
+        _, end[0] = _stdlib_decoder.raw_decode(text, pos)
+        return
+
+    while not text.startswith(closing, pos):
+        if part == 'item':
+            yield from scan_items(text, pos, rest, end)
+        else:
+            key, pos = _stdlib_decoder.raw_decode(text, pos)
+            pos = skip_whitespace(text, pos) + 1  # ':'
+            if key == part:
+                yield from scan_items(text, pos, rest, end)
+            else:
+                _, end[0] = _stdlib_decoder.raw_decode(text, skip_whitespace(text, pos))
+
+        pos = skip_whitespace(text, end[0])
+        if text.startswith(',', pos):
+            pos = skip_whitespace(text, pos + 1)
+
+    end[0] = pos + 1
+
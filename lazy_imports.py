@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """
+        Return a module that is only executed the first time one of its attributes
+        is used, so commands that never touch it don't pay for importing it.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
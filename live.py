@@ -0,0 +1,181 @@
+import datetime
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import api_matchday_json as api
+import extract
+import http_cache
+import projections
+from lazy_imports import lazy_import
+
+requests = lazy_import('requests')
+
+
+# Endpoints that change while a match is in play. The rest are saved once, at full time.
+LIVE_ENDPOINTS = ['lineups', 'match_info', 'match_stats', 'commentary']
+
+# Seconds between polls for each match state. Before kick-off the interval
+# shrinks towards IN_PLAY_INTERVAL as kick-off approaches.
+PRE_KICKOFF_INTERVAL = 300
+IN_PLAY_INTERVAL = 15
+HALF_TIME_INTERVAL = 60
+
+# Attempts at fetching the day's fixture after a network error, waiting
+# FIXTURE_RETRY_DELAY seconds before the first and doubling the wait each time.
+FIXTURE_RETRIES = 5
+FIXTURE_RETRY_DELAY = 15
+
+# Statuses during which a match is still worth polling; anything else
+# (PostEvent, Postponed, Cancelled, ...) ends the poll.
+LIVE_STATUSES = {'PreEvent', 'MidEvent'}
+
+
+def get_event(fixture_info: Dict) -> Dict:
+    return fixture_info['secondaryGroups'][0]['events'][0]
+
+
+def kickoff_time(fixture_info: Dict) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(get_event(fixture_info)['startDateTime'].replace('Z', '+00:00'))
+
+
+def is_half_time(fixture_info: Dict) -> bool:
+    return get_event(fixture_info).get('periodLabel', {}).get('value') == 'HT'
+
+
+def next_interval(fixture_info: Dict, now: datetime.datetime) -> Optional[float]:
+    """
+        Seconds until the next poll, or None once the match is over.
+    """
+    status = get_event(fixture_info)['status']
+    if status not in LIVE_STATUSES:
+        return None
+
+    if status == 'MidEvent':
+        return HALF_TIME_INTERVAL if is_half_time(fixture_info) else IN_PLAY_INTERVAL
+
+    to_kickoff = (kickoff_time(fixture_info) - now).total_seconds()
+    return min(PRE_KICKOFF_INTERVAL, max(IN_PLAY_INTERVAL, to_kickoff / 4))
+
+
+def changed_sections(old: Any, new: Any) -> List[str]:
+    """
+        Top-level keys (or list indices) whose values differ between two payloads.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        return [str(key) for key in {**old, **new} if old.get(key) != new.get(key)]
+    if isinstance(old, list) and isinstance(new, list):
+        changed = [str(i) for i, (a, b) in enumerate(zip(old, new)) if a != b]
+        return changed + [str(i) for i in range(min(len(old), len(new)), max(len(old), len(new)))]
+    return [] if old == new else ['*']
+
+
+def load_saved(game_date: str, endpoints: List[str]) -> Dict[str, Any]:
+    """
+        The payloads already saved for a date, so a restarted poll doesn't rewrite them.
+    """
+    saved = {}
+    for endpoint in endpoints:
+        try:
+            # Projected, as polled payloads are, in case it was saved before projections.
+            saved[endpoint] = projections.project_endpoint(endpoint, api.read_json_file(f'./bbc-json/{endpoint}/{game_date}.json'))
+        except Exception:
+            continue
+    return saved
+
+
+def poll_once(game_date: str, fixture_info: Dict, previous: Dict[str, Any], endpoints: List[str]=LIVE_ENDPOINTS) -> List[str]:
+    """
+        Fetch the live endpoints and save those whose projected payload has changed
+        since the last poll. Returns the endpoints saved.
+
+        Only unchanged endpoints are skipped: an endpoint with any changed section
+        has its whole file rewritten, since the extractors read one file per
+        endpoint and date. Sections aren't persisted on their own.
+    """
+    jobs = api.endpoint_jobs(game_date, fixture_info)
+    with http_cache.max_age(0):
+        responses = api.fetch_concurrently({endpoint: jobs[endpoint] for endpoint in endpoints})
+
+    changed = []
+    for endpoint, response in responses.items():
+        payload = projections.project_endpoint(endpoint, response)
+        sections = changed_sections(previous.get(endpoint), payload)
+        if not sections:
+            continue
+
+        print(f"{endpoint}: changed {', '.join(sections)}")
+        api.write_endpoint_json(game_date, endpoint, response)
+        previous[endpoint] = payload
+        changed.append(endpoint)
+    return changed
+
+
+def reextract(endpoints: List[str]) -> Dict[str, int]:
+    """
+        Re-extract only the tables built from the given endpoints.
+    """
+    tables = [table for table, (endpoint, _) in extract.EXTRACTORS.items() if endpoint in endpoints]
+    return extract.run_extraction(tables) if tables else {}
+
+
+def fetch_fixture(game_date: str, sleep: Callable[[float], None]=time.sleep) -> Optional[Dict]:
+    """
+        The fixture being polled, or None if there's no match on the date. Network
+        errors are retried with backoff, up to FIXTURE_RETRIES times.
+    """
+    for attempt in range(FIXTURE_RETRIES + 1):
+        try:
+            with http_cache.max_age(0):
+                fixtures = api.get_fixtures(game_date, timeout=api.ENDPOINT_TIMEOUTS['fixture_info'])
+            return fixtures[0] if fixtures else None
+        except requests.RequestException as e:
+            if attempt == FIXTURE_RETRIES:
+                raise
+            delay = FIXTURE_RETRY_DELAY * 2 ** attempt
+            print(f"Error fetching fixture for {game_date}: {e}; retrying in {delay}s")
+            sleep(delay)
+
+
+def poll_match(game_date: Optional[str]=None, endpoints: List[str]=LIVE_ENDPOINTS, sleep: Callable[[float], None]=time.sleep) -> int:
+    """
+        Follow a match from before kick-off to full time, polling the live endpoints
+        at an interval that suits the match state. Changed payloads are saved and
+        their tables re-extracted after every poll. At full time every endpoint is
+        saved once more and everything re-extracted. Returns the number of polls,
+        none if there's no match on the date.
+    """
+    game_date = game_date or api.date_today()
+    previous = load_saved(game_date, endpoints)
+    polls = 0
+
+    while True:
+        started = time.monotonic()
+        fixture_info = fetch_fixture(game_date, sleep)
+        if fixture_info is None:
+            print(f"No match on {game_date}")
+            return polls
+
+        interval = next_interval(fixture_info, datetime.datetime.now(datetime.timezone.utc))
+        if interval is None:
+            break
+
+        if polls == 0 and previous.get('commentary'):
+            api.remember_commentary(api.get_match_id(fixture_info), previous['commentary'])
+
+        try:
+            changed = poll_once(game_date, fixture_info, previous, endpoints)
+            if changed:
+                reextract(changed)
+        except Exception as e:
+            print(f"Error polling {game_date}: {e}")
+        polls += 1
+
+        sleep(max(0, interval - (time.monotonic() - started)))
+
+    print(f"{game_date}: match over ({get_event(fixture_info)['status']}) after {polls} polls")
+    if api.is_finished(fixture_info):
+        # Responses cached in play may still be within their TTL, so bypass them.
+        with http_cache.max_age(0):
+            api.save_match_json(game_date, fixture_info)
+        extract.run_extraction()
+    return polls
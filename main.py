@@ -1,5 +1,223 @@
-def main():
-    print("Hello from data-updater-v2!")
+import argparse
+import datetime
+
+
+def today():
+    return datetime.datetime.now().strftime('%Y-%m-%d')
+
+
+def fetch(args):
+    import api_matchday_json
+
+    api_matchday_json.save_dates_json(args.dates or [today()], raw_archive=args.raw_archive)
+
+
+def backfill(args):
+    import api_matchday_json
+
+    api_matchday_json.backfill_match_json(args.start_date, args.end_date, max_workers=args.workers, raw_archive=args.raw_archive)
+
+
+def calendar(args):
+    import fixture_calendar
+    import scheduler
+
+    calendar = fixture_calendar.get_calendar(args.season, max_age=0 if args.refresh else fixture_calendar.REFRESH_INTERVAL)
+    processed = set(calendar['processed'])
+    for match_id, entry in calendar['matches'].items():
+        if match_id in processed:
+            state = 'processed'
+        elif entry['status'] in fixture_calendar.NOT_PLAYED:
+            state = entry['status'].lower()
+        else:
+            state = f"due {scheduler.due_time(entry):%Y-%m-%d %H:%M} UTC"
+        print(f"{fixture_calendar.describe(entry)}: {state}")
+
+
+def run(args):
+    import scheduler
+
+    if args.follow:
+        scheduler.follow()
+    else:
+        now = datetime.datetime.fromisoformat(args.now).astimezone(datetime.timezone.utc) if args.now else None
+        scheduler.run_due(now, dry_run=args.dry_run)
+
+
+def live(args):
+    import live
+
+    live.poll_match(args.date, args.endpoints or live.LIVE_ENDPOINTS)
+
+
+def serve(args):
+    import standin
+
+    standin.serve(
+        args.host, args.port,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        seed=args.seed, verbose=args.verbose
+    )
+
+
+def project(args):
+    import api_matchday_json
+
+    api_matchday_json.project_saved_json(args.endpoints or None, raw_archive=args.raw_archive)
+
+
+def pack(args):
+    import corpus
+
+    codec = {None: corpus.KEEP_CODEC, 'none': None}.get(args.compress, args.compress)
+    for endpoint in args.endpoints or corpus.list_endpoints():
+        corpus.pack_endpoint(endpoint, codec=codec, keep_files=args.keep_files)
+
+
+def parquet(args):
+    import storage
+
+    if not storage.parquet_available():
+        raise SystemExit('Parquet copies need the pyarrow package.')
+    for directory in args.directories or ['./data', './data-r']:
+        converted = storage.convert_directory(directory)
+        print(f"Wrote Parquet copies of {len(converted)} tables in {directory}")
+
+
+def extract(args):
+    import extract
+
+    extract.run_extraction(args.tables or None, max_workers=args.workers, full=args.full)
+
+
+def update(args):
+    import updater
+
+    updater.Pipeline().update(args.dates or None)
+
+
+def bench(args):
+    import bench
+
+    regressions = bench.benchmark(args.stages or None, scale=args.scale, repeat=args.repeat, save=args.save, threshold=args.threshold, path=args.baseline or bench.BASELINE_FILE)
+    if regressions:
+        raise SystemExit(1)
+
+
+def players(args):
+    import player_index
+
+    index = player_index.build_player_index()
+    player_index.save_player_index(index)
+    print(f"Saved {len(index)} players to data/{player_index.INDEX_NAME}.csv")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='data-updater-v2')
+    parser.add_argument('--report', default=None, help='Write a JSON report of the run: stages, requests, extractors and writes (default: $BBC_RUN_REPORT)')
+    parser.add_argument('--metrics-file', default=None, help='Write the run as Prometheus text metrics, e.g. for a textfile collector (default: $BBC_METRICS_FILE)')
+    parser.add_argument('--trace-memory', action='store_true', help='Include peak traced memory per stage in the report and metrics (slows the run)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help='Save BBC JSON for the match on each date')
+    fetch_parser.add_argument('dates', nargs='*', help='Match dates, YYYY-MM-DD (default: today)')
+    fetch_parser.add_argument('--raw-archive', help='Also keep full responses, gzipped, under this directory (default: $BBC_RAW_ARCHIVE)')
+    fetch_parser.set_defaults(func=fetch)
+
+    backfill_parser = subparsers.add_parser('backfill', help='Save BBC JSON for every finished match in a date range')
+    backfill_parser.add_argument('start_date', help='First date, YYYY-MM-DD')
+    backfill_parser.add_argument('end_date', help='Last date, YYYY-MM-DD')
+    backfill_parser.add_argument('--workers', type=int, default=4, help='Matches fetched at once')
+    backfill_parser.add_argument('--raw-archive', help='Also keep full responses, gzipped, under this directory (default: $BBC_RAW_ARCHIVE)')
+    backfill_parser.set_defaults(func=backfill)
+
+    calendar_parser = subparsers.add_parser('calendar', help="List the season's fixtures from the cached fixture calendar")
+    calendar_parser.add_argument('--season', default=None, help='Season, e.g. 2025/26 (default: the current season)')
+    calendar_parser.add_argument('--refresh', action='store_true', help='Fetch the calendar again even if the cached copy is recent')
+    calendar_parser.set_defaults(func=calendar)
+
+    run_parser = subparsers.add_parser('run', help='Fetch, extract and update for each match once it should be over; does nothing on days without one')
+    run_parser.add_argument('--follow', action='store_true', help='Keep running, sleeping until the next match is due')
+    run_parser.add_argument('--dry-run', action='store_true', help='Report the matches that would be processed without processing them')
+    run_parser.add_argument('--now', default=None, help='Treat this ISO time as now, e.g. to replay a matchday (default: the current time)')
+    run_parser.set_defaults(func=run)
+
+    live_parser = subparsers.add_parser('live', help='Poll a match while it is played, saving and extracting changes as they happen; an endpoint with any change is rewritten whole')
+    live_parser.add_argument('--date', default=None, help='Match date, YYYY-MM-DD (default: today)')
+    live_parser.add_argument('endpoints', nargs='*', help='Endpoints to poll (default: lineups, match_info, match_stats, commentary)')
+    live_parser.set_defaults(func=live)
+
+    serve_parser = subparsers.add_parser('serve', help='Serve the bbc-json corpus at the BBC URL shapes, for offline fetching and load tests')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--latency', type=float, default=0, help='Milliseconds added to every response')
+    serve_parser.add_argument('--jitter', type=float, default=0, help='Random +/- milliseconds on top of the latency')
+    serve_parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with a 503')
+    serve_parser.add_argument('--throttle-rate', type=float, default=0, help='Fraction of requests answered with a 429 and Retry-After')
+    serve_parser.add_argument('--seed', type=int, default=None, help='Seed for the injected faults')
+    serve_parser.add_argument('--verbose', action='store_true', help='Log every request')
+    serve_parser.set_defaults(func=serve)
+
+    project_parser = subparsers.add_parser('project', help='Cut saved bbc-json files down to the fields the extractors read')
+    project_parser.add_argument('endpoints', nargs='*', help='Endpoint directories to project (default: all with a projection)')
+    project_parser.add_argument('--raw-archive', help='Archive the original files, gzipped, under this directory first (default: $BBC_RAW_ARCHIVE)')
+    project_parser.set_defaults(func=project)
+
+    pack_parser = subparsers.add_parser('pack', help='Pack each endpoint directory of bbc-json into one indexed file')
+    pack_parser.add_argument('endpoints', nargs='*', help='Endpoint directories to pack (default: all)')
+    pack_parser.add_argument('--compress', choices=['zstd', 'zlib', 'none'], default=None, help="Compress each record, or 'none' to store them uncompressed; zstd needs the zstandard package (default: the pack's current codec, or none)")
+    pack_parser.add_argument('--keep-files', action='store_true', help='Leave the loose JSON files in place')
+    pack_parser.set_defaults(func=pack)
+
+    parquet_parser = subparsers.add_parser('parquet', help='Write a Parquet copy of every CSV table, for DATA_BACKEND=parquet to read')
+    parquet_parser.add_argument('directories', nargs='*', help='Table directories (default: data and data-r)')
+    parquet_parser.set_defaults(func=parquet)
+
+    extract_parser = subparsers.add_parser('extract', help='Rebuild data/*.csv from the bbc-json corpus')
+    extract_parser.add_argument('tables', nargs='*', help='Tables to rebuild (default: all)')
+    extract_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core)')
+    extract_parser.add_argument('--full', action='store_true', help='Re-extract every file instead of only new or changed ones')
+    extract_parser.set_defaults(func=extract)
+
+    update_parser = subparsers.add_parser('update', help='Add matches from data/*.csv to the data-r datasets')
+    update_parser.add_argument('--date', dest='dates', action='append', help='Match date, YYYY-MM-DD; repeat for several (default: today)')
+    update_parser.set_defaults(func=update)
+
+    bench_parser = subparsers.add_parser('bench', help='Time the extractors and update builders, failing on regressions against a saved baseline')
+    bench_parser.add_argument('stages', nargs='*', help='Stages to run, e.g. extract.lineups or update.results (default: all)')
+    bench_parser.add_argument('--scale', type=int, default=1, help='Run over the corpus repeated this many times, each copy moved back a block of seasons')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the median time is reported')
+    bench_parser.add_argument('--threshold', type=float, default=0.2, help='Fractional growth in time or peak memory counted as a regression')
+    bench_parser.add_argument('--baseline', default=None, help='Baseline file (default: $BBC_BENCH_BASELINE or bench_baseline.json)')
+    bench_parser.add_argument('--save', action='store_true', help='Save this run as the baseline for its scale')
+    bench_parser.set_defaults(func=bench)
+
+    players_parser = subparsers.add_parser('players', help='Rebuild the BBC player URN index from lineups and player_apps')
+    players_parser.set_defaults(func=players)
+
+    return parser
+
+
+def main(argv=None):
+    import metrics
+
+    args = build_parser().parse_args(argv)
+    report = args.report or metrics.REPORT_FILE
+    metrics_file = args.metrics_file or metrics.METRICS_FILE
+    if not (report or metrics_file):
+        args.func(args)
+        return
+
+    metrics.enable(trace_memory=args.trace_memory or metrics.TRACE_MEMORY)
+    try:
+        with metrics.stage(args.command):
+            args.func(args)
+    finally:
+        if report:
+            metrics.write_report(report)
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
 
 
 if __name__ == "__main__":
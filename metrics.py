@@ -0,0 +1,297 @@
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+# Spans are only recorded once a run asks for a report or metrics file; until
+# then span() hands back a shared no-op, so instrumented code pays one flag check.
+REPORT_FILE = os.environ.get('BBC_RUN_REPORT')
+METRICS_FILE = os.environ.get('BBC_METRICS_FILE')
+TRACE_MEMORY = os.environ.get('BBC_TRACE_MEMORY', '0') == '1'
+
+METRIC_PREFIX = 'bbc'
+
+_enabled = False
+_trace_memory = False
+_started: Optional[float] = None
+
+# (span name, sorted labels) -> {'count', 'seconds', 'max_seconds', and summed values}
+_lock = threading.Lock()
+_spans: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, float]] = {}
+_stages: List[Dict] = []
+_stage_stack: List['Stage'] = []
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('span', default=None)
+
+
+def enable(trace_memory: bool=False) -> None:
+    """
+        Start recording spans, and with trace_memory, each stage's peak traced memory.
+    """
+    global _enabled, _trace_memory, _started
+    _enabled = True
+    _trace_memory = trace_memory
+    _started = _started or time.time()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def init_worker() -> None:
+    """
+        Start a pool worker recording from empty: a forked worker would otherwise
+        carry a copy of its parent's spans, and its memory tracing.
+    """
+    enable()
+    drain()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, labels: Dict[str, Any], seconds: float, values: Dict[str, float]) -> None:
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _lock:
+        totals = _spans.setdefault(key, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        totals['count'] += 1
+        totals['seconds'] += seconds
+        totals['max_seconds'] = max(totals['max_seconds'], seconds)
+        for value_name, value in values.items():
+            totals[value_name] = totals.get(value_name, 0) + value
+
+
+class Span:
+    """
+        Times a block and records it under its name and labels, with any values
+        added along the way (rows, bytes, ...) summed per name and labels. Labels
+        can still be set inside the block, e.g. a response status.
+    """
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.values: Dict[str, float] = {}
+
+    def label(self, **labels) -> None:
+        self.labels.update(labels)
+
+    def add(self, **values: float) -> None:
+        for name, value in values.items():
+            self.values[name] = self.values.get(name, 0) + value
+
+    def __enter__(self) -> 'Span':
+        self.token = _current.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.seconds = time.perf_counter() - self.started
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.labels['error'] = exc_type.__name__
+        record(self.name, self.labels, self.seconds, self.values)
+
+
+class NoSpan:
+    def label(self, **labels) -> None:
+        pass
+
+    def add(self, **values: float) -> None:
+        pass
+
+    def __enter__(self) -> 'NoSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+def span(name: str, **labels) -> Span:
+    return Span(name, labels) if _enabled else NO_SPAN
+
+
+def current() -> Span:
+    """
+        The innermost open span, for code below it to label or add to.
+    """
+    return (_current.get() or NO_SPAN) if _enabled else NO_SPAN
+
+
+def timed(name: str, **labels) -> Callable:
+    """
+        Decorate a function to run in a span, counting the rows it returns.
+    """
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, dict(labels)) as timed_span:
+                result = func(*args, **kwargs)
+                timed_span.add(rows=len(result))
+            return result
+        return wrapper
+    return decorate
+
+
+class Stage(Span):
+    """
+        A phase of the run, listed on its own in the report rather than summed
+        with other spans, with its peak traced memory when tracing is on. Stages
+        nest; a stage's peak includes the stages inside it.
+    """
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        super().__init__('stage', {'stage': name, **labels})
+        self.peak = 0
+
+    def __enter__(self) -> 'Stage':
+        if _trace_memory:
+            if _stage_stack:
+                _stage_stack[-1].peak = max(_stage_stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        _stage_stack.append(self)
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.seconds = time.perf_counter() - self.started
+        _current.reset(self.token)
+        _stage_stack.remove(self)
+
+        entry = {**self.labels, 'seconds': round(self.seconds, 6)}
+        if exc_type is not None:
+            entry['error'] = exc_type.__name__
+        if _trace_memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if _stage_stack:
+                _stage_stack[-1].peak = max(_stage_stack[-1].peak, self.peak)
+            entry['peak_memory_bytes'] = self.peak
+        with _lock:
+            _stages.append(entry)
+
+
+def stage(name: str, **labels) -> Span:
+    return Stage(name, labels) if _enabled else NO_SPAN
+
+
+def url_class(url: str) -> str:
+    """
+        The container a BBC URL asks for, e.g. 'match-stats', to group requests by.
+    """
+    return urlsplit(url).path.rstrip('/').split('/')[-1]
+
+
+def drain() -> List[Tuple[str, Tuple, Dict[str, float]]]:
+    """
+        Take the spans recorded in this process, e.g. to send back from a worker.
+    """
+    with _lock:
+        spans = [(name, labels, totals) for (name, labels), totals in _spans.items()]
+        _spans.clear()
+    return spans
+
+
+def merge(spans: List[Tuple[str, Tuple, Dict[str, float]]]) -> None:
+    """
+        Add spans drained from another process to this one's.
+    """
+    with _lock:
+        for name, labels, totals in spans:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = _spans.setdefault(key, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            for value_name, value in totals.items():
+                if value_name == 'max_seconds':
+                    merged[value_name] = max(merged[value_name], value)
+                else:
+                    merged[value_name] = merged.get(value_name, 0) + value
+
+
+def report() -> Dict:
+    """
+        The run so far: when it started, how long it has taken, each stage, and
+        every span's totals, slowest first.
+    """
+    with _lock:
+        spans = [
+            {'name': name, 'labels': dict(labels), **{key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()}}
+            for (name, labels), totals in _spans.items()
+        ]
+        stages = list(_stages)
+
+    return {
+        'started': datetime.datetime.fromtimestamp(_started or time.time()).isoformat(timespec='seconds'),
+        'seconds': round(time.time() - (_started or time.time()), 6),
+        'memory_traced': _trace_memory,
+        'stages': stages,
+        'spans': sorted(spans, key=lambda span: span['seconds'], reverse=True)
+    }
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Dict[str, Any]) -> str:
+    return '{' + ','.join(f'{label}="{escape(str(value))}"' for label, value in labels.items()) + '}'
+
+
+def prometheus_text() -> str:
+    """
+        The run's spans and stages in the Prometheus text exposition format, e.g.
+        for a node_exporter textfile collector.
+    """
+    run = report()
+    metrics: Dict[str, Tuple[str, str, List[Tuple[Dict, float]]]] = {}
+
+    def add(metric: str, kind: str, help: str, labels: Dict, value: float) -> None:
+        metrics.setdefault(f'{METRIC_PREFIX}_{metric}', (kind, help, []))[2].append((labels, value))
+
+    add('run_seconds', 'gauge', 'Wall time of the run.', {}, run['seconds'])
+    add('run_timestamp_seconds', 'gauge', 'When the run started, as a Unix time.', {}, _started or time.time())
+
+    for entry in run['stages']:
+        labels = {key: value for key, value in entry.items() if key not in {'seconds', 'peak_memory_bytes'}}
+        add('stage_seconds', 'gauge', 'Wall time of each stage.', labels, entry['seconds'])
+        if 'peak_memory_bytes' in entry:
+            add('stage_peak_memory_bytes', 'gauge', 'Peak memory traced by tracemalloc during each stage.', labels, entry['peak_memory_bytes'])
+
+    for entry in run['spans']:
+        labels = {'span': entry['name'], **entry['labels']}
+        add('span_calls_total', 'counter', 'Spans recorded.', labels, entry['count'])
+        add('span_seconds_total', 'counter', 'Total wall time in each span.', labels, entry['seconds'])
+        add('span_max_seconds', 'gauge', 'Longest single span.', labels, entry['max_seconds'])
+        for value_name, value in entry.items():
+            if value_name not in {'name', 'labels', 'count', 'seconds', 'max_seconds'}:
+                add(f'span_{value_name}_total', 'counter', f'Total {value_name} counted in each span.', labels, value)
+
+    lines = []
+    for metric, (kind, help, samples) in metrics.items():
+        lines.append(f'# HELP {metric} {help}')
+        lines.append(f'# TYPE {metric} {kind}')
+        lines.extend(f'{metric}{format_labels(labels) if labels else ""} {value}' for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def write_atomically(path: str, text: str) -> None:
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        outfile.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_report(path: str) -> None:
+    write_atomically(path, json.dumps(report(), indent=2))
+
+
+def write_prometheus(path: str) -> None:
+    write_atomically(path, prometheus_text())
@@ -0,0 +1,122 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+import api_matchday_json as api
+import storage
+
+
+DATA_DIR = './data'
+R_DIR = './data-r'
+
+INDEX_NAME = 'player_index'
+
+TEAM_NAME = 'Tranmere Rovers'
+
+INDEX_COLUMNS = ['bbc_player_id', 'player_id', 'player_name', 'season', 'squad_no']
+
+
+def get_season(game_dates: pd.Series) -> pd.Series:
+    """
+        Season label for each date, e.g. 2024-08-10 -> '2024/25'. Seasons start in July.
+    """
+    start_year = game_dates.dt.year - (game_dates.dt.month < 7)
+    return start_year.astype(str) + '/' + (start_year + 1).astype(str).str[-2:]
+
+
+def lineup_roles(lineups: pd.DataFrame) -> pd.Series:
+    """
+        Role as recorded in player_apps: 'starter', 'sub' for a substitute who came
+        on, and None for an unused substitute.
+    """
+    is_sub = lineups.position == 'Substitute'
+    came_on = lineups.sub_off_min.notnull()
+    return pd.Series(np.select([~is_sub, is_sub & came_on], ['starter', 'sub'], None), index=lineups.index)
+
+
+def squad_lookup(squad_nos: pd.DataFrame) -> Dict[Tuple[str, int], str]:
+    """
+        Map (season, squad number) to player name, leaving out numbers shared by two players.
+    """
+    squad_nos = squad_nos.dropna(subset=['squad_no'])
+    unique = squad_nos[~squad_nos.duplicated(['season', 'squad_no'], keep=False)]
+    return {
+        (season, int(squad_no)): player_name
+        for season, squad_no, player_name in zip(unique.season.astype(str), unique.squad_no, unique.player_name.astype(str))
+    }
+
+
+def build_player_index(data_dir: str=DATA_DIR, r_dir: str=R_DIR) -> pd.DataFrame:
+    """
+        Match every BBC player URN in the lineups to the canonical player name used in
+        data-r, through player_apps on (game_date, role, shirt_no), or through the
+        season's squad numbers for matches player_apps doesn't cover yet.
+        Returns one row per player and season.
+    """
+    lineups = storage.read_table(data_dir, 'lineups', columns=['game_date', 'team_name', 'player_id', 'shirt_no', 'position', 'sub_off_min'])
+    lineups = lineups[(lineups.team_name == TEAM_NAME) & lineups.player_id.notna()].copy()
+    lineups['role'] = lineup_roles(lineups)
+    lineups['season'] = get_season(lineups.game_date)
+    lineups['player_id'] = lineups.player_id.astype(str)
+
+    apps = storage.read_table(r_dir, 'player_apps', columns=['game_date', 'player_name', 'shirt_no', 'role'])
+    apps = apps[~apps.duplicated(['game_date', 'role', 'shirt_no'], keep=False)]
+    apps['role'] = apps.role.astype(str)
+    apps['player_name'] = apps.player_name.astype(str)
+
+    matched = lineups.merge(apps, on=['game_date', 'role', 'shirt_no'], how='left')
+
+    squads = squad_lookup(storage.read_table(data_dir, 'squad_nos'))
+    from_squads = pd.Series(
+        [squads.get((season, int(shirt_no))) if pd.notna(shirt_no) else None for season, shirt_no in zip(matched.season, matched.shirt_no)],
+        index=matched.index
+    )
+    matched['player_name'] = matched.player_name.fillna(from_squads)
+    matched = matched.dropna(subset=['player_name'])
+
+    # A player keeps the name he appears under most often, and the squad number
+    # he wore most often in each season.
+    names = matched.groupby('player_id').player_name.agg(lambda names: names.mode().iloc[0])
+    squad_nos = matched.groupby(['player_id', 'season']).shirt_no.agg(lambda numbers: numbers.mode().iloc[0])
+
+    external_ids = pd.read_csv(f'{data_dir}/external_ids.csv')
+    external_ids = dict(zip(external_ids.bbc_urn.map(api.extract_player_id), external_ids.player_id))
+
+    index = squad_nos.rename('squad_no').reset_index().rename(columns={'player_id': 'bbc_player_id'})
+    index['player_name'] = index.bbc_player_id.map(names)
+    index['player_id'] = index.bbc_player_id.map(external_ids)
+    return index[INDEX_COLUMNS].sort_values(['player_name', 'season']).reset_index(drop=True)
+
+
+def load_player_index(data_dir: str=DATA_DIR, r_dir: str=R_DIR) -> pd.DataFrame:
+    """
+        Read data/player_index.csv, building it on first use.
+    """
+    try:
+        return pd.read_csv(storage.table_path(data_dir, INDEX_NAME, 'csv'), dtype={'squad_no': 'Int16'})
+    except FileNotFoundError:
+        index = build_player_index(data_dir, r_dir)
+        save_player_index(index, data_dir)
+        return index
+
+
+def save_player_index(index: pd.DataFrame, data_dir: str=DATA_DIR) -> None:
+    storage.write_table(index[INDEX_COLUMNS], data_dir, INDEX_NAME)
+
+
+def add_players(index: pd.DataFrame, players: pd.DataFrame) -> pd.DataFrame:
+    """
+        Add (bbc_player_id, season) rows that aren't in the index yet.
+    """
+    known = set(zip(index.bbc_player_id, index.season))
+    is_new = [key not in known for key in zip(players.bbc_player_id, players.season)]
+    return pd.concat([index, players[is_new].reindex(columns=INDEX_COLUMNS)]).reset_index(drop=True)
+
+
+def name_lookup(index: pd.DataFrame) -> Dict[str, str]:
+    return dict(zip(index.bbc_player_id, index.player_name))
+
+
+def squad_no_lookup(index: pd.DataFrame) -> Dict[Tuple[str, str], int]:
+    return dict(zip(zip(index.bbc_player_id, index.season), index.squad_no))
@@ -0,0 +1,131 @@
+from typing import Any, Callable, Dict, Optional, Union
+
+
+# A projection maps each key to keep either to True, keeping its value whole, or
+# to a nested projection. A projection applied to a list is applied to every item.
+Projection = Dict[str, Union[bool, 'Projection']]
+
+NAME = {'fullName': True}
+
+CARD = {'type': True, 'timeLabel': {'value': True}}
+
+SUBSTITUTION = {
+    'periodId': True,
+    'timeMin': True,
+    'reason': True,
+    'playerOnUrn': True,
+    'playerOnName': True,
+    'playerOffUrn': True,
+    'playerOffName': True
+}
+
+LINEUP_PLAYER = {
+    'name': {'first': True, 'last': True, 'short': True},
+    'urn': True,
+    'shirtNumber': True,
+    'position': True,
+    'formationPlace': True,
+    'isCaptain': True,
+    'cards': CARD,
+    'substitutedOff': SUBSTITUTION,
+    'substitutedOn': SUBSTITUTION
+}
+
+LINEUP_TEAM = {
+    'name': NAME,
+    'alignment': True,
+    'formation': {'value': True},
+    'manager': {'name': {'full': True}},
+    'players': {'starters': LINEUP_PLAYER, 'substitutes': LINEUP_PLAYER}
+}
+
+OFFICIAL = {
+    'firstName': True,
+    'lastName': True,
+    'shortFirstName': True,
+    'shortLastName': True,
+    'type': True
+}
+
+STATS_TEAM = {
+    'name': NAME,
+    'alignment': True,
+    'stats': True
+}
+
+GOAL_ACTION = {
+    'actionType': True,
+    'playerName': True,
+    'playerUrn': True,
+    'actions': {'type': True, 'timeLabel': {'value': True}}
+}
+
+EVENT_SCORES = {'fullName': True, 'runningScores': True}
+
+EVENT_GOALS = {'fullName': True, 'actions': GOAL_ACTION}
+
+TEXT = {'model': {'blocks': {'model': {'text': True}}}}
+
+PARAGRAPHS = {'model': {'blocks': TEXT}}
+
+# The fields each endpoint's row extractors in api_matchday_json read, and so the
+# only parts of a response written to bbc-json/. Each extractor declares what it
+# reads with reads(), which merges it in here as api_matchday_json is imported,
+# so a field an extractor starts reading is saved from then on; files saved
+# before then have to be re-fetched or restored from the raw archive. Error
+# responses keep their error, and commentary its page numbers, so saved files
+# are still recognisable as such. Endpoints without a projection are saved whole.
+PROJECTIONS: Dict[str, Projection] = {
+    'match_stats': {'error': True},
+    'match_info': {'error': True},
+    'lineups': {'error': True},
+    'table': {'error': True},
+    'sameday_fixtures': {'error': True},
+    'commentary': {'page': True}
+}
+
+
+def merge(projection: Projection, other: Projection) -> Projection:
+    """
+        Combine two projections into one keeping every field either keeps.
+    """
+    merged = dict(projection)
+    for key, field in other.items():
+        if key not in merged or field is True:
+            merged[key] = field
+        elif merged[key] is not True:
+            merged[key] = merge(merged[key], field)
+    return merged
+
+
+def reads(endpoint: str, projection: Projection) -> Callable:
+    """
+        Decorator for a row extractor, adding the fields it reads from an
+        endpoint's response to that endpoint's projection.
+    """
+    def decorate(func: Callable) -> Callable:
+        PROJECTIONS[endpoint] = merge(PROJECTIONS.get(endpoint, {}), projection)
+        return func
+    return decorate
+
+
+def project(data: Any, projection: Projection) -> Any:
+    """
+        Keep only the fields named in a projection. Values the projection doesn't
+        describe (None, strings, numbers) are kept as they are.
+    """
+    if isinstance(data, list):
+        return [project(item, projection) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    projected = {}
+    for key, field in projection.items():
+        if key in data:
+            projected[key] = data[key] if field is True else project(data[key], field)
+    return projected
+
+
+def project_endpoint(endpoint: str, data: Any) -> Any:
+    projection: Optional[Projection] = PROJECTIONS.get(endpoint)
+    return data if projection is None else project(data, projection)
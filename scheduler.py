@@ -0,0 +1,135 @@
+import datetime
+import time
+from typing import Callable, Dict, List, Optional
+
+import api_matchday_json as api
+import fixture_calendar
+from fixture_calendar import CALENDAR_FILE, NOT_PLAYED, describe
+
+
+# A match is due once it should be over: two halves, half-time and stoppage
+# time after kick-off, plus a little for the stats and lineups to settle. Extra
+# time and penalties just mean the first attempt finds it still in play.
+MATCH_LENGTH = datetime.timedelta(minutes=115)
+SETTLE_TIME = datetime.timedelta(minutes=15)
+
+# Seconds before trying again when a due match hasn't finished yet.
+RETRY_INTERVAL = 15 * 60
+
+# Longest sleep when following the calendar, so weekly refreshes aren't missed.
+MAX_SLEEP = 6 * 60 * 60
+
+
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def due_time(entry: Dict) -> datetime.datetime:
+    """
+        When a match should have finished. Without a confirmed kick-off time, the
+        end of its date.
+    """
+    if entry['kickoff']:
+        kickoff = datetime.datetime.fromisoformat(entry['kickoff'].replace('Z', '+00:00'))
+        return kickoff + MATCH_LENGTH + SETTLE_TIME
+    return datetime.datetime.fromisoformat(entry['date']).replace(tzinfo=datetime.timezone.utc) + datetime.timedelta(days=1)
+
+
+def pending(calendar: Dict) -> List[Dict]:
+    """
+        Matches still to be processed that are expected to go ahead, soonest first.
+    """
+    processed = set(calendar['processed'])
+    entries = [
+        entry for match_id, entry in calendar['matches'].items()
+        if match_id not in processed and entry['status'] not in NOT_PLAYED
+    ]
+    return sorted(entries, key=due_time)
+
+
+def due(calendar: Dict, now: datetime.datetime) -> List[Dict]:
+    return [entry for entry in pending(calendar) if due_time(entry) <= now]
+
+
+def next_due_time(calendar: Dict, now: datetime.datetime) -> Optional[datetime.datetime]:
+    return next((due_time(entry) for entry in pending(calendar) if due_time(entry) > now), None)
+
+
+def run_pipeline(entries: List[Dict]) -> List[str]:
+    """
+        Fetch, extract and update for finished matches. Returns their dates.
+    """
+    import extract
+    import updater
+
+    dates = sorted({entry['date'] for entry in entries})
+    for entry in entries:
+        api.save_match_json(entry['date'], entry['fixture_info'])
+    extract.run_extraction()
+    updater.Pipeline().update(dates)
+    return dates
+
+
+def run_due(now: Optional[datetime.datetime]=None, dry_run: bool=False, path: str=CALENDAR_FILE) -> List[str]:
+    """
+        Run the pipeline for every match that should be over by now and hasn't been
+        processed. Nothing is requested on a day without one, beyond the calendar's
+        occasional refresh. A due match is checked against a freshly fetched
+        calendar first: one still in play is left for the next run, and a postponed
+        one is dropped until it is rearranged. Returns the dates processed.
+    """
+    now = now or utc_now()
+    season = fixture_calendar.season_of(now.date())
+    calendar = fixture_calendar.get_calendar(season, path=path)
+
+    if not due(calendar, now):
+        next_due = next_due_time(calendar, now)
+        print(f"Nothing due; next match due {next_due:%Y-%m-%d %H:%M} UTC" if next_due else f"No more matches in {season}")
+        return []
+
+    # The calendar can be days old, so get the due matches' current status.
+    calendar = fixture_calendar.refresh_calendar(calendar, season, path)
+
+    finished = []
+    for entry in due(calendar, now):
+        if entry['status'] == 'PostEvent':
+            finished.append(entry)
+        else:
+            print(f"Not finished yet ({entry['status']}): {describe(entry)}")
+
+    for entry in finished:
+        print(f"{'Would process' if dry_run else 'Processing'}: {describe(entry)}")
+    if not finished or dry_run:
+        return []
+
+    dates = run_pipeline(finished)
+    calendar['processed'].extend(entry['match_id'] for entry in finished)
+    fixture_calendar.save_calendar(calendar, path)
+    return dates
+
+
+def seconds_until_next_run(now: Optional[datetime.datetime]=None, path: str=CALENDAR_FILE) -> float:
+    now = now or utc_now()
+    calendar = fixture_calendar.get_calendar(fixture_calendar.season_of(now.date()), path=path)
+    if due(calendar, now):
+        return RETRY_INTERVAL
+
+    next_due = next_due_time(calendar, now)
+    if next_due is None:
+        return MAX_SLEEP
+    return min(MAX_SLEEP, max(0, (next_due - now).total_seconds()))
+
+
+def follow(path: str=CALENDAR_FILE, sleep: Callable[[float], None]=time.sleep) -> None:
+    """
+        Run due matches as they finish, sleeping until the next one is due.
+    """
+    while True:
+        try:
+            run_due(path=path)
+            seconds = seconds_until_next_run(path=path)
+        except Exception as e:
+            print(f"Error running the schedule: {e}")
+            seconds = RETRY_INTERVAL
+        print(f"Sleeping {seconds / 60:.0f} minutes")
+        sleep(seconds)
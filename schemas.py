@@ -0,0 +1,374 @@
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+DATE = 'date'
+CATEGORY = 'category'
+INT8 = 'int8'
+INT16 = 'int16'
+INT32 = 'int32'
+FLOAT = 'float'
+BOOL = 'bool'
+STR = 'str'
+
+# Schema key giving the type of every column the schema doesn't list, for
+# tables whose columns come from the feed.
+OTHER_COLUMNS = '*'
+
+# Column types for each table, keyed by '<directory>/<table>'. Columns that
+# aren't listed are left to type inference, unless OTHER_COLUMNS is given.
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    'data-r/results': {
+        'season': CATEGORY,
+        'game_date': DATE,
+        'game_no': INT16,
+        'opposition': CATEGORY,
+        'venue': CATEGORY,
+        'score': CATEGORY,
+        'outcome': CATEGORY,
+        'goals_for': INT8,
+        'goals_against': INT8,
+        'goal_diff': INT8,
+        'game_type': CATEGORY,
+        'competition': CATEGORY,
+        'generic_comp': CATEGORY,
+        'ssn_comp_game_no': INT16,
+        'league_tier': INT8,
+        'league_pos': INT8,
+        'pts': INT16,
+        'attendance': INT32,
+        'weekday': CATEGORY,
+        'manager': CATEGORY,
+        'ko_time': CATEGORY,
+        'game_length': INT16,
+        'stadium': CATEGORY,
+        'referee': CATEGORY
+    },
+    'data-r/player_apps': {
+        'game_date': DATE,
+        'player_name': CATEGORY,
+        'shirt_no': INT16,
+        'role': CATEGORY
+    },
+    'data-r/goals': {
+        'game_date': DATE,
+        'player_name': CATEGORY,
+        'goal_min': INT16,
+        'penalty': INT8,
+        'own_goal': INT8
+    },
+    'data-r/subs': {
+        'game_date': DATE,
+        'shirt_no': INT16,
+        'player_name': CATEGORY,
+        'on_for': INT16,
+        'off_for': INT16
+    },
+    'data-r/sub_mins': {
+        'game_date': DATE,
+        'player_name': CATEGORY,
+        'min_off': INT16,
+        'min_on': INT16
+    },
+    'data-r/yellow_cards': {
+        'game_date': DATE,
+        'player_name': CATEGORY,
+        'min_yc': CATEGORY
+    },
+    'data-r/red_cards': {
+        'game_date': DATE,
+        'player_name': CATEGORY,
+        'min_so': INT16
+    },
+    'data/assists': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'assist_player': CATEGORY,
+        'assist_min': INT16,
+        'assist_min_inj': INT8
+    },
+    'data/commentary': {
+        'game_date': DATE,
+        'comm_min': INT16,
+        'comm_min_inj': INT8,
+        'comm_text': STR,
+        'headline': CATEGORY
+    },
+    'data/goals': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'player_name': CATEGORY,
+        'bbc_player_id': CATEGORY,
+        'goal_min': INT16,
+        'goal_min_inj': INT16,
+        'goal_type': CATEGORY
+    },
+    'data/league_tables': {
+        'league_name': CATEGORY,
+        'cup_div': CATEGORY,
+        'rank': INT8,
+        'team_name': CATEGORY,
+        'p': INT8,
+        'w': INT8,
+        'd': INT8,
+        'l': INT8,
+        'gf': INT16,
+        'ga': INT16,
+        'gd': INT16,
+        'points': INT16,
+        'game_date': DATE
+    },
+    'data/lineups': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'team_venue': CATEGORY,
+        'formation': CATEGORY,
+        'team_manager': CATEGORY,
+        'surname': CATEGORY,
+        'forename': CATEGORY,
+        'player_name': CATEGORY,
+        'short_name': CATEGORY,
+        'player_id': CATEGORY,
+        'shirt_no': INT16,
+        'position': CATEGORY,
+        'formation_place': INT8,
+        'is_captain': BOOL,
+        'yellow_card': INT8,
+        'min_yc': CATEGORY,
+        'red_card': INT8,
+        'min_rc': CATEGORY,
+        'sub_off_period': INT8,
+        'sub_off_min': INT16,
+        'sub_off_reason': CATEGORY,
+        'sub_replacement_id': CATEGORY,
+        'sub_replacement_name': CATEGORY,
+        'sub_on_period': INT8,
+        'sub_on_min': INT16,
+        'sub_on_reason': CATEGORY,
+        'sub_replaced_id': CATEGORY,
+        'sub_replaced_name': CATEGORY
+    },
+    'data/match_stats': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'team_venue': CATEGORY,
+        'possessionPercentage': FLOAT,
+        'shotsTotal': INT16,
+        'shotsOnTarget': INT16,
+        'shotsOffTarget': INT16,
+        'shotsBlocked': INT16,
+        'shotsSaved': INT16,
+        'foulsCommitted': INT16,
+        'cornersWon': INT16,
+        'touchesInBox': INT16,
+        'aerialsWon': INT16,
+        'subsMade': INT16,
+        'attack.shotsTotal': INT16,
+        'attack.shotsOnTarget': INT16,
+        'attack.shotsOffTarget': INT16,
+        'attack.shotsBlocked': INT16,
+        'attack.cornersWon': INT16,
+        'attackOffside': INT16,
+        'attackCross': INT16,
+        'attack.attemptsOutOfBox': INT16,
+        'attack.attemptsInBox': INT16,
+        'attack.bigChanceCreated': INT16,
+        'attack.bigChanceScored': INT16,
+        'attack.hitWoodwork': INT16,
+        'attack.shotsOpenPlayOrFastBreak': INT16,
+        'distribution.touches': INT16,
+        'distribution.touchesInBox': INT16,
+        'distributionPass': INT16,
+        'distribution.accuratePass': INT16,
+        'distribution.backwardPass': INT16,
+        'distribution.forwardPass': INT16,
+        'distribution.passesRight': INT16,
+        'distribution.passesLeft': INT16,
+        'distributionLongBalls': INT16,
+        'distribution.successfulFinalThirdPasses': INT16,
+        'distributionOffside': INT16,
+        'distribution.dispossessed': INT16,
+        'distributionCross': INT16,
+        'goalkeeper.shotsSaved': INT16,
+        'goalkeeper.divingSave': INT16,
+        'goalkeeper.keeperThrows': INT16,
+        'goalkeeper.goalKicks': INT16,
+        'goalkeeper.savedShotFromOutsideBox': INT16,
+        'defence.foulsCommitted': INT16,
+        'defenceTackle': INT16,
+        'defence.wonTackle': INT16,
+        'defenceYellowCard': INT16,
+        'defenceClearance': INT16,
+        'defence.headClearance': INT16,
+        'defence.duelWon': INT16,
+        'defence.duelLost': INT16,
+        'defence.aerialWon': INT16,
+        'defence.aerialLost': INT16,
+        'goalkeeper.savedShotFromInsideBox': INT16,
+        'attack.bigChanceMissed': INT16,
+        'goalkeeper.punches': INT16,
+        'attack.oneOnOneAttempts': INT16,
+        'defence.clearanceOffLine': INT16,
+        'defence.errorLeadToShot': INT16,
+        'distribution.accuratePassPercentage': FLOAT,
+        'defence.wonTacklePercentage': FLOAT,
+        'goalkeeper.penaltySave': INT16,
+        # Stats the feed adds later; floats lose nothing whatever they turn out to be.
+        OTHER_COLUMNS: FLOAT
+    },
+    'data/match_info': {
+        'game_date': DATE,
+        'competition': CATEGORY,
+        'competition_long': CATEGORY,
+        'comp_stage': CATEGORY,
+        'comp_round': CATEGORY,
+        'ko_time': CATEGORY,
+        'venue': CATEGORY,
+        'attendance': INT32
+    },
+    'data/officials': {
+        'game_date': DATE,
+        'surname': CATEGORY,
+        'forename': CATEGORY,
+        'name': CATEGORY,
+        'role': CATEGORY
+    },
+    'data/sameday_fixtures': {
+        'game_date': DATE,
+        'home_team': CATEGORY,
+        'away_team': CATEGORY,
+        'team_name': CATEGORY,
+        'ht_score': INT8,
+        'ft_score': INT8,
+        'pen_score': INT8
+    },
+    'data/sameday_scorers': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'player_name': CATEGORY,
+        'bbc_player_id': CATEGORY,
+        'goal_min': CATEGORY,
+        'goal_min_inj': INT8,
+        'goal_type': CATEGORY
+    },
+    'data/scores': {
+        'game_date': DATE,
+        'team_name': CATEGORY,
+        'team_venue': CATEGORY,
+        'ht_score': INT8,
+        'ft_score': INT8,
+        'et_score': INT8,
+        'pens_score': INT8
+    },
+    'data/squad_nos': {
+        'season': CATEGORY,
+        'player_name': CATEGORY,
+        'squad_no': INT16
+    }
+}
+
+# Dates are read at one resolution whichever backend they come from; CSV
+# parsing and Parquet otherwise give different units.
+DATE_DTYPE = 'datetime64[ns]'
+
+PANDAS_INTS = {
+    INT8: 'Int8',
+    INT16: 'Int16',
+    INT32: 'Int32'
+}
+
+
+def schema_key(directory: str, name: str) -> str:
+    """
+        Return the SCHEMAS key for a table, e.g. ('./data-r', 'results') -> 'data-r/results'.
+    """
+    return f"{directory.rstrip('/').split('/')[-1]}/{name}"
+
+
+def get_schema(directory: str, name: str) -> Dict[str, str]:
+    return SCHEMAS.get(schema_key(directory, name), {})
+
+
+def to_bool(series: pd.Series) -> pd.Series:
+    return series.map({True: True, False: False, 'True': True, 'False': False, 1: True, 0: False}).astype('boolean')
+
+
+def column_kinds(df: pd.DataFrame, schema: Dict[str, str]) -> Dict[str, str]:
+    """
+        The schema's type for each of a frame's columns that has one.
+    """
+    other = schema.get(OTHER_COLUMNS)
+    return {
+        column: schema.get(column, other) for column in df.columns
+        if column in schema or other is not None
+    }
+
+
+def checked(converted: pd.Series, original: pd.Series, column: str, kind: str) -> pd.Series:
+    """
+        A converted column, after checking the conversion blanked nothing but blanks:
+        a value that doesn't parse as its schema type is an error, not a missing value.
+    """
+    lost = converted.isna() & original.notna()
+    if lost.any():
+        lost &= original.astype(str).str.strip() != ''
+    if lost.any():
+        examples = ', '.join(repr(value) for value in original[lost].astype(str).unique()[:3])
+        raise ValueError(f"{lost.sum()} values in column {column} aren't valid {kind} values, e.g. {examples}")
+    return converted
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str], dates: bool=True) -> pd.DataFrame:
+    """
+        Convert each column listed in the schema to its pandas dtype. With dates
+        unset, date columns are left as they are, e.g. kept as text, apart from
+        parsed dates being brought to DATE_DTYPE.
+    """
+    df = df.copy(deep=False)
+    for column, kind in column_kinds(df, schema).items():
+        if kind == DATE:
+            if dates:
+                df[column] = checked(pd.to_datetime(df[column], errors='coerce'), df[column], column, kind).astype(DATE_DTYPE)
+            elif pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].astype(DATE_DTYPE)
+        elif kind == CATEGORY:
+            df[column] = df[column].astype('category')
+        elif kind in PANDAS_INTS:
+            df[column] = checked(pd.to_numeric(df[column], errors='coerce'), df[column], column, kind).round().astype(PANDAS_INTS[kind])
+        elif kind == FLOAT:
+            # Whole numbers too, so 50.0 is written the same way in every frame.
+            df[column] = checked(pd.to_numeric(df[column], errors='coerce'), df[column], column, kind).astype('float64')
+        elif kind == BOOL:
+            df[column] = to_bool(df[column])
+        elif kind == STR:
+            df[column] = df[column].astype('string')
+    return df
+
+
+def arrow_schema(df: pd.DataFrame, schema: Dict[str, str]) -> Optional['pyarrow.Schema']:
+    """
+        Build the Arrow schema for a frame, using explicit types for listed columns.
+    """
+    import pyarrow as pa
+
+    arrow_types = {
+        DATE: pa.date32(),
+        CATEGORY: pa.dictionary(pa.int32(), pa.string()),
+        INT8: pa.int8(),
+        INT16: pa.int16(),
+        INT32: pa.int32(),
+        FLOAT: pa.float64(),
+        BOOL: pa.bool_(),
+        STR: pa.string()
+    }
+
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    kinds = column_kinds(df, schema)
+    fields = []
+    for field in inferred:
+        if field.name in kinds:
+            fields.append(pa.field(field.name, arrow_types[kinds[field.name]]))
+        else:
+            fields.append(field)
+    return pa.schema(fields)
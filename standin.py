@@ -0,0 +1,188 @@
+import functools
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import api_matchday_json as api
+
+
+# A local stand-in for the BBC containers, serving the bbc-json corpus at the same
+# URL shapes. Point BBC_API_BASE and BBC_COMMENTARY_BASE at it to run fetches,
+# backfills and live polling without the CDN.
+
+# Container name (the last part of the URL path) -> bbc-json endpoint directory.
+CONTAINERS = {
+    'match-stats': 'match_stats',
+    'live-header': 'match_info',
+    'match-lineups': 'lineups',
+    'football-table': 'table',
+    'football-on-the-day-events': 'sameday_fixtures',
+    'stream': 'commentary'
+}
+
+# Query parameters carrying the match, in the order they are looked for.
+MATCH_PARAMS = ['urn', 'matchUrn', 'sportDataEventUrn', 'liveTextStreamId']
+
+DEFAULT_PORT = 8765
+
+RETRY_AFTER = 1
+
+
+class StandInCorpus:
+    """
+        Answers container requests from the saved payloads, matching requests to
+        dates through the event IDs in bbc-json/fixture_info.
+    """
+    def __init__(self):
+        self.match_dates: Dict[str, str] = {}
+        for file in api.get_file_list('fixture_info'):
+            game_date = api.extract_date_from_filename(file)
+            self.match_dates[api.get_match_id(api.read_json_file(file))] = game_date
+
+    @functools.lru_cache(maxsize=512)
+    def payload(self, endpoint: str, game_date: str):
+        try:
+            return api.read_json_file(f'./bbc-json/{endpoint}/{game_date}.json')
+        except Exception:
+            return None
+
+    def fixtures(self, query: Dict[str, str]) -> Tuple[int, Dict]:
+        start = query.get('selectedStartDate', '')
+        end = query.get('selectedEndDate', start)
+        dates = sorted(game_date for game_date in self.match_dates.values() if start <= game_date <= end)
+        return 200, {'eventGroups': [self.payload('fixture_info', game_date) for game_date in dates]}
+
+    def commentary_page(self, pages: List[Dict], query: Dict[str, str]) -> Dict:
+        """
+            Re-page the saved commentary at the requested page size.
+        """
+        items = [item for page in pages or [] for item in page['results']]
+        page_size = int(query.get('pageSize', api.COMMENTARY_PAGE_SIZE))
+        page_no = int(query.get('pageNumber', 1))
+        total = max(1, -(-len(items) // page_size))
+        return {
+            'page': {'index': page_no, 'total': total},
+            'results': items[(page_no - 1) * page_size:page_no * page_size]
+        }
+
+    def respond(self, path: str, query: Dict[str, str]) -> Tuple[int, Dict]:
+        container = path.rstrip('/').split('/')[-1]
+        if container == 'sport-data-scores-fixtures':
+            return self.fixtures(query)
+
+        endpoint = CONTAINERS.get(container)
+        match_id = next((query[param].split(':')[-1] for param in MATCH_PARAMS if param in query), None)
+        game_date = self.match_dates.get(match_id)
+        payload = self.payload(endpoint, game_date) if endpoint and game_date else None
+
+        if payload is None:
+            return 404, {'error': {'message': f'Error fetching data for container: {container}', 'statusCode': 404}}
+        if endpoint == 'commentary':
+            return 200, self.commentary_page(payload, query)
+        return 200, payload
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+        Threaded server with injected latency, jitter, errors and throttling.
+        Delays are in seconds and rates are the fraction of requests affected.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float=0.0, jitter: float=0.0, error_rate: float=0.0, throttle_rate: float=0.0, seed: Optional[int]=None, verbose: bool=False):
+        super().__init__(address, StandInHandler)
+        self.corpus = StandInCorpus()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.verbose = verbose
+        self.stats: Counter = Counter()
+        self.stats_lock = threading.Lock()
+
+    def base_urls(self) -> Dict[str, str]:
+        host, port = self.server_address[:2]
+        return {
+            'BBC_API_BASE': f'http://{host}:{port}/wc-poll-data/container',
+            'BBC_COMMENTARY_BASE': f'http://{host}:{port}/wc-data/container'
+        }
+
+    def count(self, status: int) -> None:
+        with self.stats_lock:
+            self.stats[status] += 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server: StandInServer = self.server
+        delay = server.latency + server.random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = server.random.random()
+        if roll < server.throttle_rate:
+            self.send_json(429, {'error': {'message': 'Too Many Requests', 'statusCode': 429}}, {'Retry-After': str(RETRY_AFTER)})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            self.send_json(503, {'error': {'message': 'Service Unavailable', 'statusCode': 503}})
+            return
+
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, body = server.corpus.respond(url.path, query)
+        self.send_json(status, body)
+
+    def send_json(self, status: int, body, headers: Optional[Dict[str, str]]=None) -> None:
+        data = json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, data = 304, b''
+
+        self.server.count(status)
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start(host: str='127.0.0.1', port: int=0, **options) -> StandInServer:
+    """
+        Start a stand-in server on a background thread, e.g. for benchmarks.
+        Port 0 picks a free port; see server.base_urls().
+    """
+    server = StandInServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve(host: str='127.0.0.1', port: int=DEFAULT_PORT, **options) -> None:
+    server = StandInServer((host, port), **options)
+    print(f"Serving {len(server.corpus.match_dates)} matches from bbc-json/. Point the fetchers at it with:")
+    for name, url in server.base_urls().items():
+        print(f"  export {name}={url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses by status: {dict(sorted(server.stats.items()))}")
@@ -0,0 +1,200 @@
+import bisect
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import api_matchday_json as api
+import corpus
+
+
+METRICS = ['rank', 'p', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'points']
+
+STANDINGS_FILE = './data/standings.npz'
+
+TEAM_NAME = 'Tranmere Rovers'
+
+
+class Standings:
+    """
+        League tables as a (date x team x metric) array, with index maps for each
+        axis. Dates are kept sorted, so a season or date range is a contiguous slice.
+        Cells are NaN where a team wasn't in the league on that date.
+    """
+    def __init__(self, dates: Optional[List[str]]=None, teams: Optional[List[str]]=None, values: Optional[np.ndarray]=None, states: Optional[Dict[str, Tuple[int, float]]]=None):
+        self.dates = list(dates or [])
+        self.teams = list(teams or [])
+        self.values = values if values is not None else np.full((len(self.dates), len(self.teams), len(METRICS)), np.nan, dtype=np.float32)
+        # game_date -> (size, mtime) of the table JSON it was built from
+        self.states = dict(states or {})
+        self.metric_index = {metric: i for i, metric in enumerate(METRICS)}
+        self.reindex()
+
+    def reindex(self) -> None:
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+
+    def add_table(self, game_date: str, rows: List[Dict]) -> None:
+        """
+            Set one date's table, inserting the date in order and any new teams.
+        """
+        new_teams = [row['team_name'] for row in rows if row['team_name'] not in self.team_index]
+        if new_teams:
+            padding = np.full((len(self.dates), len(new_teams), len(METRICS)), np.nan, dtype=np.float32)
+            self.values = np.concatenate([self.values, padding], axis=1)
+            self.teams.extend(new_teams)
+
+        if game_date not in self.date_index:
+            position = bisect.bisect(self.dates, game_date)
+            self.dates.insert(position, game_date)
+            self.values = np.insert(self.values, position, np.nan, axis=0)
+
+        self.reindex()
+
+        date_i = self.date_index[game_date]
+        self.values[date_i] = np.nan
+        for row in rows:
+            self.values[date_i, self.team_index[row['team_name']]] = [
+                np.nan if row[metric] is None else row[metric] for metric in METRICS
+            ]
+
+    def remove_dates(self, dates: List[str]) -> None:
+        """
+            Drop the given dates' tables along with the record of their files.
+        """
+        keep = [i for i, date in enumerate(self.dates) if date not in dates]
+        self.dates = [self.dates[i] for i in keep]
+        self.values = self.values[keep]
+        for date in dates:
+            self.states.pop(date, None)
+        self.reindex()
+
+    def update(self) -> List[str]:
+        """
+            Read any table JSON that is new or has changed since it was last read,
+            and drop the dates whose JSON has gone. Returns the dates updated.
+        """
+        files = {api.extract_date_from_filename(file): file for file in api.get_file_list('table')}
+        removed = [date for date in set(self.dates) | set(self.states) if date not in files]
+        if removed:
+            self.remove_dates(removed)
+
+        updated = sorted(removed)
+        for game_date, file in sorted(files.items()):
+            state = corpus.file_state(file)
+            if self.states.get(game_date) == state:
+                continue
+
+            try:
+                rows = league_rows(api.read_json_file(file), game_date)
+            except Exception as e:
+                print(f"Error reading table from {file}: {e}")
+                rows = []
+            if rows:
+                self.add_table(game_date, rows)
+            elif game_date in self.date_index:
+                self.remove_dates([game_date])
+            self.states[game_date] = state
+            updated.append(game_date)
+        return updated
+
+    def save(self, path: str=STANDINGS_FILE) -> None:
+        state_dates = sorted(self.states)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            dates=np.array(self.dates, dtype=str),
+            teams=np.array(self.teams, dtype=str),
+            values=self.values,
+            state_dates=np.array(state_dates, dtype=str),
+            state_sizes=np.array([self.states[date][0] for date in state_dates], dtype=np.int64),
+            state_mtimes=np.array([self.states[date][1] for date in state_dates], dtype=np.float64)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str=STANDINGS_FILE) -> 'Standings':
+        with np.load(path) as f:
+            states = {
+                date: (int(size), float(mtime))
+                for date, size, mtime in zip(f['state_dates'], f['state_sizes'], f['state_mtimes'])
+            }
+            return cls(f['dates'].tolist(), f['teams'].tolist(), f['values'], states)
+
+    def date_slice(self, start: Optional[str]=None, end: Optional[str]=None) -> slice:
+        """
+            Index slice of the dates between start and end, inclusive.
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.dates, start)
+        hi = len(self.dates) if end is None else bisect.bisect_right(self.dates, end)
+        return slice(lo, hi)
+
+    def get(self, game_date: str, team: str, metric: str) -> float:
+        if game_date not in self.date_index or team not in self.team_index:
+            return np.nan
+        return float(self.values[self.date_index[game_date], self.team_index[team], self.metric_index[metric]])
+
+    def position_on(self, game_date: str, team: str=TEAM_NAME) -> float:
+        return self.get(game_date, team, 'rank')
+
+    def lookup(self, dates: List[str], team: str, metrics: List[str]) -> np.ndarray:
+        """
+            (len(dates) x len(metrics)) array of a team's figures, NaN for dates without a table.
+        """
+        result = np.full((len(dates), len(metrics)), np.nan, dtype=np.float32)
+        team_i = self.team_index.get(team)
+        if team_i is None:
+            return result
+        metric_is = [self.metric_index[metric] for metric in metrics]
+        for i, game_date in enumerate(dates):
+            date_i = self.date_index.get(game_date)
+            if date_i is not None:
+                result[i] = self.values[date_i, team_i, metric_is]
+        return result
+
+    def series(self, team: str, metric: str, start: Optional[str]=None, end: Optional[str]=None) -> Tuple[List[str], np.ndarray]:
+        """
+            A team's metric at every matchday between start and end.
+        """
+        dates = self.date_slice(start, end)
+        team_i = self.team_index.get(team)
+        if team_i is None:
+            return self.dates[dates], np.full(dates.stop - dates.start, np.nan, dtype=np.float32)
+        return self.dates[dates], self.values[dates, team_i, self.metric_index[metric]]
+
+    def ranks(self, team: str=TEAM_NAME, start: Optional[str]=None, end: Optional[str]=None) -> Tuple[List[str], np.ndarray]:
+        return self.series(team, 'rank', start, end)
+
+    def points_gap(self, team: str=TEAM_NAME, rank: int=1, start: Optional[str]=None, end: Optional[str]=None) -> Tuple[List[str], np.ndarray]:
+        """
+            Points between a team and whoever held `rank` at every matchday;
+            negative when the team is behind.
+        """
+        dates, points = self.series(team, 'points', start, end)
+        table = self.values[self.date_slice(start, end)]
+        at_rank = table[:, :, self.metric_index['rank']] == rank
+        rank_points = np.where(at_rank, table[:, :, self.metric_index['points']], -np.inf).max(axis=1)
+        rank_points[np.isinf(rank_points)] = np.nan
+        return dates, points - rank_points
+
+
+def league_rows(data: Dict, game_date: str, team_name: str=TEAM_NAME) -> List[Dict]:
+    """
+        Table rows for the team's league, skipping cup group tables.
+    """
+    return [row for row in api.league_table_rows(data, game_date, team_name) if row['cup_div'] is None]
+
+
+def load_standings(path: str=STANDINGS_FILE) -> Standings:
+    """
+        Load the saved standings, bring them up to date with the table JSONs and
+        save them again if anything changed.
+    """
+    try:
+        standings = Standings.load(path)
+    except FileNotFoundError:
+        standings = Standings()
+
+    if standings.update():
+        standings.save(path)
+    return standings
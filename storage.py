@@ -0,0 +1,238 @@
+import json
+import os
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+import metrics
+import schemas
+
+
+# 'parquet' keeps a typed columnar copy of every table next to its CSV and
+# reads from it; 'csv' (the default) reads and writes CSV only.
+BACKEND = os.environ.get('DATA_BACKEND', 'csv')
+
+# Natural keys already written to each table live in '<directory>/.keys/<table>.keys',
+# one per line. index.json records the CSV size each key file matches.
+KEYS_DIR = '.keys'
+KEY_INDEX_FILE = 'index.json'
+KEY_SEPARATOR = '\x1f'
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parquet_enabled() -> bool:
+    return BACKEND == 'parquet' and parquet_available()
+
+
+def table_path(directory: str, name: str, extension: str) -> str:
+    return f"{directory.rstrip('/')}/{name}.{extension}"
+
+
+def read_parquet(directory: str, name: str, columns: Optional[List[str]]=None) -> pd.DataFrame:
+    """
+        Read a Parquet table, keeping nullable integers and dictionary columns as categories.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    int_types = {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.bool_(): pd.BooleanDtype()
+    }
+    table = pq.read_table(table_path(directory, name, 'parquet'), columns=columns)
+    return table.to_pandas(date_as_object=False, types_mapper=int_types.get)
+
+
+def write_parquet(df: pd.DataFrame, directory: str, name: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = schemas.get_schema(directory, name)
+    df = schemas.apply_schema(df, schema)
+    table = pa.Table.from_pandas(df, schema=schemas.arrow_schema(df, schema), preserve_index=False)
+    pq.write_table(table, table_path(directory, name, 'parquet'))
+
+
+def read_table(directory: str, name: str, columns: Optional[List[str]]=None) -> pd.DataFrame:
+    """
+        Read a table, from Parquet when that backend is enabled and a copy exists,
+        otherwise from CSV. `columns` limits the read to the fields a caller needs.
+    """
+    # The schema is applied on both backends so callers see the same types either way.
+    schema = schemas.get_schema(directory, name)
+    with metrics.span('read', table=schemas.schema_key(directory, name)) as read_span:
+        if parquet_enabled() and os.path.exists(table_path(directory, name, 'parquet')):
+            df = read_parquet(directory, name, columns)
+        else:
+            dates = [column for column, kind in schema.items() if kind == schemas.DATE and (columns is None or column in columns)]
+            df = pd.read_csv(table_path(directory, name, 'csv'), usecols=columns, parse_dates=dates)
+        df = schemas.apply_schema(df, schema, dates=False)
+        read_span.add(rows=len(df))
+    return df
+
+
+def typed_for_csv(df: pd.DataFrame, directory: str, name: str) -> pd.DataFrame:
+    """
+        Type a frame from the schema registry before it is written, so a value is
+        written the same way whichever frame it is in: an integer column with a gap
+        would otherwise be written as floats (62.0), and a rewrite of the whole
+        table would change rows it didn't touch.
+    """
+    return schemas.apply_schema(df, schemas.get_schema(directory, name), dates=False)
+
+
+def write_table(df: pd.DataFrame, directory: str, name: str) -> None:
+    """
+        Write a table as CSV, which the R side reads, and as Parquet when enabled.
+    """
+    os.makedirs(directory, exist_ok=True)
+    df = typed_for_csv(df, directory, name)
+    with metrics.span('write', table=schemas.schema_key(directory, name)) as write_span:
+        write_span.add(rows=len(df))
+        df.to_csv(table_path(directory, name, 'csv'), index=False)
+        if parquet_enabled():
+            write_parquet(df, directory, name)
+    invalidate_keys(directory, name)
+
+
+def append_table(new_df: pd.DataFrame, directory: str, name: str, columns: List[str]) -> None:
+    """
+        Append rows to a table's CSV in the given column order, and to its Parquet
+        copy when enabled. A table without a Parquet copy yet gets one built from
+        the whole CSV, so the copy never holds only the appended rows.
+    """
+    new_df = typed_for_csv(new_df.reindex(columns=columns), directory, name)
+    with metrics.span('write', table=schemas.schema_key(directory, name), mode='append') as write_span:
+        write_span.add(rows=len(new_df))
+        new_df.to_csv(table_path(directory, name, 'csv'), mode='a', header=False, index=False)
+        if parquet_enabled():
+            if os.path.exists(table_path(directory, name, 'parquet')):
+                write_parquet(pd.concat([read_parquet(directory, name), new_df]), directory, name)
+            else:
+                write_parquet(pd.read_csv(table_path(directory, name, 'csv')), directory, name)
+
+
+def keys_path(directory: str, name: str) -> str:
+    return f"{directory.rstrip('/')}/{KEYS_DIR}/{name}.keys"
+
+
+def key_index_path(directory: str) -> str:
+    return f"{directory.rstrip('/')}/{KEYS_DIR}/{KEY_INDEX_FILE}"
+
+
+def load_key_index(directory: str) -> Dict[str, int]:
+    try:
+        with open(key_index_path(directory)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_key_index(index: Dict[str, int], directory: str) -> None:
+    os.makedirs(os.path.dirname(key_index_path(directory)), exist_ok=True)
+    tmp_path = f'{key_index_path(directory)}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(index, outfile, indent=1, sort_keys=True)
+    os.replace(tmp_path, key_index_path(directory))
+
+
+def invalidate_keys(directory: str, name: str) -> None:
+    index = load_key_index(directory)
+    if index.pop(name, None) is not None:
+        save_key_index(index, directory)
+
+
+def key_column(series: pd.Series) -> pd.Series:
+    """
+        Format a key column the same way whether it came from a CSV or a fresh frame,
+        e.g. dates as YYYY-MM-DD and 17.0 as 17.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').fillna('')
+    numbers = pd.to_numeric(series, errors='coerce')
+    if numbers.notna().sum() == series.notna().sum():
+        return numbers.map(lambda value: '' if pd.isna(value) else f'{value:g}')
+    return series.astype(str).where(series.notna(), '')
+
+
+def row_keys(df: pd.DataFrame, keys: List[str]) -> pd.Series:
+    columns = [key_column(df[key]) for key in keys]
+    return columns[0].str.cat(columns[1:], sep=KEY_SEPARATOR) if len(columns) > 1 else columns[0]
+
+
+def load_keys(directory: str, name: str, keys: List[str]) -> Set[str]:
+    """
+        Return the keys already in a table, rebuilding the key file from the CSV
+        when it is missing or the CSV has changed size since it was written.
+    """
+    csv_size = os.path.getsize(table_path(directory, name, 'csv'))
+    if load_key_index(directory).get(name) == csv_size and os.path.exists(keys_path(directory, name)):
+        with open(keys_path(directory, name)) as f:
+            return set(f.read().splitlines())
+
+    existing = set(row_keys(read_table(directory, name, columns=keys), keys))
+    os.makedirs(os.path.dirname(keys_path(directory, name)), exist_ok=True)
+    with open(keys_path(directory, name), 'w') as outfile:
+        outfile.writelines(f'{key}\n' for key in sorted(existing))
+
+    index = load_key_index(directory)
+    index[name] = csv_size
+    save_key_index(index, directory)
+    return existing
+
+
+def append_new_rows(new_df: pd.DataFrame, directory: str, name: str, keys: List[str]) -> int:
+    """
+        Append only the rows whose natural key isn't already in the table, so
+        re-running an update is a no-op. Returns the number of rows written.
+    """
+    if new_df.empty:
+        return 0
+
+    if not os.path.exists(table_path(directory, name, 'csv')):
+        write_table(new_df, directory, name)
+        load_keys(directory, name, keys)
+        return len(new_df)
+
+    existing = load_keys(directory, name, keys)
+    new_keys = row_keys(new_df, keys)
+    is_new = ~new_keys.isin(existing).to_numpy()
+    new_df = new_df[is_new]
+    if new_df.empty:
+        return 0
+
+    columns = pd.read_csv(table_path(directory, name, 'csv'), nrows=0).columns.tolist()
+    append_table(new_df, directory, name, columns)
+
+    with open(keys_path(directory, name), 'a') as outfile:
+        outfile.writelines(f'{key}\n' for key in new_keys[is_new].unique())
+
+    index = load_key_index(directory)
+    index[name] = os.path.getsize(table_path(directory, name, 'csv'))
+    save_key_index(index, directory)
+    return len(new_df)
+
+
+def convert_directory(directory: str) -> List[str]:
+    """
+        Write a Parquet copy of every CSV table in a directory. Returns the tables converted.
+    """
+    converted = []
+    for file in sorted(os.listdir(directory)):
+        if file.endswith('.csv'):
+            name = file[:-len('.csv')]
+            write_parquet(pd.read_csv(table_path(directory, name, 'csv')), directory, name)
+            converted.append(name)
+    return converted
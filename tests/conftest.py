@@ -0,0 +1,32 @@
+import os
+import shutil
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Built by the pipeline rather than checked in.
+GENERATED = ['.keys', '*.tmp', 'extract_manifest.json', 'standings.npz', 'fixture_calendar.json']
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+        A copy of bbc-json/, data/ and data-r/ to run the pipeline in. Every module
+        reads and writes relative to the working directory, so the tests run from it.
+    """
+    for directory in ['bbc-json', 'data', 'data-r']:
+        shutil.copytree(os.path.join(ROOT, directory), tmp_path / directory, ignore=shutil.ignore_patterns(*GENERATED))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def committed(path: str) -> bytes:
+    with open(os.path.join(ROOT, path), 'rb') as infile:
+        return infile.read()
+
+
+def written(path: str) -> bytes:
+    with open(path, 'rb') as infile:
+        return infile.read()
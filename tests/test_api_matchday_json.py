@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+
+import api_matchday_json as api
+
+
+def test_finished_match_stops_being_followed(workspace, monkeypatch):
+    fixture_info = api.read_json_file('bbc-json/fixture_info/2026-04-06.json')
+    match_id = api.get_match_id(fixture_info)
+    assert api.is_finished(fixture_info)
+
+    def fetch_concurrently(jobs):
+        # As get_commentary would, having fetched the pages.
+        api.remember_commentary(match_id, [{'page': {'index': 1, 'total': 1}, 'results': []}])
+        return {endpoint: {} for endpoint in jobs}
+
+    monkeypatch.setattr(api, 'fetch_concurrently', fetch_concurrently)
+
+    api.get_match_json('2026-04-06', fixture_info)
+
+    assert match_id not in api._commentary_streams
+
+
+def test_endpoints_are_fetched_at_once_with_their_own_timeouts():
+    # Each request waits for the others to start, so running them one by one would time out.
+    started = threading.Barrier(3, timeout=5)
+
+    def request(endpoint, timeout=None):
+        started.wait()
+        return endpoint, timeout
+
+    responses = api.fetch_concurrently({endpoint: (request, (endpoint,)) for endpoint in ['match_stats', 'lineups', 'commentary']})
+
+    assert responses == {
+        'match_stats': ('match_stats', api.ENDPOINT_TIMEOUTS['match_stats']),
+        'lineups': ('lineups', api.ENDPOINT_TIMEOUTS['lineups']),
+        'commentary': ('commentary', api.ENDPOINT_TIMEOUTS['commentary'])
+    }
+
+
+def test_fetching_several_dates_makes_one_fixtures_request(workspace, monkeypatch):
+    fixture_info = api.read_json_file('bbc-json/fixture_info/2026-04-06.json')
+    requests = []
+    monkeypatch.setattr(api, 'get_fixture_events', lambda *args, **kwargs: requests.append(args) or [fixture_info])
+    saved = []
+    monkeypatch.setattr(api, 'save_match_json', lambda game_date, fixture_info, raw_archive=None: saved.append(game_date))
+
+    assert api.save_dates_json(['2026-04-03', '2026-04-06']) == ['2026-04-06']
+    assert requests == [('2026-04-03', '2026-04-06')]
+    assert saved == ['2026-04-06']
+
+
+def test_unchanged_response_is_not_rewritten(workspace):
+    data = {'homeTeam': {'stats': {}}, 'awayTeam': {'stats': {}}}
+    api.write_endpoint_json('2030-01-01', 'match_stats', data)
+    path = workspace / 'bbc-json' / 'match_stats' / '2030-01-01.json'
+    os.utime(path, (0, 0))
+
+    api.write_endpoint_json('2030-01-01', 'match_stats', data)
+
+    assert path.stat().st_mtime == 0
+
+
+def test_backfill_saves_finished_matches_past_a_failure(workspace, monkeypatch):
+    finished = {date: api.read_json_file(f'bbc-json/fixture_info/{date}.json') for date in ['2026-03-21', '2026-04-03', '2026-04-06']}
+    in_play = json.loads(json.dumps(finished['2026-04-06']))
+    in_play['secondaryGroups'][0]['events'][0]['status'] = 'MidEvent'
+    monkeypatch.setattr(api, 'get_fixture_events', lambda *args, **kwargs: [finished['2026-03-21'], finished['2026-04-03'], in_play])
+
+    def save_match_json(game_date, fixture_info, raw_archive=None):
+        if game_date == '2026-04-03':
+            raise ValueError('no lineups')
+
+    monkeypatch.setattr(api, 'save_match_json', save_match_json)
+
+    assert api.backfill_match_json('2026-03-21', '2026-04-06', max_workers=2) == ['2026-03-21']
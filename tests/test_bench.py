@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+import bench
+
+
+def noisy() -> int:
+    print('from the stage')
+    subprocess.run([sys.executable, '-c', "print('from a worker')"], check=True)
+    return 1
+
+
+def test_stage_output_stays_out_of_the_report(capfd):
+    assert bench.in_new_process(noisy) == 1
+
+    assert capfd.readouterr().out == ''
+
+
+def test_regressions_need_both_relative_and_absolute_growth():
+    assert bench.is_regression(1.3, 1.0, 0.2, 0.05)
+    assert not bench.is_regression(0.013, 0.01, 0.2, 0.05)
+    assert not bench.is_regression(1.1, 1.0, 0.2, 0.05)
@@ -0,0 +1,27 @@
+import corpus
+
+
+def test_pack_can_be_rewritten_uncompressed(workspace):
+    corpus.pack_endpoint('match_info', codec='zlib', keep_files=True)
+    assert corpus.open_pack('match_info').codec == 'zlib'
+
+    corpus.pack_endpoint('match_info', keep_files=True)
+    assert corpus.open_pack('match_info').codec == 'zlib'
+
+    corpus.pack_endpoint('match_info', codec=None, keep_files=True)
+    pack = corpus.open_pack('match_info')
+    assert pack.codec is None
+    for game_date in pack.dates():
+        assert pack.read(game_date) == open(corpus.record_name('match_info', game_date), 'rb').read()
+
+
+def test_replaced_pack_is_closed(workspace):
+    corpus.pack_endpoint('match_info', keep_files=True)
+    old = corpus.open_pack('match_info')
+
+    corpus.pack_endpoint('match_info', codec='zlib', keep_files=True)
+    new = corpus.open_pack('match_info')
+
+    assert new is not old
+    assert old.buffer.closed
+    assert not new.buffer.closed
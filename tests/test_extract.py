@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+import api_matchday_json as api
+import extract
+from conftest import committed, written
+
+
+TABLES = list(extract.EXTRACTORS)
+
+
+@pytest.mark.parametrize('table', TABLES)
+def test_full_extraction_reproduces_committed_tables(workspace, table):
+    extract.run_extraction([table], full=True)
+
+    assert written(f'data/{table}.csv') == committed(f'data/{table}.csv')
+
+
+def test_first_incremental_run_rebuilds_tables(workspace, capsys):
+    # Rows for a date with no JSON behind them, as a table built by hand might hold.
+    with open('data/scores.csv', 'a') as outfile:
+        outfile.write('2024-01-20,Swindon Town,home,2,3,,\n')
+
+    extract.run_extraction(['scores'])
+
+    assert written('data/scores.csv') == committed('data/scores.csv')
+    assert 'dropped or changed 1 rows' in capsys.readouterr().out
+
+
+def hide_files(workspace, dates):
+    """
+        Move the JSON for some dates out of bbc-json/, returning a function that puts it back.
+    """
+    hidden = [path for date in dates for path in workspace.glob(f'bbc-json/*/{date}.json')]
+    for path in hidden:
+        path.rename(path.with_suffix('.hidden'))
+
+    def restore():
+        for path in hidden:
+            path.with_suffix('.hidden').rename(path)
+    return restore
+
+
+@pytest.mark.parametrize('dates', [
+    # Newer than everything extracted: appended to each CSV.
+    ['2026-03-21', '2026-04-03', '2026-04-06'],
+    # In the middle of the table: its partition is rewritten.
+    ['2024-02-27']
+])
+def test_incremental_run_matches_full_extraction(workspace, dates):
+    restore = hide_files(workspace, dates)
+    extract.run_extraction(full=True)
+    restore()
+
+    extract.run_extraction()
+
+    for table in TABLES:
+        assert written(f'data/{table}.csv') == committed(f'data/{table}.csv'), table
+
+
+def test_unchanged_corpus_is_not_re_extracted(workspace):
+    extract.run_extraction(full=True)
+
+    assert extract.run_extraction() == {table: 0 for table in TABLES}
+
+
+def test_corrections_fill_values_the_feed_left_blank(workspace):
+    with open('data/corrections.csv', 'a') as outfile:
+        outfile.write('match_info,2024-08-20,attendance,700\n')
+    api.load_corrections.cache_clear()
+
+    try:
+        extract.run_extraction(['match_info'], full=True)
+    finally:
+        api.load_corrections.cache_clear()
+
+    match_info = pd.read_csv('data/match_info.csv')
+    assert match_info.loc[match_info.game_date == '2024-08-20', 'attendance'].tolist() == [700]
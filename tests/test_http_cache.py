@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_cache
+import transport
+
+
+TABLE_URL = 'https://web-cdn.api.bbci.co.uk/wc-poll-data/container/football-table?urn=1&todayDate=2026-04-06'
+LINEUPS_URL = 'https://web-cdn.api.bbci.co.uk/wc-poll-data/container/match-lineups?eventUrn=1'
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode()
+        self.headers = {'ETag': '"v1"'}
+
+
+@pytest.fixture
+def network(tmp_path, monkeypatch):
+    """
+        Requests that reach the network, answered with the body given for the URL.
+    """
+    monkeypatch.setattr(http_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(http_cache, '_size', None)
+    requests = []
+
+    def conditional_get(url, entry, timeout):
+        requests.append(url)
+        if entry is not None and entry.get('etag') == '"v1"' and network.not_modified:
+            return Response(304)
+        return Response(200, {'request': len(requests)})
+
+    network = type('Network', (), {'requests': requests, 'not_modified': False})
+    monkeypatch.setattr(transport, 'conditional_get', conditional_get)
+    return network
+
+
+def test_fresh_entry_is_served_from_the_cache(network):
+    first = http_cache.get_json(TABLE_URL)
+
+    assert http_cache.get_json(TABLE_URL) == first
+    assert len(network.requests) == 1
+
+
+def test_volatile_params_share_an_entry(network):
+    http_cache.get_json(TABLE_URL)
+    http_cache.get_json(TABLE_URL.replace('2026-04-06', '2026-04-07'))
+
+    assert len(network.requests) == 1
+
+
+def test_max_age_zero_refetches(network):
+    http_cache.get_json(TABLE_URL)
+    with http_cache.max_age(0):
+        http_cache.get_json(TABLE_URL)
+
+    assert len(network.requests) == 2
+
+
+@pytest.mark.parametrize('url', [TABLE_URL, LINEUPS_URL])
+def test_entry_stored_in_play_is_revalidated_at_full_time(network, url):
+    with http_cache.max_age(0):
+        in_play = http_cache.get_json(url)
+
+    assert http_cache.get_json(url) != in_play
+    assert len(network.requests) == 2
+
+
+def test_revalidated_entry_is_no_longer_provisional(network):
+    with http_cache.max_age(0):
+        in_play = http_cache.get_json(LINEUPS_URL)
+    network.not_modified = True
+
+    assert http_cache.get_json(LINEUPS_URL) == in_play
+    assert http_cache.get_json(LINEUPS_URL) == in_play
+    assert len(network.requests) == 2
+
+
+def test_endpoint_ttls():
+    assert http_cache.endpoint_ttl(TABLE_URL) == 60 * 60
+    assert http_cache.endpoint_ttl(LINEUPS_URL) is http_cache.PERMANENT
+    assert http_cache.endpoint_ttl('https://example.com/other') == http_cache.DEFAULT_TTL
+
+
+def test_concurrent_identical_requests_share_one_fetch(network, monkeypatch):
+    release = threading.Event()
+    conditional_get = transport.conditional_get
+
+    def slow_get(url, entry, timeout):
+        release.wait(5)
+        return conditional_get(url, entry, timeout)
+
+    monkeypatch.setattr(transport, 'conditional_get', slow_get)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(http_cache.get_json, LINEUPS_URL) for _ in range(4)]
+        while not http_cache._flights:
+            time.sleep(0.001)
+        release.set()
+        bodies = [future.result() for future in futures]
+
+    assert len(network.requests) == 1
+    assert all(body == bodies[0] for body in bodies)
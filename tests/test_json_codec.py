@@ -0,0 +1,75 @@
+import glob
+import io
+import json
+
+import pytest
+
+import api_matchday_json as api
+import extract
+import json_codec
+
+
+def test_decoder_falls_back_to_the_stdlib(monkeypatch):
+    def missing():
+        raise ImportError
+
+    monkeypatch.setitem(json_codec.DECODERS, 'orjson', missing)
+    monkeypatch.setitem(json_codec.DECODERS, 'msgspec', missing)
+
+    assert json_codec.select_decoder(None) is json.loads
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        json_codec.loads(b'{"events": [')
+
+
+def items_at(data, path):
+    """
+        What iter_items should yield for a prefix, from the fully decoded document.
+    """
+    if not path:
+        yield data
+    elif path[0] == 'item':
+        for item in data if isinstance(data, list) else []:
+            yield from items_at(item, path[1:])
+    elif isinstance(data, dict) and path[0] in data:
+        yield from items_at(data[path[0]], path[1:])
+
+
+@pytest.mark.parametrize('table', list(api.STREAMED_ROWS))
+def test_stdlib_scan_matches_a_full_decode(workspace, monkeypatch, table):
+    monkeypatch.setattr(json_codec, 'ijson_available', lambda: False)
+    endpoint, _ = extract.EXTRACTORS[table]
+    prefix = api.STREAMED_ROWS[table][0]
+
+    for file in sorted(glob.glob(f'bbc-json/{endpoint}/*.json')):
+        with open(file, 'rb') as infile:
+            raw = infile.read()
+
+        scanned = list(json_codec.iter_items(io.BytesIO(raw), prefix))
+
+        assert scanned == list(items_at(json.loads(raw), prefix.split('.'))), file
+
+
+@pytest.mark.parametrize('document, prefix, expected', [
+    ('{"events": null}', 'events.item', []),
+    ('{"other": [1, {"events": [9]}], "events": [ {"a": 1} , 2 ]}', 'events.item', [{'a': 1}, 2]),
+    ('[{"results": [1, 2]}, {"page": {}}, {"results": []}]', 'item.results.item', [1, 2]),
+    ('{"a": "events \\" ]", "events": ["x"]}', 'events.item', ['x'])
+])
+def test_stdlib_scan_skips_values_off_the_path(monkeypatch, document, prefix, expected):
+    monkeypatch.setattr(json_codec, 'ijson_available', lambda: False)
+
+    assert list(json_codec.iter_items(io.BytesIO(document.encode()), prefix)) == expected
+
+
+def test_stdlib_scan_says_when_it_reads_a_large_document_whole(monkeypatch, capsys):
+    monkeypatch.setattr(json_codec, 'ijson_available', lambda: False)
+    monkeypatch.setattr(json_codec, 'LARGE_DOCUMENT_BYTES', 10)
+    monkeypatch.setattr(json_codec, '_warned_large', False)
+
+    list(json_codec.iter_items(io.BytesIO(b'{"events": [1, 2, 3, 4]}'), 'events.item'))
+    list(json_codec.iter_items(io.BytesIO(b'{"events": [1, 2, 3, 4]}'), 'events.item'))
+
+    assert capsys.readouterr().out.count('without ijson') == 1
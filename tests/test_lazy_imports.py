@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+
+from lazy_imports import lazy_import
+
+
+def test_missing_module_raises_module_not_found():
+    with pytest.raises(ModuleNotFoundError) as error:
+        lazy_import('no_such_module_here')
+
+    assert error.value.name == 'no_such_module_here'
+    assert 'no_such_module_here' not in sys.modules
+
+
+def test_module_is_executed_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+
+    colorsys = lazy_import('colorsys')
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
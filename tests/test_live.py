@@ -0,0 +1,55 @@
+import pytest
+import requests
+
+import api_matchday_json as api
+import live
+
+
+def no_sleep(seconds):
+    pass
+
+
+def test_poll_match_returns_on_a_day_without_a_match(workspace, monkeypatch):
+    monkeypatch.setattr(api, 'get_fixtures', lambda *args, **kwargs: [])
+
+    assert live.poll_match('2026-10-18', sleep=no_sleep) == 0
+
+
+def test_fixture_fetch_retries_network_errors_with_backoff(monkeypatch):
+    attempts = []
+
+    def get_fixtures(*args, **kwargs):
+        attempts.append(1)
+        raise requests.ConnectionError('connection reset')
+
+    monkeypatch.setattr(api, 'get_fixtures', get_fixtures)
+    waits = []
+
+    with pytest.raises(requests.ConnectionError):
+        live.fetch_fixture('2026-10-18', sleep=waits.append)
+
+    assert len(attempts) == live.FIXTURE_RETRIES + 1
+    assert waits == [live.FIXTURE_RETRY_DELAY * 2 ** attempt for attempt in range(live.FIXTURE_RETRIES)]
+
+
+def test_fixture_fetch_does_not_retry_other_errors(monkeypatch):
+    def get_fixtures(*args, **kwargs):
+        raise KeyError('eventGroups')
+
+    monkeypatch.setattr(api, 'get_fixtures', get_fixtures)
+
+    with pytest.raises(KeyError):
+        live.fetch_fixture('2026-10-18', sleep=no_sleep)
+
+
+def test_poll_saves_only_changed_endpoints_and_archives_them(workspace, monkeypatch):
+    fixture_info = api.read_json_file('bbc-json/fixture_info/2026-04-06.json')
+    previous = live.load_saved('2026-04-06', live.LIVE_ENDPOINTS)
+    responses = {endpoint: previous[endpoint] for endpoint in live.LIVE_ENDPOINTS}
+    responses['match_stats'] = {**responses['match_stats'], 'homeTeam': {'stats': {}}}
+    monkeypatch.setattr(api, 'fetch_concurrently', lambda jobs: {endpoint: responses[endpoint] for endpoint in jobs})
+    monkeypatch.setattr(api, 'RAW_ARCHIVE_DIR', str(workspace / 'raw'))
+
+    assert live.poll_once('2026-04-06', fixture_info, previous) == ['match_stats']
+    assert (workspace / 'raw' / 'match_stats' / '2026-04-06.json.gz').exists()
+    assert api.read_json_file('bbc-json/match_stats/2026-04-06.json')['homeTeam'] == {'stats': {}}
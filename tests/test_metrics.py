@@ -0,0 +1,70 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', True)
+    monkeypatch.setattr(metrics, '_spans', {})
+    monkeypatch.setattr(metrics, '_stages', [])
+    monkeypatch.setattr(metrics, '_stage_stack', [])
+
+
+def test_nothing_is_recorded_until_enabled(monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', False)
+
+    assert metrics.span('request') is metrics.NO_SPAN
+    assert metrics.current() is metrics.NO_SPAN
+
+
+def test_spans_are_summed_per_name_and_labels(recording):
+    for status in [200, 200, 304]:
+        with metrics.span('request', url='table'):
+            metrics.current().label(status=status)
+            metrics.current().add(bytes=10)
+
+    spans = {tuple(sorted(span['labels'].items())): span for span in metrics.report()['spans']}
+    assert spans[(('status', '200'), ('url', 'table'))]['count'] == 2
+    assert spans[(('status', '200'), ('url', 'table'))]['bytes'] == 20
+    assert spans[(('status', '304'), ('url', 'table'))]['count'] == 1
+
+
+def test_timed_counts_the_rows_returned(recording):
+    @metrics.timed('build', dataset='goals')
+    def build():
+        return [1, 2, 3]
+
+    build()
+
+    assert metrics.report()['spans'][0]['rows'] == 3
+
+
+def test_failed_stage_is_reported_with_its_error(recording):
+    with pytest.raises(ValueError):
+        with metrics.stage('extract'):
+            raise ValueError
+
+    assert metrics.report()['stages'] == [{'stage': 'extract', 'seconds': pytest.approx(0, abs=1), 'error': 'ValueError'}]
+
+
+def test_spans_merged_from_a_worker_add_up(recording):
+    with metrics.span('request'):
+        pass
+    drained = metrics.drain()
+    with metrics.span('request'):
+        pass
+
+    metrics.merge(drained)
+
+    assert metrics.report()['spans'][0]['count'] == 2
+
+
+def test_prometheus_text_labels_each_sample(recording):
+    with metrics.span('request', url='say "hi"'):
+        pass
+
+    text = metrics.prometheus_text()
+
+    assert '# TYPE bbc_span_calls_total counter' in text
+    assert 'bbc_span_calls_total{span="request",url="say \\"hi\\""} 1' in text
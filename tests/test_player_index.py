@@ -0,0 +1,38 @@
+import os
+
+import pandas as pd
+
+import player_index
+
+
+def test_built_index_matches_the_committed_one(workspace):
+    built = player_index.build_player_index()
+
+    pd.testing.assert_frame_equal(built, player_index.load_player_index(), check_dtype=False)
+
+
+def test_index_is_built_on_first_use(workspace):
+    committed = player_index.load_player_index()
+    os.remove('data/player_index.csv')
+
+    pd.testing.assert_frame_equal(player_index.load_player_index(), committed, check_dtype=False)
+    assert os.path.exists('data/player_index.csv')
+
+
+def test_add_players_skips_known_players_and_seasons():
+    index = pd.DataFrame({'bbc_player_id': ['a'], 'player_name': ['A'], 'season': ['2025/26']})
+    players = pd.DataFrame({
+        'bbc_player_id': ['a', 'a', 'b'],
+        'player_name': ['A', 'A', 'B'],
+        'season': ['2025/26', '2026/27', '2025/26']
+    })
+
+    added = player_index.add_players(index, players)
+
+    assert list(zip(added.bbc_player_id, added.season)) == [('a', '2025/26'), ('a', '2026/27'), ('b', '2025/26')]
+
+
+def test_seasons_start_in_july():
+    dates = pd.Series(pd.to_datetime(['2025-06-30', '2025-07-01']))
+
+    assert player_index.get_season(dates).tolist() == ['2024/25', '2025/26']
@@ -0,0 +1,37 @@
+import glob
+
+import pytest
+
+import api_matchday_json as api
+import extract
+import projections
+
+
+def test_merge_keeps_every_field_either_keeps():
+    merged = projections.merge(
+        {'a': {'b': True}, 'c': True},
+        {'a': {'d': {'e': True}}, 'c': {'f': True}}
+    )
+
+    assert merged == {'a': {'b': True, 'd': {'e': True}}, 'c': True}
+
+
+def outcome(rows, data, game_date):
+    """
+        An extractor's rows for some data, or the type of error it raised.
+    """
+    try:
+        return rows(data, game_date)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('table', list(extract.EXTRACTORS))
+def test_extractors_read_nothing_their_projection_drops(workspace, table):
+    endpoint, rows = extract.EXTRACTORS[table]
+    for file in sorted(glob.glob(f'bbc-json/{endpoint}/*.json')):
+        data = api.read_json_file(file)
+        game_date = api.extract_date_from_filename(file)
+
+        projected = projections.project_endpoint(endpoint, data)
+        assert outcome(rows, projected, game_date) == outcome(rows, data, game_date), file
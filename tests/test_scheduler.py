@@ -0,0 +1,83 @@
+import datetime
+
+import api_matchday_json as api
+import fixture_calendar
+import scheduler
+
+
+UTC = datetime.timezone.utc
+
+
+def entry(match_id, date, kickoff=None, status='PreEvent'):
+    return {'match_id': match_id, 'date': date, 'kickoff': kickoff, 'status': status}
+
+
+CALENDAR = {
+    'matches': {
+        'a': entry('a', '2025-08-02', '2025-08-02T14:00:00Z', 'PostEvent'),
+        'b': entry('b', '2025-08-09', '2025-08-09T14:00:00Z'),
+        'c': entry('c', '2025-08-12'),
+        'd': entry('d', '2025-08-05', '2025-08-05T18:45:00Z', 'Postponed')
+    },
+    'processed': ['a']
+}
+
+
+def test_due_time_allows_for_the_match_to_finish():
+    assert scheduler.due_time(CALENDAR['matches']['b']) == datetime.datetime(2025, 8, 9, 16, 10, tzinfo=UTC)
+
+
+def test_due_time_without_a_kickoff_is_the_end_of_the_day():
+    assert scheduler.due_time(CALENDAR['matches']['c']) == datetime.datetime(2025, 8, 13, tzinfo=UTC)
+
+
+def test_processed_and_postponed_matches_are_never_due():
+    now = datetime.datetime(2025, 9, 1, tzinfo=UTC)
+
+    assert [entry['match_id'] for entry in scheduler.due(CALENDAR, now)] == ['b', 'c']
+    assert scheduler.next_due_time(CALENDAR, now) is None
+
+
+def test_nothing_is_due_before_the_match_ends():
+    now = datetime.datetime(2025, 8, 9, 16, 0, tzinfo=UTC)
+
+    assert scheduler.due(CALENDAR, now) == []
+    assert scheduler.next_due_time(CALENDAR, now) == datetime.datetime(2025, 8, 9, 16, 10, tzinfo=UTC)
+
+
+def test_seconds_until_next_run(monkeypatch):
+    monkeypatch.setattr(fixture_calendar, 'get_calendar', lambda season, path: CALENDAR)
+
+    assert scheduler.seconds_until_next_run(datetime.datetime(2025, 8, 9, 16, 0, tzinfo=UTC)) == 600
+    assert scheduler.seconds_until_next_run(datetime.datetime(2025, 8, 1, tzinfo=UTC)) == scheduler.MAX_SLEEP
+    assert scheduler.seconds_until_next_run(datetime.datetime(2025, 8, 10, tzinfo=UTC)) == scheduler.RETRY_INTERVAL
+
+
+def test_season_of():
+    assert fixture_calendar.season_of(datetime.date(2025, 8, 10)) == '2025/26'
+    assert fixture_calendar.season_of(datetime.date(2026, 6, 30)) == '2025/26'
+
+
+def fixture(date, status='PreEvent', time_certain=True):
+    fixture_info = api.read_json_file('bbc-json/fixture_info/2026-04-06.json')
+    event = fixture_info['secondaryGroups'][0]['events'][0]
+    event['date']['isoDate'] = date
+    event['startDateTime'] = f'{date}T15:00:00Z'
+    event['status'] = status
+    event['time'] = {'timeCertainty': time_certain}
+    return fixture_info
+
+
+def test_rearranged_fixture_replaces_the_postponed_one(workspace):
+    entries = fixture_calendar.build_entries([fixture('2026-01-10', 'Postponed'), fixture('2026-02-03', time_certain=False)])
+
+    [entry] = entries.values()
+    assert (entry['date'], entry['kickoff'], entry['status']) == ('2026-02-03', None, 'PreEvent')
+
+
+def test_calendar_changes_are_reported():
+    old = {'a': {**entry('a', '2026-01-10', '2026-01-10T15:00:00Z'), 'home': 'H', 'away': 'A', 'competition': 'C'}}
+    new = {'a': {**old['a'], 'date': '2026-02-03'}}
+
+    assert fixture_calendar.report_changes(old, new) == ['Rearranged from 2026-01-10: 2026-02-03 H v A (C)']
+    assert fixture_calendar.report_changes(old, {}) == ['No longer listed: 2026-01-10 H v A (C)']
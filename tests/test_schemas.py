@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import schemas
+
+
+SCHEMA = {
+    'game_date': schemas.DATE,
+    'team_name': schemas.CATEGORY,
+    'goals': schemas.INT8,
+    'possession': schemas.FLOAT,
+    schemas.OTHER_COLUMNS: schemas.FLOAT
+}
+
+
+def test_columns_take_their_schema_types():
+    df = pd.DataFrame({
+        'game_date': ['2026-04-06', None],
+        'team_name': ['Tranmere Rovers', 'Colchester United'],
+        'goals': ['0', ''],
+        'possession': [50, 50.5],
+        'shotsTotal': ['7', None]
+    })
+
+    typed = schemas.apply_schema(df, SCHEMA)
+
+    assert typed.dtypes.astype(str).to_dict() == {
+        'game_date': 'datetime64[ns]',
+        'team_name': 'category',
+        'goals': 'Int8',
+        'possession': 'float64',
+        'shotsTotal': 'float64'
+    }
+    assert typed.goals.isna().tolist() == [False, True]
+
+
+def test_schema_key_uses_the_last_directory():
+    assert schemas.schema_key('./data-r/', 'results') == 'data-r/results'
+    assert schemas.get_schema('/somewhere/data', 'scores') is schemas.SCHEMAS['data/scores']
+
+
+@pytest.mark.parametrize('column, value', [
+    ('goals', 'two'),
+    ('possession', '50%'),
+    ('game_date', 'not a date')
+])
+def test_values_that_do_not_parse_are_an_error(column, value):
+    df = pd.DataFrame({'game_date': ['2026-04-06'], 'goals': ['1'], 'possession': ['50']})
+    df[column] = [value]
+
+    with pytest.raises(ValueError, match=column):
+        schemas.apply_schema(df, SCHEMA)
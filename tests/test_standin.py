@@ -0,0 +1,66 @@
+import glob
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api_matchday_json as api
+import standin
+
+
+@pytest.fixture
+def server(workspace):
+    server = standin.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, container, headers=None, **query):
+    url = f"{server.base_urls()['BBC_API_BASE']}/{container}?" + '&'.join(f'{key}={value}' for key, value in query.items())
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as r:
+            return r.status, r.headers, json.loads(r.read() or 'null')
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, None
+
+
+def saved_match():
+    file = sorted(glob.glob('bbc-json/match_stats/*.json'))[-1]
+    game_date = api.extract_date_from_filename(file)
+    match_id = api.get_match_id(api.read_json_file(f'bbc-json/fixture_info/{game_date}.json'))
+    return match_id, api.read_json_file(file)
+
+
+def test_serves_the_saved_payload_for_a_match(server):
+    match_id, saved = saved_match()
+
+    status, headers, body = get(server, 'match-stats', urn=f'urn:bbc:sportsdata:football:event:{match_id}')
+
+    assert status == 200 and body == saved
+
+
+def test_unchanged_payload_is_a_304(server):
+    match_id, _ = saved_match()
+    _, headers, _ = get(server, 'match-stats', urn=match_id)
+
+    status, _, _ = get(server, 'match-stats', {'If-None-Match': headers['ETag']}, urn=match_id)
+
+    assert status == 304
+
+
+def test_unknown_match_is_a_404(server):
+    assert get(server, 'match-stats', urn='nothing')[0] == 404
+
+
+def test_throttled_requests_are_told_when_to_retry(workspace):
+    server = standin.start(throttle_rate=1.0)
+    try:
+        status, headers, _ = get(server, 'match-stats', urn='nothing')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert status == 429 and headers['Retry-After'] == str(standin.RETRY_AFTER)
+    assert server.stats == {429: 1}
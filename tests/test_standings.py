@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+import standings
+
+
+def test_lookup_reads_a_teams_figures(workspace):
+    table = standings.load_standings('data/standings.npz')
+    game_date = table.dates[-1]
+
+    figures = table.lookup([game_date, '1900-01-01'], standings.TEAM_NAME, ['rank', 'points'])
+
+    assert figures[0, 0] == table.position_on(game_date)
+    assert 1 <= figures[0, 0] <= 24 and figures[0, 1] >= 0
+    assert np.isnan(figures[1]).all()
+
+
+def test_saved_standings_are_reused(workspace):
+    standings.load_standings('data/standings.npz')
+
+    assert standings.Standings.load('data/standings.npz').update() == []
+
+
+def test_update_drops_dates_whose_table_has_gone(workspace):
+    table = standings.load_standings('data/standings.npz')
+    game_date = table.dates[-1]
+    os.remove(f'bbc-json/table/{game_date}.json')
+
+    table = standings.load_standings('data/standings.npz')
+
+    assert game_date not in table.dates and game_date not in table.states
+    assert np.isnan(table.position_on(game_date))
+    assert table.values.shape[0] == len(table.dates)
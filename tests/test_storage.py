@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import storage
+import updater
+
+
+@pytest.fixture
+def parquet(monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(storage, 'BACKEND', 'parquet')
+
+
+def test_first_append_copies_the_whole_table_to_parquet(workspace, parquet):
+    rows = len(pd.read_csv('data-r/results.csv'))
+    lines = open('data-r/results.csv').readlines()
+    with open('data-r/results.csv', 'w') as outfile:
+        outfile.writelines(lines[:-1])
+
+    updater.Pipeline().update(['2026-04-06'])
+
+    assert len(storage.read_parquet('./data-r', 'results')) == rows
+    assert len(storage.read_table('./data-r', 'results')) == rows
+
+
+def test_backends_read_the_same_frame(workspace, monkeypatch):
+    pytest.importorskip('pyarrow')
+    from_csv = storage.read_table('./data-r', 'results')
+
+    monkeypatch.setattr(storage, 'BACKEND', 'parquet')
+    storage.convert_directory('./data-r')
+    from_parquet = storage.read_table('./data-r', 'results')
+
+    pd.testing.assert_frame_equal(from_parquet, from_csv)
+
+
+def test_appends_reach_an_existing_parquet_copy(workspace, parquet):
+    storage.convert_directory('./data-r')
+    new_row = storage.read_table('./data-r', 'results').tail(1).assign(game_date=pd.Timestamp('2026-05-02'))
+
+    storage.append_new_rows(new_row, './data-r', 'results', updater.R_KEYS['results'])
+
+    assert storage.read_table('./data-r', 'results').game_date.max() == pd.Timestamp('2026-05-02')
+
+
+def test_appending_the_same_rows_twice_adds_them_once(workspace):
+    new_row = storage.read_table('./data-r', 'goals').tail(1).assign(game_date=pd.Timestamp('2026-05-02'))
+
+    assert storage.append_new_rows(new_row, './data-r', 'goals', updater.R_KEYS['goals']) == 1
+    assert storage.append_new_rows(new_row, './data-r', 'goals', updater.R_KEYS['goals']) == 0
+
+
+def test_key_file_is_rebuilt_when_the_table_changes(workspace):
+    keys = updater.R_KEYS['goals']
+    new_row = storage.read_table('./data-r', 'goals').tail(1).assign(game_date=pd.Timestamp('2026-05-02'))
+    storage.load_keys('./data-r', 'goals', keys)
+    storage.write_table(pd.concat([storage.read_table('./data-r', 'goals'), new_row]), './data-r', 'goals')
+
+    assert storage.append_new_rows(new_row, './data-r', 'goals', keys) == 0
+
+
+def test_keys_match_however_the_numbers_were_read():
+    floats = pd.DataFrame({'game_date': pd.to_datetime(['2026-05-02']), 'shirt_no': [17.0]})
+    text = pd.DataFrame({'game_date': ['2026-05-02'], 'shirt_no': ['17']})
+
+    assert storage.row_keys(floats, ['game_date', 'shirt_no']).tolist() == storage.row_keys(text, ['game_date', 'shirt_no']).tolist()
@@ -0,0 +1,87 @@
+import pytest
+
+import transport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(transport.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(transport.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_rate_limiter_allows_a_burst_then_waits(clock):
+    limiter = transport.RateLimiter(rate=2.0, burst=3)
+
+    for _ in range(5):
+        limiter.acquire()
+
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_rate_limiter_refills_while_idle(clock):
+    limiter = transport.RateLimiter(rate=2.0, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+
+    clock.now += 10
+    for _ in range(3):
+        limiter.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_unchanged_response_reuses_the_stored_body(monkeypatch):
+    session = Session([
+        Response(200, b'{"a": 1}', {'ETag': '"v1"'}),
+        Response(304)
+    ])
+    monkeypatch.setattr(transport, '_session', session)
+    monkeypatch.setattr(transport, '_validators', transport.OrderedDict())
+
+    first = transport.get_json('https://example.com/data')
+    second = transport.get_json('https://example.com/data')
+
+    assert first == second == {'a': 1}
+    assert session.requests == [{}, {'If-None-Match': '"v1"'}]
+
+
+def test_validators_keep_only_the_most_recent_urls(monkeypatch):
+    monkeypatch.setattr(transport, '_validators', transport.OrderedDict())
+    monkeypatch.setattr(transport, 'MAX_VALIDATORS', 2)
+
+    for url in ['a', 'b', 'c']:
+        transport.store_validators(url, Response(200, headers={'ETag': url}), {})
+
+    assert list(transport._validators) == ['b', 'c']
@@ -0,0 +1,111 @@
+import pandas as pd
+
+import schemas
+import updater
+from conftest import committed, written
+
+
+TABLES = list(updater.R_KEYS)
+
+
+def remove_dates(dates):
+    """
+        Drop the rows for some dates from each R dataset, as if they hadn't been added yet.
+    """
+    for table in TABLES:
+        path = f'data-r/{table}.csv'
+        lines = written(path).splitlines(keepends=True)
+        with open(path, 'wb') as outfile:
+            outfile.writelines(line for line in lines if not any(date.encode() in line for date in dates))
+
+
+def recent_dates(since):
+    results = pd.read_csv('data-r/results.csv', usecols=['game_date'])
+    return results.game_date[results.game_date >= since].tolist()
+
+
+def test_update_appends_the_committed_rows(workspace):
+    # Older rows were added before weekdays were filled in, so only the latest match is rebuilt exactly.
+    remove_dates(['2026-04-06'])
+
+    added = updater.Pipeline().update(['2026-04-06'])
+
+    assert added['results'] == 1
+    for table in TABLES:
+        assert written(f'data-r/{table}.csv') == committed(f'data-r/{table}.csv'), table
+
+
+def test_second_update_changes_nothing(workspace):
+    dates = recent_dates('2026-03-07')
+    remove_dates(dates)
+    updater.Pipeline().update(dates)
+    before = {table: written(f'data-r/{table}.csv') for table in TABLES}
+
+    added = updater.Pipeline().update(dates)
+
+    assert added == {table: 0 for table in TABLES}
+    for table in TABLES:
+        assert written(f'data-r/{table}.csv') == before[table], table
+
+
+def test_out_of_order_match_leaves_other_results_rows_alone(workspace):
+    remove_dates(['2024-02-27'])
+
+    updater.Pipeline().update(['2024-02-27'])
+
+    old_rows = committed('data-r/results.csv').splitlines()
+    new_rows = written('data-r/results.csv').splitlines()
+    assert len(new_rows) == len(old_rows)
+    changed = [new for old, new in zip(old_rows, new_rows) if old != new]
+    # Only the rebuilt match, whose weekday and stadium now come from the feed.
+    assert len(changed) == 1 and b',2024-02-27,' in changed[0]
+
+
+def test_counters_count_games_when_numbers_are_blank():
+    results = pd.DataFrame({
+        'season': ['2025/26'] * 3,
+        'game_date': pd.to_datetime(['2025-08-02', '2025-08-09', '2025-08-12']),
+        'competition': ['League Two', 'League Two', 'EFL Cup'],
+        'game_no': [float('nan')] * 3,
+        'ssn_comp_game_no': [1, float('nan'), float('nan')]
+    })
+
+    counters = updater.build_counters(results, {'2025/26'})
+
+    assert counters['game_no'] == {'2025/26': (3, pd.Timestamp('2025-08-12'))}
+    assert counters['ssn_comp_game_no'] == {('2025/26', 'EFL Cup'): 1, ('2025/26', 'League Two'): 1}
+
+
+def test_results_for_many_dates_match_the_committed_rows(workspace):
+    pipeline = updater.Pipeline()
+    dates = pd.to_datetime(recent_dates('2025-08-01')).tolist()
+    columns = ['game_date', 'opposition', 'venue', 'score', 'outcome', 'goal_diff', 'game_type', 'competition', 'generic_comp', 'league_pos', 'pts', 'manager']
+
+    built = schemas.apply_schema(pipeline.build_results(dates), schemas.get_schema('./data-r', 'results'))
+
+    committed_rows = pipeline.r_table('results')
+    committed_rows = committed_rows[committed_rows.game_date.isin(dates)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(built[columns].astype(str), committed_rows[columns].astype(str))
+
+
+def test_partitions_are_selected_by_key_in_order():
+    df = pd.DataFrame({'game_date': ['b', 'a', 'b'], 'team': ['x', 'y', 'z']})
+    index = updater.build_index(df, ['game_date'])
+
+    assert updater.select_partitions(index, [('b',), ('c',), ('a',)], ['team']).team.tolist() == ['x', 'z', 'y']
+    assert updater.select_partitions(index, [('c',)], ['team']).empty
+
+
+def test_pipeline_reads_each_input_table_once(workspace, monkeypatch):
+    reads = []
+    read_table = updater.storage.read_table
+    def counted(directory, name, **kwargs):
+        if directory == updater.DATA_DIR:
+            reads.append(name)
+        return read_table(directory, name, **kwargs)
+    monkeypatch.setattr(updater.storage, 'read_table', counted)
+    remove_dates(['2026-04-06'])
+
+    updater.Pipeline().update(['2026-04-06'])
+
+    assert reads and sorted(reads) == sorted(set(reads))
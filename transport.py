@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import json_codec
+import metrics
+from lazy_imports import lazy_import
+
+requests = lazy_import('requests')
+
+
+USER_AGENT = (
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
+    'AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/90.0.4430.212 Safari/537.36'
+)
+
+# web-cdn.api.bbci.co.uk and www.bbc.com each get their own keep-alive pool.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Number of responses kept in memory for conditional GETs.
+MAX_VALIDATORS = 64
+
+# Cap on requests in flight across every thread, e.g. during a backfill.
+MAX_CONCURRENT_REQUESTS = 8
+
+# Sustained requests per second allowed for each host, and the burst size.
+HOST_RATE_LIMITS = {
+    'web-cdn.api.bbci.co.uk': 8.0,
+    'www.bbc.com': 4.0
+}
+DEFAULT_RATE_LIMIT = 4.0
+RATE_LIMIT_BURST = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+_validators: 'OrderedDict[str, Dict]' = OrderedDict()
+_validators_lock = threading.Lock()
+
+_in_flight = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+_rate_limiters: Dict[str, 'RateLimiter'] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+        Token bucket allowing `rate` requests per second with bursts of up to `burst`.
+    """
+    def __init__(self, rate: float, burst: int=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_rate_limiter(host: str) -> RateLimiter:
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter(HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+        return _rate_limiters[host]
+
+
+def accept_encoding() -> str:
+    """
+        Return the Accept-Encoding header, offering br only when urllib3 can decode it.
+    """
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+def build_session() -> requests.Session:
+    """
+        Create a session with pooled connections and retries with exponential backoff.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=['GET'],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept': 'application/json',
+        'Accept-Encoding': accept_encoding()
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+        Return the shared session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def get_validators(url: str) -> Optional[Dict]:
+    """
+        Return the stored ETag/Last-Modified and body for a URL, if any.
+    """
+    with _validators_lock:
+        cached = _validators.get(url)
+        if cached is not None:
+            _validators.move_to_end(url)
+        return cached
+
+
+def store_validators(url: str, response: requests.Response, body) -> None:
+    """
+        Remember a response's validators so the next request for the URL can be conditional.
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+
+    with _validators_lock:
+        _validators[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body
+        }
+        _validators.move_to_end(url)
+        while len(_validators) > MAX_VALIDATORS:
+            _validators.popitem(last=False)
+
+
+def conditional_headers(cached: Optional[Dict]) -> Dict:
+    """
+        Build If-None-Match/If-Modified-Since headers from stored validators.
+    """
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def conditional_get(url: str, cached: Optional[Dict]=None, timeout=None) -> requests.Response:
+    """
+        GET a URL through the shared session, revalidating against stored validators.
+        Waits for the host's rate limit and a free slot under MAX_CONCURRENT_REQUESTS.
+    """
+    get_rate_limiter(urlsplit(url).netloc).acquire()
+    with _in_flight:
+        r = get_session().get(url, headers=conditional_headers(cached), timeout=timeout)
+
+    request_span = metrics.current()
+    request_span.label(status=r.status_code)
+    request_span.add(bytes=len(r.content))
+    return r
+
+
+def get_json(url: str, timeout=None):
+    """
+        GET a URL through the shared session and decode the JSON body.
+        An unchanged resource comes back as a 304 and the stored body is reused.
+    """
+    cached = get_validators(url)
+    r = conditional_get(url, cached, timeout)
+
+    if r.status_code == 304 and cached:
+        return cached['body']
+
+    body = json_codec.loads(r.content)
+    store_validators(url, r, body)
+    return body
@@ -0,0 +1,482 @@
+import datetime
+import functools
+from typing import Dict, List, Optional
+
+import metrics
+import numpy as np
+import pandas as pd
+import player_index
+import standings
+import storage
+from player_index import get_season
+
+DATA_DIR = './data'
+R_DIR = './data-r'
+
+# Natural key of each R dataset; rows whose key is already written are skipped.
+R_KEYS = {
+    'results': ['game_date'],
+    'player_apps': ['game_date', 'player_name', 'role'],
+    'goals': ['game_date', 'player_name', 'goal_min'],
+    'subs': ['game_date', 'player_name', 'on_for', 'off_for'],
+    'sub_mins': ['game_date', 'player_name', 'min_off', 'min_on'],
+    'yellow_cards': ['game_date', 'player_name', 'min_yc'],
+    'red_cards': ['game_date', 'player_name', 'min_so']
+}
+
+def get_r_df(file_name):
+    return storage.read_table(R_DIR, file_name)
+
+def data_url(extension, local=True):
+    if local:
+        return f'./data/{extension}'
+    else:
+        return f'https://raw.githubusercontent.com/petebrown/data-updater/refs/heads/main/data/{extension}'
+    
+def today():
+    return datetime.datetime.now().strftime('%Y-%m-%d')
+
+TEAM_NAME = 'Tranmere Rovers'
+
+def check_date(df, date):
+    date = pd.Timestamp(date)
+    if (df.game_date == date).any():
+        return True
+    else:
+        return False
+
+def remove_date_record(df, date):
+    date = pd.Timestamp(date)
+    return df.query('game_date!=@date')
+
+def build_index(df, keys):
+    """
+        Partition a table once on its key columns, so each per-match lookup is a
+        dict access rather than a scan of the whole table.
+    """
+    return {key: group for key, group in df.groupby(keys, sort=False, observed=True)}
+
+def select_partitions(index, keys, columns):
+    """
+        Concatenate the given columns of an index's partitions for each key, skipping missing keys.
+    """
+    parts = [index[key][columns] for key in keys if key in index]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts)
+
+def build_counters(results, seasons):
+    """
+        Running counters for the given seasons: the last game_no and game_date per
+        season, and the last ssn_comp_game_no per (season, competition).
+    """
+    # A season whose numbers are all blank counts its recorded games instead.
+    season_results = results[results.season.isin(seasons)]
+    by_season = season_results.groupby('season').agg(
+        game_no=('game_no', 'max'), games=('game_date', 'size'), last_date=('game_date', 'max')
+    )
+    by_competition = season_results.groupby(['season', 'competition'])['ssn_comp_game_no'].agg(['max', 'size'])
+    return {
+        'game_no': {
+            season: (int(row.game_no) if pd.notna(row.game_no) else int(row.games), row.last_date)
+            for season, row in by_season.iterrows()
+        },
+        'ssn_comp_game_no': {
+            key: int(row['max']) if pd.notna(row['max']) else int(row['size'])
+            for key, row in by_competition.iterrows()
+        }
+    }
+
+def number_games(new_results, counters):
+    """
+        Assign game_no and ssn_comp_game_no to new results from the running counters.
+        Returns the seasons that need renumbering because a match was inserted
+        before that season's last recorded game.
+    """
+    renumber = set()
+    game_nos = []
+    ssn_comp_game_nos = []
+
+    for season, competition, game_date in zip(new_results.season, new_results.competition, new_results.game_date):
+        game_no, last_date = counters['game_no'].get(season, (0, pd.Timestamp.min))
+        if game_date < last_date:
+            renumber.add(season)
+        ssn_comp_game_no = counters['ssn_comp_game_no'].get((season, competition), 0) + 1
+
+        counters['game_no'][season] = (game_no + 1, max(game_date, last_date))
+        counters['ssn_comp_game_no'][(season, competition)] = ssn_comp_game_no
+
+        game_nos.append(game_no + 1)
+        ssn_comp_game_nos.append(ssn_comp_game_no)
+
+    new_results['game_no'] = game_nos
+    new_results['ssn_comp_game_no'] = ssn_comp_game_nos
+    return renumber
+
+def renumber_seasons(results, seasons):
+    """
+        Recount game_no and ssn_comp_game_no in date order for the given seasons only.
+    """
+    in_seasons = results.season.isin(seasons)
+    season_results = results[in_seasons]
+    results.loc[in_seasons, 'game_no'] = season_results.groupby('season').cumcount() + 1
+    results.loc[in_seasons, 'ssn_comp_game_no'] = season_results.groupby(['season', 'competition']).cumcount() + 1
+    return results
+
+
+
+class Pipeline:
+    """
+        The inputs for an update, each read on first use and kept for the life of
+        the pipeline, so a command only loads the tables it actually touches.
+    """
+    def __init__(self, data_dir: str=DATA_DIR, r_dir: str=R_DIR):
+        self.data_dir = data_dir
+        self.r_dir = r_dir
+        self._tables = {}
+        self._new_players = []
+
+    def table(self, name: str) -> pd.DataFrame:
+        if (self.data_dir, name) not in self._tables:
+            self._tables[(self.data_dir, name)] = storage.read_table(self.data_dir, name)
+        return self._tables[(self.data_dir, name)]
+
+    def r_table(self, name: str) -> pd.DataFrame:
+        if (self.r_dir, name) not in self._tables:
+            self._tables[(self.r_dir, name)] = storage.read_table(self.r_dir, name)
+        return self._tables[(self.r_dir, name)]
+
+    @property
+    def squad_nos(self) -> pd.DataFrame:
+        return self.table('squad_nos')
+
+    # Per-match partitions of the input tables
+    @functools.cached_property
+    def scores_by_date(self) -> Dict:
+        return build_index(self.table('scores'), ['game_date'])
+
+    @functools.cached_property
+    def match_info_by_date(self) -> Dict:
+        return build_index(self.table('match_info'), ['game_date'])
+
+    @functools.cached_property
+    def officials_by_date(self) -> Dict:
+        return build_index(self.table('officials'), ['game_date'])
+
+    @functools.cached_property
+    def league_standings(self) -> standings.Standings:
+        return standings.load_standings(storage.table_path(self.data_dir, 'standings', 'npz'))
+
+    @functools.cached_property
+    def lineups_by_team(self) -> Dict:
+        return build_index(self.table('lineups'), ['game_date', 'team_name'])
+
+    # BBC player URN -> canonical name, covering every season
+    @functools.cached_property
+    def player_index(self) -> pd.DataFrame:
+        return player_index.load_player_index(self.data_dir, self.r_dir)
+
+    @functools.cached_property
+    def player_names(self) -> Dict[str, str]:
+        return player_index.name_lookup(self.player_index)
+
+    @functools.cached_property
+    def squad_players(self) -> Dict:
+        return player_index.squad_lookup(self.squad_nos)
+
+    def resolve_players(self, lineup: pd.DataFrame) -> pd.Series:
+        """
+            Canonical name for each lineup row, looked up by BBC player URN. A player
+            the index hasn't seen yet is matched on the season's squad number and
+            added to the index on the next update.
+        """
+        player_ids = lineup.player_id.astype(str)
+        names = player_ids.map(self.player_names)
+
+        unknown = names.isna() & lineup.player_id.notna()
+        if unknown.any():
+            seasons = get_season(lineup.game_date[unknown])
+            shirt_nos = lineup.shirt_no[unknown]
+            names[unknown] = [
+                self.squad_players.get((season, int(shirt_no))) if pd.notna(shirt_no) else None
+                for season, shirt_no in zip(seasons, shirt_nos)
+            ]
+            new_players = pd.DataFrame({
+                'bbc_player_id': player_ids[unknown],
+                'player_name': names[unknown],
+                'season': seasons,
+                'squad_no': shirt_nos
+            }).dropna(subset=['player_name'])
+            self._new_players.append(new_players)
+            self.player_names.update(zip(new_players.bbc_player_id, new_players.player_name))
+
+        return names
+
+    def get_team_lineup(self, date, team_name=TEAM_NAME):
+        return self.lineups_by_team.get((date, team_name))
+
+    @metrics.timed('build', dataset='results')
+    def build_results(self, dates):
+        """
+            Build a results row for each date, deriving every column as a vectorized
+            operation over one frame of scores, match info, managers and referees, with
+            league position and points from the standings cube.
+        """
+        match_scores = select_partitions(self.scores_by_date, [(date,) for date in dates], ['game_date', 'team_name', 'team_venue', 'ft_score'])
+        is_team = match_scores.team_name == TEAM_NAME
+
+        team_scores = match_scores[is_team][['game_date', 'team_venue', 'ft_score']] \
+            .rename(columns={'ft_score': 'goals_for'})
+        opposition_scores = match_scores[~is_team][['game_date', 'team_name', 'ft_score']] \
+            .rename(columns={'team_name': 'opposition', 'ft_score': 'goals_against'})
+
+        info = select_partitions(self.match_info_by_date, [(date,) for date in dates], ['game_date', 'competition', 'attendance', 'ko_time', 'venue']) \
+            .rename(columns={'venue': 'stadium'})
+
+        managers = select_partitions(self.lineups_by_team, [(date, TEAM_NAME) for date in dates], ['game_date', 'team_manager']) \
+            .rename(columns={'team_manager': 'manager'})
+
+        match_officials = select_partitions(self.officials_by_date, [(date,) for date in dates], ['game_date', 'name', 'role'])
+        referees = match_officials[match_officials.role == 'Referee'][['game_date', 'name']] \
+            .rename(columns={'name': 'referee'})
+
+        df = team_scores.drop_duplicates('game_date') \
+            .merge(opposition_scores.drop_duplicates('game_date'), on='game_date', how='inner') \
+                .merge(info.drop_duplicates('game_date'), on='game_date', how='left') \
+                    .merge(managers.drop_duplicates('game_date'), on='game_date', how='left') \
+                        .merge(referees.drop_duplicates('game_date'), on='game_date', how='left') \
+                            .sort_values('game_date') \
+                                .reset_index(drop=True)
+
+        is_league = df.competition == 'League Two'
+
+        df['season'] = get_season(df.game_date)
+        df['venue'] = np.where(df.team_venue == 'home', 'H', 'A')
+        df['goal_diff'] = df.goals_for - df.goals_against
+        df['outcome'] = np.select([df.goal_diff > 0, df.goal_diff < 0], ['W', 'L'], 'D')
+        df['score'] = df.goals_for.astype('Int64').astype(str) + '-' + df.goals_against.astype('Int64').astype(str)
+        df['game_type'] = np.where(is_league, 'League', 'Cup')
+        df['generic_comp'] = np.select(
+            [
+                is_league,
+                df.competition.str.contains('League Cup', regex=False),
+                df.competition.str.contains('FA Cup', regex=False),
+                df.competition.str.contains('EFL Trophy', regex=False)
+            ],
+            ['Football League', 'League Cup', 'FA Cup', "Associate Members' Cup"],
+            None
+        )
+        df['league_tier'] = np.where(is_league, 4, np.nan)
+        table = self.league_standings.lookup(df.game_date.dt.strftime('%Y-%m-%d').tolist(), TEAM_NAME, ['rank', 'points'])
+        df['league_pos'] = np.where(is_league, table[:, 0], np.nan)
+        df['pts'] = np.where(is_league, table[:, 1], np.nan)
+        df['weekday'] = df.game_date.dt.day_name()
+        df['game_length'] = 90
+
+        return df
+
+    def get_results(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+        results = self.r_table('results')
+        # scores = pd.read_csv(data_url('scores.csv'))
+
+        new_dates = []
+        for date in pd.to_datetime(dates):
+            if check_date(results, date):
+                print(f'{date.date()} is already in results')
+            elif (date,) not in self.scores_by_date:
+                print(f'No match data for {date.date()}')
+            else:
+                new_dates.append(date)
+
+        if not new_dates:
+            return results
+
+        new_results = self.build_results(new_dates).reindex(columns=results.columns)
+
+        counters = build_counters(results, set(new_results.season))
+        renumber = number_games(new_results, counters)
+
+        results = pd.concat([results, new_results]).reset_index(drop=True)
+
+        # Out-of-order matches are slotted into place and only their seasons recounted.
+        if renumber:
+            results = results.sort_values('game_date', kind='stable').reset_index(drop=True)
+            results = renumber_seasons(results, renumber)
+
+        return results
+
+    @metrics.timed('build', dataset='player_apps')
+    def get_player_apps(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+
+        all_player_apps = []
+
+        for date in dates:
+            team_lineup = self.get_team_lineup(pd.Timestamp(date))
+            if team_lineup is None:
+                continue
+
+            player_apps = team_lineup[['game_date', 'shirt_no']].copy()
+            player_apps['role'] = player_index.lineup_roles(team_lineup)
+            player_apps['player_name'] = self.resolve_players(team_lineup)
+
+            player_apps = player_apps.dropna(subset=['role']).sort_values(['role', 'shirt_no'])[['game_date', 'player_name', 'shirt_no', 'role']]
+
+            all_player_apps.append(player_apps)
+
+        if not all_player_apps:
+            return pd.DataFrame()
+
+        return pd.concat(all_player_apps).reset_index(drop=True)
+
+    @metrics.timed('build', dataset='yellow_cards')
+    def get_yellow_cards(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+
+        all_yellow_cards = []
+
+        for date in dates:
+            team_lineup = self.get_team_lineup(pd.Timestamp(date))
+            if team_lineup is None:
+                continue
+
+            booked = team_lineup[team_lineup.yellow_card != 0]
+
+            yellow_cards = booked[['game_date', 'min_yc']].copy()
+            yellow_cards['player_name'] = self.resolve_players(booked)
+
+            all_yellow_cards.append(yellow_cards[['game_date', 'player_name', 'min_yc']])
+
+        if not all_yellow_cards:
+            return pd.DataFrame()
+
+        return pd.concat(all_yellow_cards).reset_index(drop=True)
+
+    @metrics.timed('build', dataset='sub_mins')
+    def get_sub_mins(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+        all_sub_mins = []
+
+        for date in dates:
+            team_lineup = self.get_team_lineup(pd.Timestamp(date))
+            if team_lineup is None:
+                continue
+
+            is_sub = team_lineup.position == 'Substitute'
+            was_subbed = team_lineup.sub_off_min.notnull()
+
+            subs_on = team_lineup[is_sub & was_subbed]
+            subs_off = team_lineup[~is_sub & was_subbed]
+
+            sub_mins = pd.concat([
+                pd.DataFrame({'game_date': subs_on.game_date, 'player_name': self.resolve_players(subs_on), 'min_on': subs_on.sub_off_min}),
+                pd.DataFrame({'game_date': subs_off.game_date, 'player_name': self.resolve_players(subs_off), 'min_off': subs_off.sub_off_min})
+            ])[['game_date', 'player_name', 'min_off', 'min_on']]
+
+            all_sub_mins.append(sub_mins)
+
+        if not all_sub_mins:
+            return pd.DataFrame()
+
+        sub_mins_df = pd.concat(all_sub_mins).reset_index(drop=True)
+
+        sub_mins_df.loc[sub_mins_df.min_on > 90, 'min_on'] = 90
+        sub_mins_df.loc[sub_mins_df.min_off > 90, 'min_off'] = 90
+
+        return sub_mins_df
+
+    @metrics.timed('build', dataset='subs')
+    def get_subs(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+        all_subs = []
+
+        for date in dates: 
+            team_lineup = self.get_team_lineup(pd.Timestamp(date))
+            if team_lineup is None:
+                continue
+
+            is_sub = team_lineup.position == 'Substitute'
+            was_subbed = team_lineup.sub_off_min.notnull()
+
+            # Shirt number of each player in this lineup, by BBC player ID
+            shirt_nos = dict(zip(team_lineup.player_id.astype(str), team_lineup.shirt_no))
+
+            subs_on = team_lineup[is_sub & was_subbed]
+            subs_off = team_lineup[~is_sub & was_subbed]
+
+            subs = pd.concat([
+                pd.DataFrame({
+                    'game_date': subs_on.game_date,
+                    'shirt_no': subs_on.shirt_no,
+                    'player_name': self.resolve_players(subs_on),
+                    'on_for': subs_on.sub_replaced_id.astype(str).map(shirt_nos)
+                }),
+                pd.DataFrame({
+                    'game_date': subs_off.game_date,
+                    'shirt_no': subs_off.shirt_no,
+                    'player_name': self.resolve_players(subs_off),
+                    'off_for': subs_off.sub_replacement_id.astype(str).map(shirt_nos)
+                })
+            ])[['game_date', 'shirt_no', 'player_name', 'on_for', 'off_for']]
+
+            all_subs.append(subs)
+
+        if not all_subs:
+            return pd.DataFrame()
+
+        return pd.concat(all_subs).reset_index(drop=True)
+
+    @metrics.timed('build', dataset='goals')
+    def get_goals(self, dates: Optional[List[str]]=None):
+        dates = dates or [today()]
+
+        goals = self.table('goals')
+        df = goals[(goals.team_name == TEAM_NAME) & goals.game_date.isin(pd.to_datetime(dates))].copy()
+
+        df['penalty'] = (df.goal_type == 'Penalty').astype(float)
+        df['own_goal'] = (df.goal_type == 'Own Goal').astype(float)
+
+        df['player_name'] = df.bbc_player_id.astype(str).map(self.player_names)
+        df.loc[df.own_goal==1, 'player_name'] = 'OG'
+
+        return df[['game_date', 'player_name', 'goal_min', 'penalty', 'own_goal']]
+
+    def update(self, dates: Optional[List[str]]=None) -> Dict[str, int]:
+        """
+            Add the given dates (default today) to every R dataset, appending only
+            rows that aren't already there. Returns the rows added per dataset.
+        """
+        dates = dates or [today()]
+        results_1 = self.r_table('results')
+        results = self.get_results(dates)
+        new_results = results[~results.game_date.isin(results_1.game_date)]
+
+        # A match slotted in before the last recorded one renumbers its season, so
+        # results are rewritten; otherwise every table only has new rows appended.
+        if not new_results.empty and new_results.game_date.min() < results_1.game_date.max():
+            storage.write_table(results, self.r_dir, 'results')
+        else:
+            storage.append_new_rows(new_results, self.r_dir, 'results', R_KEYS['results'])
+        added = {'results': len(new_results)}
+
+        dfs = [
+            ('player_apps', self.get_player_apps(dates)),
+            ('goals', self.get_goals(dates)),
+            ('subs', self.get_subs(dates)),
+            ('sub_mins', self.get_sub_mins(dates)),
+            ('yellow_cards', self.get_yellow_cards(dates)),
+            ('red_cards', pd.DataFrame())
+        ]
+
+        for df in dfs:
+            file_name = df[0]
+            data = df[1]
+            added[file_name] = storage.append_new_rows(data, self.r_dir, file_name, R_KEYS[file_name])
+            print(f'Added {added[file_name]} rows to {file_name}')
+
+        if self._new_players:
+            index = player_index.add_players(self.player_index, pd.concat(self._new_players))
+            player_index.save_player_index(index, self.data_dir)
+
+        return added